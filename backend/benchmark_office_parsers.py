@@ -0,0 +1,99 @@
+"""
+DOCX/PPTX extraction benchmark: XML streaming (lxml iterparse) vs the python-docx/python-pptx object model
+Generates a large tender-style document and slide deck, parses each in a fresh process per path,
+and prints time, peak RSS growth and whether both paths produced the same blocks.
+
+Usage: python benchmark_office_parsers.py [docx_pages] [pptx_slides]
+"""
+
+import io
+import sys
+import time
+import hashlib
+import multiprocessing
+
+# Generated paragraphs per "page" of the synthetic document (about one A4 page of prose each)
+_PARAGRAPHS_PER_PAGE = 6
+_SENTENCE = "The bidder shall provide managed security operations with 24x7 monitoring and a four-hour response SLA. "
+
+
+def make_docx(pages: int) -> bytes:
+    """A document with a heading per page, prose paragraphs and a pricing table every tenth page"""
+    from docx import Document
+    doc = Document()
+    for page in range(pages):
+        doc.add_heading(f"Section {page + 1}: Scope of work", level=1 + page % 2)
+        for paragraph in range(_PARAGRAPHS_PER_PAGE):
+            doc.add_paragraph(f"{page}.{paragraph} " + _SENTENCE * 3)
+        if page % 10 == 9:
+            table = doc.add_table(rows=12, cols=4)
+            for r, row in enumerate(table.rows):
+                for c, cell in enumerate(row.cells):
+                    cell.text = f"Item {r}.{c}" if c else f"Line {page}-{r}"
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def make_pptx(slides: int) -> bytes:
+    """A deck with a title, bullet body and a small table on every slide"""
+    from pptx import Presentation
+    from pptx.util import Inches
+    deck = Presentation()
+    for number in range(slides):
+        slide = deck.slides.add_slide(deck.slide_layouts[1])
+        slide.shapes.title.text = f"Slide {number + 1}: Solution overview"
+        body = slide.placeholders[1].text_frame
+        body.text = _SENTENCE
+        for bullet in range(4):
+            body.add_paragraph().text = f"Point {bullet}: " + _SENTENCE
+        table = slide.shapes.add_table(3, 3, Inches(1), Inches(5), Inches(8), Inches(1)).table
+        for r in range(3):
+            for c in range(3):
+                table.cell(r, c).text = f"{number}-{r}-{c}"
+    buffer = io.BytesIO()
+    deck.save(buffer)
+    return buffer.getvalue()
+
+
+def _measure(method: str, content: bytes, results) -> None:
+    import resource
+    from file_parsers import FileParser
+    parse = getattr(FileParser, method)
+    before_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    digest = hashlib.sha256()
+    blocks = 0
+    for group in parse(content):
+        for block in group:
+            digest.update(repr(sorted(block.items())).encode("utf-8"))
+            blocks += 1
+    seconds = time.perf_counter() - start
+    after_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put({"seconds": seconds, "peak_rss_mb": (after_kb - before_kb) / 1024, "blocks": blocks, "digest": digest.hexdigest()})
+
+
+def measure(method: str, content: bytes):
+    """Run one FileParser method in a fresh process so peak RSS is not shared between paths"""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_measure, args=(method, content, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+if __name__ == "__main__":
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    slides = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    documents = [("docx", f"{pages} pages", make_docx(pages)), ("pptx", f"{slides} slides", make_pptx(slides))]
+    print(f"{'file':<18} {'path':<14} {'seconds':>8} {'MB/s':>7} {'peak RSS':>9}  blocks")
+    for kind, label, content in documents:
+        size_mb = len(content) / (1024 * 1024)
+        runs = {path: measure(f"_iter_{kind}_{path}", content) for path in ("xml", "object_model")}
+        for path, result in runs.items():
+            print(f"{kind + ' ' + label:<18} {path:<14} {result['seconds']:>8.2f} {size_mb / result['seconds']:>7.2f} "
+                  f"{result['peak_rss_mb']:>7.1f}MB  {result['blocks']}")
+        same = runs["xml"]["digest"] == runs["object_model"]["digest"]
+        print(f"{'':<18} same blocks: {same}; speed-up x{runs['object_model']['seconds'] / runs['xml']['seconds']:.1f}")
@@ -0,0 +1,283 @@
+"""
+Parser throughput and memory benchmark
+Generates a deterministic synthetic corpus (DOCX with tables, PPTX, XLSX, CSV, TXT, PDF at several
+sizes), runs every FileParser entry point plus main.py's extract_text_from_pdf/extract_text_from_docx
+over it, and writes MB/s, pages/s, p50/p95 per-file latency and peak RSS growth as JSON.
+Each (method, format) runs in a fresh process so peak RSS is not shared, with the parse cache off.
+PDF pages are parsed on the parser worker pool, whose memory is not part of the reported RSS.
+
+Usage:
+    python benchmark_parsers.py [--output parser_benchmark.json] [--baseline previous.json]
+                                [--sizes small,medium,large] [--files 3] [--iterations 3]
+
+With --baseline, rows whose p95 latency is worse than the baseline by more than --tolerance
+(and --min-delta-ms) are reported and the exit status is 1, so parser changes can be checked
+against a stored run.
+"""
+
+import os
+import io
+import sys
+import csv
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import platform
+import multiprocessing
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+# Cached parses would measure the cache, not the parser
+os.environ["PARSE_CACHE_ENABLED"] = "false"
+
+from benchmark_office_parsers import make_docx, make_pptx
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_corpus")
+
+# Size of each generated file, in the unit pages/s is reported in: pages (DOCX, PDF), slides (PPTX),
+# 50-row pages (XLSX, CSV) and 6-paragraph pages (TXT)
+SIZES: Dict[str, Dict[str, int]] = {
+    "small": {"docx": 5, "pptx": 5, "pdf": 5, "xlsx": 4, "csv": 4, "txt": 5},
+    "medium": {"docx": 50, "pptx": 40, "pdf": 50, "xlsx": 100, "csv": 100, "txt": 50},
+    "large": {"docx": 300, "pptx": 200, "pdf": 300, "xlsx": 400, "csv": 400, "txt": 500},
+}
+_ROWS_PER_PAGE = 50
+_PARAGRAPHS_PER_PAGE = 6
+
+# Benchmarked entry points; None means every format
+METHODS: Dict[str, Optional[List[str]]] = {
+    "FileParser.parse": None,
+    "FileParser.parse_text": None,
+    "FileParser.iter_blocks": None,
+    "FileParser.extract_text": None,
+    "FileParser.extract_blocks": None,
+    "main.extract_text_from_pdf": ["pdf"],
+    "main.extract_text_from_docx": ["docx"],
+}
+
+_WORDS = ("bidder shall provide managed security operations monitoring response service level cloud network "
+          "migration support availability compliance audit reporting incident firewall backup recovery").split()
+
+
+def _sentences(rng: random.Random, count: int) -> str:
+    return " ".join(" ".join(rng.choice(_WORDS) for _ in range(rng.randint(8, 18))).capitalize() + "." for _ in range(count))
+
+
+def make_pdf(pages: int, rng: random.Random) -> bytes:
+    import fitz
+    pdf = fitz.open()
+    for number in range(pages):
+        page = pdf.new_page()
+        page.insert_text((72, 72), f"{number + 1}. Technical requirements", fontsize=16)
+        page.insert_textbox(fitz.Rect(72, 96, 540, 770), _sentences(rng, 30), fontsize=10)
+    return pdf.tobytes()
+
+
+def _sheet_rows(pages: int, rng: random.Random) -> List[List[Any]]:
+    rows = [["SKU", "Description", "Unit Price", "Qty", "Notes"]]
+    for number in range(pages * _ROWS_PER_PAGE):
+        rows.append([f"SKU-{number:06d}", _sentences(rng, 1), round(rng.uniform(10, 5000), 2),
+                     rng.randint(1, 50), rng.choice(["", "volume discount", "annual billing"])])
+    return rows
+
+
+def make_xlsx(pages: int, rng: random.Random) -> bytes:
+    import openpyxl
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Pricing")
+    for row in _sheet_rows(pages, rng):
+        sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def make_csv(pages: int, rng: random.Random) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(_sheet_rows(pages, rng))
+    return buffer.getvalue().encode("utf-8")
+
+
+def make_txt(pages: int, rng: random.Random) -> bytes:
+    paragraphs = []
+    for number in range(pages * _PARAGRAPHS_PER_PAGE):
+        if number % _PARAGRAPHS_PER_PAGE == 0:
+            paragraphs.append(f"# Section {number // _PARAGRAPHS_PER_PAGE + 1}")
+        paragraphs.append(_sentences(rng, 5))
+    return "\n\n".join(paragraphs).encode("utf-8")
+
+
+_GENERATORS: Dict[str, Callable[[int, random.Random], bytes]] = {
+    "docx": lambda pages, rng: make_docx(pages),
+    "pptx": lambda pages, rng: make_pptx(pages),
+    "pdf": make_pdf,
+    "xlsx": make_xlsx,
+    "csv": make_csv,
+    "txt": make_txt,
+}
+
+
+def build_corpus(sizes: List[str], files_per_size: int, corpus_dir: str = CORPUS_DIR) -> List[Dict[str, Any]]:
+    """Generate (or reuse) the corpus; returns [{path, format, size, pages, bytes}]"""
+    os.makedirs(corpus_dir, exist_ok=True)
+    corpus = []
+    for size in sizes:
+        for fmt, pages in SIZES[size].items():
+            for variant in range(files_per_size):
+                path = os.path.join(corpus_dir, f"{size}_{variant}.{fmt}")
+                if not os.path.exists(path):
+                    # Seeded per file, so every machine generates the same content
+                    seed = int(hashlib.sha256(f"{size}:{fmt}:{variant}".encode()).hexdigest()[:8], 16)
+                    with open(path, "wb") as f:
+                        f.write(_GENERATORS[fmt](pages, random.Random(seed)))
+                corpus.append({"path": path, "format": fmt, "size": size, "pages": pages, "bytes": os.path.getsize(path)})
+    return corpus
+
+
+def _resolve(method: str) -> Callable[[bytes, str], Any]:
+    if method.startswith("main."):
+        import main
+        extract = getattr(main, method.split(".", 1)[1])
+        return lambda content, filename: extract(content)
+    from file_parsers import FileParser
+    if method == "FileParser.iter_blocks":
+        return lambda content, filename: sum(len(group) for group in FileParser.iter_blocks(content, filename))
+    return getattr(FileParser, method.split(".", 1)[1])
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    # Nearest-rank percentile
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def _run(method: str, files: List[Dict[str, Any]], iterations: int, results) -> None:
+    """Child process: time method over files and report per-size stats"""
+    import resource
+    try:
+        parse = _resolve(method)
+        contents = [(item, open(item["path"], "rb").read()) for item in files]
+        # Untimed warm-up (imports, parser process pool)
+        parse(contents[0][1], os.path.basename(contents[0][0]["path"]))
+        before_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        by_size: Dict[str, Dict[str, Any]] = {}
+        for _ in range(iterations):
+            for item, content in contents:
+                start = time.perf_counter()
+                parse(content, os.path.basename(item["path"]))
+                elapsed = time.perf_counter() - start
+                row = by_size.setdefault(item["size"], {"latencies": [], "bytes": 0, "pages": 0})
+                row["latencies"].append(elapsed)
+                row["bytes"] += item["bytes"]
+                row["pages"] += item["pages"]
+        peak_rss_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before_kb) / 1024
+        results.put({"rows": by_size, "peak_rss_mb": peak_rss_mb})
+    except Exception as e:
+        results.put({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        from file_parsers import shutdown_parse_pool
+        shutdown_parse_pool()
+
+
+def run_benchmark(corpus: List[Dict[str, Any]], iterations: int) -> List[Dict[str, Any]]:
+    context = multiprocessing.get_context("spawn")
+    formats = sorted({item["format"] for item in corpus})
+    rows = []
+    for method, method_formats in METHODS.items():
+        for fmt in formats:
+            if method_formats is not None and fmt not in method_formats:
+                continue
+            files = [item for item in corpus if item["format"] == fmt]
+            results = context.Queue()
+            process = context.Process(target=_run, args=(method, files, iterations, results))
+            process.start()
+            outcome = results.get()
+            process.join()
+            if "error" in outcome:
+                print(f"{method} [{fmt}]: skipped ({outcome['error']})")
+                rows.append({"method": method, "format": fmt, "error": outcome["error"]})
+                continue
+            for size, stats in outcome["rows"].items():
+                seconds = sum(stats["latencies"])
+                rows.append({
+                    "method": method, "format": fmt, "size": size,
+                    "files": len(stats["latencies"]),
+                    "seconds": round(seconds, 4),
+                    "mb_per_s": round(stats["bytes"] / (1024 * 1024) / seconds, 3),
+                    "pages_per_s": round(stats["pages"] / seconds, 1),
+                    "p50_ms": round(_percentile(stats["latencies"], 50) * 1000, 2),
+                    "p95_ms": round(_percentile(stats["latencies"], 95) * 1000, 2),
+                    # Growth over the whole (method, format) run, shared by its sizes
+                    "peak_rss_mb": round(outcome["peak_rss_mb"], 1),
+                })
+    return rows
+
+
+def compare(rows: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float, min_delta_ms: float = 1.0) -> List[str]:
+    """Rows whose p95 latency regressed by more than tolerance (and min_delta_ms, to ignore timer noise) against the baseline run"""
+    previous = {(r["method"], r["format"], r.get("size")): r for r in baseline.get("results", []) if "error" not in r}
+    regressions = []
+    for row in rows:
+        old = previous.get((row["method"], row["format"], row.get("size")))
+        if "error" in row or old is None:
+            continue
+        ratio = row["p95_ms"] / old["p95_ms"] if old["p95_ms"] else 1.0
+        if ratio > 1 + tolerance and row["p95_ms"] - old["p95_ms"] > min_delta_ms:
+            regressions.append(f"{row['method']} [{row['format']}/{row['size']}]: p95 {old['p95_ms']}ms -> {row['p95_ms']}ms (x{ratio:.2f})")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark FileParser throughput and memory")
+    parser.add_argument("--output", default="parser_benchmark.json")
+    parser.add_argument("--baseline", help="Earlier JSON output to compare p95 latency against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed p95 slow-down vs baseline (0.10 = 10%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore p95 slow-downs smaller than this")
+    parser.add_argument("--sizes", default="small,medium,large")
+    parser.add_argument("--files", type=int, default=3, help="Files per format and size")
+    parser.add_argument("--iterations", type=int, default=3)
+    args = parser.parse_args()
+
+    sizes = [size.strip() for size in args.sizes.split(",") if size.strip()]
+    corpus = build_corpus(sizes, args.files)
+    rows = run_benchmark(corpus, args.iterations)
+
+    from file_parsers import PARSER_VERSION
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "parser_version": PARSER_VERSION,
+            "iterations": args.iterations,
+            "files_per_size": args.files,
+        },
+        "results": rows,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'method':<30} {'fmt':<5} {'size':<7} {'MB/s':>8} {'pages/s':>9} {'p95 ms':>9} {'peak RSS':>9}")
+    for row in rows:
+        if "error" not in row:
+            print(f"{row['method']:<30} {row['format']:<5} {row['size']:<7} {row['mb_per_s']:>8.2f} "
+                  f"{row['pages_per_s']:>9.1f} {row['p95_ms']:>9.1f} {row['peak_rss_mb']:>7.1f}MB")
+    print(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(rows, json.load(f), args.tolerance, args.min_delta_ms)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"No p95 regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
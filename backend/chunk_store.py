@@ -0,0 +1,125 @@
+"""
+Local chunk text store
+Chunk text keyed by vector id in SQLite (zstd-compressed blobs), so the vector index only carries ids,
+embeddings and filterable metadata. Retrieval hydrates text with one batched read.
+"""
+
+import os
+import zlib
+import sqlite3
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+load_dotenv()
+
+CHUNK_STORE_PATH = os.getenv(
+    "CHUNK_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "chunk_store.db")
+)
+# Keep writing "text" into vector metadata as well (for deployments still reading it from the index)
+CHUNK_TEXT_IN_METADATA = (os.getenv("CHUNK_TEXT_IN_METADATA", "false").lower() in ("1", "true", "yes"))
+CHUNK_STORE_ZSTD_LEVEL = int(os.getenv("CHUNK_STORE_ZSTD_LEVEL", "3"))
+
+# Codec tags stored per row so a store written with zstd stays readable (and vice versa)
+_CODEC_ZSTD = "zstd"
+_CODEC_ZLIB = "zlib"
+# SQLite variable limit for IN (...) lists
+_SQL_BATCH = 500
+
+
+class ChunkStore:
+    """id -> chunk text, compressed with zstd (zlib when zstandard is not installed)"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.logger = logging.getLogger("retrieval.chunk_store")
+        self.path = path or CHUNK_STORE_PATH
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, codec TEXT NOT NULL, body BLOB NOT NULL)")
+        self._db.commit()
+        if ZSTD_AVAILABLE:
+            self._compressor = zstandard.ZstdCompressor(level=CHUNK_STORE_ZSTD_LEVEL)
+            self._decompressor = zstandard.ZstdDecompressor()
+
+    def _encode(self, text: str) -> Tuple[str, bytes]:
+        raw = (text or "").encode("utf-8")
+        if ZSTD_AVAILABLE:
+            return _CODEC_ZSTD, self._compressor.compress(raw)
+        return _CODEC_ZLIB, zlib.compress(raw)
+
+    def _decode(self, codec: str, body: bytes) -> str:
+        if codec == _CODEC_ZSTD:
+            if not ZSTD_AVAILABLE:
+                raise RuntimeError("Chunk store holds zstd data but zstandard is not installed")
+            return self._decompressor.decompress(body).decode("utf-8")
+        return zlib.decompress(body).decode("utf-8")
+
+    def put(self, entries: Iterable[Tuple[str, str]]) -> int:
+        """Insert or replace (id, text) entries; returns count"""
+        rows = [(doc_id, *self._encode(text)) for doc_id, text in entries]
+        if not rows:
+            return 0
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO chunks (id, codec, body) VALUES (?, ?, ?)", rows)
+            self._db.commit()
+        return len(rows)
+
+    def get_many(self, ids: Iterable[str]) -> Dict[str, str]:
+        """Text for the given ids (missing ids are absent from the result)"""
+        ids = list(dict.fromkeys(ids))
+        found: Dict[str, str] = {}
+        with self._lock:
+            for start in range(0, len(ids), _SQL_BATCH):
+                batch = ids[start:start + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._db.execute(
+                    f"SELECT id, codec, body FROM chunks WHERE id IN ({placeholders})", batch
+                ).fetchall()
+                for doc_id, codec, body in rows:
+                    found[doc_id] = self._decode(codec, body)
+        return found
+
+    def delete(self, ids: Iterable[str]) -> None:
+        """Delete entries by id (missing ids are ignored)"""
+        ids = list(ids)
+        if not ids:
+            return
+        with self._lock:
+            for start in range(0, len(ids), _SQL_BATCH):
+                batch = ids[start:start + _SQL_BATCH]
+                self._db.execute(f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch)
+            self._db.commit()
+
+    def list_ids(self) -> List[str]:
+        """All ids in the store"""
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT id FROM chunks").fetchall()]
+
+
+def chunk_metadata(metadata: Dict, text: str) -> Dict:
+    """Vector metadata for a chunk: text is only embedded when CHUNK_TEXT_IN_METADATA is on"""
+    if CHUNK_TEXT_IN_METADATA:
+        return {**metadata, "text": text}
+    return metadata
+
+
+# Singleton instance
+_chunk_store: Optional[ChunkStore] = None
+_chunk_store_lock = threading.Lock()
+
+def get_chunk_store() -> ChunkStore:
+    """Get or create the chunk store singleton"""
+    global _chunk_store
+    with _chunk_store_lock:
+        if _chunk_store is None:
+            _chunk_store = ChunkStore()
+        return _chunk_store
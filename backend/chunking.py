@@ -0,0 +1,264 @@
+"""
+Structure-aware chunking sized for the embedding model
+Packs parser blocks (paragraphs, headings, table rows) into chunks that fit all-MiniLM-L6-v2's
+256 word-piece window, breaking at page/slide/heading boundaries and never inside a table row
+or across sheets. Each chunk carries its page/slide/sheet/section as metadata.
+"""
+
+import os
+import re
+import math
+import logging
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from dotenv import load_dotenv
+
+try:
+    from tokenizers import Tokenizer
+    TOKENIZERS_AVAILABLE = True
+except ImportError:
+    TOKENIZERS_AVAILABLE = False
+
+load_dotenv()
+
+# Tokenizer of the embedding model (word pieces are what the model's window is measured in)
+CHUNK_TOKENIZER = os.getenv("CHUNK_TOKENIZER", "sentence-transformers/all-MiniLM-L6-v2")
+# all-MiniLM-L6-v2 truncates at 256 pieces including [CLS] and [SEP]
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "254"))
+# Trailing context carried into the next chunk when prose is split for size (not used for table rows)
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+# Page, slide and heading boundaries only start a new chunk once the current one has this many tokens
+CHUNK_MIN_TOKENS = int(os.getenv("CHUNK_MIN_TOKENS", "64"))
+
+# Location fields copied from blocks into chunk metadata; ranges get a "<field>_end" companion
+_RANGE_FIELDS = ("page", "slide")
+_SENTENCE_RE = re.compile(r"(?<=[.!?;:])\s+|\n+")
+_WORD_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+logger = logging.getLogger("ingestion.chunking")
+
+
+class TokenCounter:
+    """Word-piece counts and token spans, via the model's tokenizer when available"""
+
+    def __init__(self, name: str = CHUNK_TOKENIZER):
+        self.tokenizer = None
+        if TOKENIZERS_AVAILABLE:
+            try:
+                self.tokenizer = Tokenizer.from_pretrained(name)
+                self.tokenizer.no_truncation()
+                self.tokenizer.no_padding()
+            except Exception as e:
+                logger.warning("Could not load tokenizer %s (%s); using an approximate token count", name, e)
+        else:
+            logger.warning("tokenizers not installed; using an approximate token count")
+
+    def count(self, texts: List[str]) -> List[int]:
+        """Token counts of texts, without special tokens"""
+        if not texts:
+            return []
+        if self.tokenizer is not None:
+            return [len(enc.ids) for enc in self.tokenizer.encode_batch(texts, add_special_tokens=False)]
+        return [len(self._approx_spans(text)) for text in texts]
+
+    def spans(self, text: str) -> List[Tuple[int, int]]:
+        """Character (start, end) of each token of text"""
+        if self.tokenizer is not None:
+            return list(self.tokenizer.encode(text, add_special_tokens=False).offsets)
+        return self._approx_spans(text)
+
+    @staticmethod
+    def _approx_spans(text: str) -> List[Tuple[int, int]]:
+        # Words and punctuation; long words split into ~6-char pieces like WordPiece tends to
+        spans = []
+        for match in _WORD_RE.finditer(text):
+            start, end = match.span()
+            pieces = max(1, math.ceil((end - start) / 6)) if end - start > 8 else 1
+            step = math.ceil((end - start) / pieces)
+            spans.extend((s, min(s + step, end)) for s in range(start, end, step))
+        return spans
+
+
+_token_counter: Optional[TokenCounter] = None
+_token_counter_lock = threading.Lock()
+
+def get_token_counter() -> TokenCounter:
+    """Get or create the token counter singleton"""
+    global _token_counter
+    with _token_counter_lock:
+        if _token_counter is None:
+            _token_counter = TokenCounter()
+        return _token_counter
+
+
+def _split_long(text: str, budget: int, counter: TokenCounter) -> List[Tuple[str, int]]:
+    """Split an oversized block at sentence/line ends, falling back to token windows"""
+    pieces: List[Tuple[str, int]] = []
+    sentences = [s for s in _SENTENCE_RE.split(text) if s.strip()]
+    for sentence, tokens in zip(sentences, counter.count(sentences)):
+        if tokens <= budget:
+            pieces.append((sentence, tokens))
+            continue
+        spans = counter.spans(sentence)
+        for start in range(0, len(spans), budget):
+            window = spans[start:start + budget]
+            pieces.append((sentence[window[0][0]:window[-1][1]], len(window)))
+
+    # Re-pack sentences greedily so pieces fill the budget
+    packed: List[Tuple[str, int]] = []
+    for sentence, tokens in pieces:
+        if packed and packed[-1][1] + tokens <= budget:
+            packed[-1] = (packed[-1][0] + " " + sentence, packed[-1][1] + tokens)
+        else:
+            packed.append((sentence, tokens))
+    return packed
+
+
+def _chunk_metadata(blocks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Location of a chunk: first/last page or slide, sheet and section (None values omitted)"""
+    metadata: Dict[str, Any] = {}
+    for field in _RANGE_FIELDS:
+        values = [b[field] for b in blocks if b.get(field) is not None]
+        if values:
+            metadata[field] = values[0]
+            if values[-1] != values[0]:
+                metadata[f"{field}_end"] = values[-1]
+    for field in ("sheet", "section"):
+        value = next((b[field] for b in blocks if b.get(field)), None)
+        if value:
+            metadata[field] = value
+    return metadata
+
+
+class StreamingChunker:
+    """
+    Incremental chunk_blocks: feed groups of blocks as they are parsed and receive the chunks they complete.
+    Only the chunk being filled is held, so memory does not grow with the document.
+    """
+
+    def __init__(self, max_tokens: int = CHUNK_MAX_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+                 min_tokens: int = CHUNK_MIN_TOKENS, counter: Optional[TokenCounter] = None):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.min_tokens = min_tokens
+        self.counter = counter or get_token_counter()
+        self._header_tokens: Dict[str, int] = {}
+        self._current: List[Tuple[Dict[str, Any], int]] = []
+        self._current_tokens = 0
+        self._current_header: Optional[str] = None
+        self._previous: Optional[Dict[str, Any]] = None
+        self._chunks: List[Dict[str, Any]] = []
+
+    def _flush(self, carry: bool = False) -> None:
+        if not self._current:
+            return
+        header = self._current_header
+        parts = [header] if header else []
+        parts.extend(b["text"] for b, _ in self._current)
+        self._chunks.append({
+            "text": "\n".join(parts),
+            "tokens": self._current_tokens + self._header_tokens.get(header, 0),
+            "metadata": _chunk_metadata([b for b, _ in self._current]),
+        })
+        # Overlap: trailing prose blocks (never table rows or headings) that fit the overlap budget
+        kept: List[Tuple[Dict[str, Any], int]] = []
+        if carry and self.overlap_tokens > 0:
+            kept_tokens = 0
+            for block, tokens in reversed(self._current):
+                if block.get("kind") != "text" or kept_tokens + tokens > self.overlap_tokens:
+                    break
+                kept.insert(0, (block, tokens))
+                kept_tokens += tokens
+        self._current = kept
+        self._current_tokens = sum(tokens for _, tokens in kept)
+
+    def feed(self, blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Add the next blocks in document order; returns the chunks completed by them"""
+        blocks = [b for b in blocks if (b.get("text") or "").strip()]
+        if not blocks:
+            return []
+
+        headers = sorted({b["header"] for b in blocks if b.get("header")} - self._header_tokens.keys())
+        self._header_tokens.update(zip(headers, self.counter.count(headers)))
+        block_tokens = self.counter.count([b["text"] for b in blocks])
+
+        for block, tokens in zip(blocks, block_tokens):
+            header = block.get("header")
+            budget = max(1, self.max_tokens - self._header_tokens.get(header, 0))
+
+            previous = self._previous
+            if previous is not None:
+                if block.get("sheet") != previous.get("sheet") or header != self._current_header:
+                    # Sheets (and their column headers) never share a chunk
+                    self._flush()
+                elif self._current_tokens >= self.min_tokens and (
+                    block.get("kind") == "heading"
+                    or block.get("page") != previous.get("page")
+                    or block.get("slide") != previous.get("slide")
+                ):
+                    self._flush()
+            self._current_header = header
+            self._previous = block
+
+            if tokens > budget:
+                # One block larger than a chunk: emit it in sentence-aligned pieces of its own
+                self._flush()
+                for text, piece_tokens in _split_long(block["text"], budget, self.counter):
+                    self._current = [({**block, "text": text}, piece_tokens)]
+                    self._current_tokens = piece_tokens
+                    self._flush()
+                continue
+
+            if self._current_tokens + tokens > budget:
+                self._flush(carry=True)
+                if self._current_tokens + tokens > budget:
+                    self._current, self._current_tokens = [], 0
+            self._current.append((block, tokens))
+            self._current_tokens += tokens
+
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Flush the chunk being filled at the end of the document"""
+        self._flush()
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+
+def iter_chunks(block_groups: Iterable[List[Dict[str, Any]]], max_tokens: int = CHUNK_MAX_TOKENS,
+                overlap_tokens: int = CHUNK_OVERLAP_TOKENS, min_tokens: int = CHUNK_MIN_TOKENS,
+                counter: Optional[TokenCounter] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Chunks of a stream of block groups (file_parsers.iter_blocks_from_bytes), yielded as soon as each is complete
+
+    Args:
+        block_groups: Lists of blocks in document order
+        max_tokens, overlap_tokens, min_tokens, counter: As for chunk_blocks
+
+    Yields:
+        {"text", "tokens", "metadata"} chunks, identical to chunk_blocks over the concatenated blocks
+    """
+    chunker = StreamingChunker(max_tokens, overlap_tokens, min_tokens, counter)
+    for blocks in block_groups:
+        yield from chunker.feed(blocks)
+    yield from chunker.finish()
+
+
+def chunk_blocks(blocks: List[Dict[str, Any]], max_tokens: int = CHUNK_MAX_TOKENS,
+                 overlap_tokens: int = CHUNK_OVERLAP_TOKENS, min_tokens: int = CHUNK_MIN_TOKENS,
+                 counter: Optional[TokenCounter] = None) -> List[Dict[str, Any]]:
+    """
+    Pack parser blocks into token-budgeted chunks
+
+    Args:
+        blocks: Blocks from file_parsers.extract_blocks_from_bytes
+        max_tokens: Token budget per chunk (model window minus special tokens)
+        overlap_tokens: Trailing prose carried into the next chunk when one is split for size
+        min_tokens: Fill level at which page/slide/heading boundaries start a new chunk
+        counter: Token counter (defaults to the embedding model's tokenizer)
+
+    Returns:
+        [{"text", "tokens", "metadata": {page, page_end, slide, slide_end, sheet, section}}, ...]
+    """
+    return list(iter_chunks([blocks], max_tokens, overlap_tokens, min_tokens, counter))
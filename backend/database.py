@@ -32,6 +32,38 @@ class UploadedSolution(Base):
     user_id = Column(String, index=True)
     file_path = Column(String)
 
+# Every vector id written per source file, so updated/deleted files can have their vectors removed
+class VectorManifest(Base):
+    __tablename__ = "vector_manifest"
+
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(String, index=True)  # 'sharepoint' | 'upload'
+    file_id = Column(String, index=True)  # SharePoint item id or UploadedSolution.id
+    namespace = Column(String, default="", index=True)  # vector index namespace ('' = default)
+    vector_id = Column(String, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('idx_manifest_source_file', 'source', 'file_id'),
+    )
+
+# Background ingestion of an uploaded solution (parse -> chunk -> embed -> upsert)
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    solution_id = Column(Integer, index=True)  # UploadedSolution.id
+    user_id = Column(String, index=True)
+    status = Column(String, default="queued")  # 'queued' | 'running' | 'completed' | 'failed'
+    chunks_total = Column(Integer, default=0)
+    chunks_skipped = Column(Integer, default=0)
+    chunks_embedded = Column(Integer, default=0)
+    vectors_written = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
 Base.metadata.create_all(bind=engine)
 
 # Lightweight migration: if the uploaded_solutions table exists but lacks the user_id column,
@@ -54,6 +86,12 @@ try:
             col_names = [c[1] for c in cols]
             if 'user_id' not in col_names:
                 conn.execute(text("ALTER TABLE uploaded_solutions ADD COLUMN user_id VARCHAR"))
+
+        # Manifest rows written before namespaces existed refer to the default namespace
+        cols = conn.execute(text("PRAGMA table_info('vector_manifest')")).fetchall()
+        if cols and 'namespace' not in [c[1] for c in cols]:
+            conn.execute(text("ALTER TABLE vector_manifest ADD COLUMN namespace VARCHAR DEFAULT ''"))
+            conn.execute(text("UPDATE vector_manifest SET namespace = '' WHERE namespace IS NULL"))
 except Exception:
     # If migration fails, don't crash the app startup; the error will surface on DB operations.
     pass
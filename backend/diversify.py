@@ -0,0 +1,178 @@
+"""
+Post-retrieval diversification
+Near-duplicate suppression (SimHash), maximal marginal relevance and merging of adjacent chunks
+"""
+
+import os
+import re
+from typing import List, Dict, Any, Optional
+from dotenv import load_dotenv
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    import mmh3
+    MMH3_AVAILABLE = True
+except ImportError:
+    MMH3_AVAILABLE = False
+
+load_dotenv()
+
+DIVERSIFY_ENABLED = (os.getenv("DIVERSIFY_ENABLED", "true").lower() in ("1", "true", "yes"))
+# 1.0 = pure relevance, 0.0 = pure novelty
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+# SimHash fingerprints within this Hamming distance are treated as the same passage
+NEAR_DUP_MAX_HAMMING = int(os.getenv("NEAR_DUP_MAX_HAMMING", "3"))
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def simhash64(text: str, shingle: int = 3) -> int:
+    """64-bit SimHash over word shingles (mmh3)"""
+    words = _WORD_RE.findall((text or "").lower())
+    if not words:
+        return 0
+    grams = [" ".join(words[i:i + shingle]) for i in range(max(1, len(words) - shingle + 1))]
+    if MMH3_AVAILABLE:
+        hashes = [mmh3.hash64(gram, signed=False)[0] for gram in grams]
+    else:
+        hashes = [hash(gram) & 0xFFFFFFFFFFFFFFFF for gram in grams]
+    if NUMPY_AVAILABLE:
+        bits = (np.asarray(hashes, dtype=np.uint64)[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)
+        weights = (2 * bits.astype(np.int64) - 1).sum(axis=0)
+    else:
+        weights = [sum(1 if (h >> bit) & 1 else -1 for h in hashes) for bit in range(64)]
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def drop_near_duplicates(candidates: List[Dict[str, Any]], max_hamming: int = NEAR_DUP_MAX_HAMMING) -> List[Dict[str, Any]]:
+    """Keep the first (highest ranked) of every group of near-identical passages"""
+    kept: List[Dict[str, Any]] = []
+    fingerprints: List[int] = []
+    for cand in candidates:
+        fp = simhash64(cand["text"])
+        if any(bin(fp ^ other).count("1") <= max_hamming for other in fingerprints):
+            continue
+        fingerprints.append(fp)
+        kept.append(cand)
+    return kept
+
+
+def mmr_select(candidates: List[Dict[str, Any]], k: int, lambda_: float = MMR_LAMBDA) -> List[Dict[str, Any]]:
+    """
+    Maximal marginal relevance over candidates given in relevance order.
+    Relevance comes from the first-stage (fused or reranked) rank so it agrees with the ranking upstream;
+    redundancy is the cosine similarity between candidate embeddings ("values").
+    Candidates without an embedding are never penalised for redundancy.
+    """
+    if not NUMPY_AVAILABLE or len(candidates) <= k:
+        return candidates[:k]
+    n = len(candidates)
+    relevance = np.array([1.0 - i / n for i in range(n)], dtype=np.float32)
+    dim = next((len(c["values"]) for c in candidates if c.get("values")), 0)
+    if not dim:
+        return candidates[:k]
+    vectors = np.zeros((n, dim), dtype=np.float32)
+    for i, cand in enumerate(candidates):
+        if cand.get("values"):
+            vec = np.asarray(cand["values"], dtype=np.float32)
+            norm = float(np.linalg.norm(vec))
+            vectors[i] = vec / norm if norm > 0 else vec
+    similarity = vectors @ vectors.T
+
+    selected = [0]
+    remaining = list(range(1, n))
+    while remaining and len(selected) < k:
+        redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+        scores = lambda_ * relevance[remaining] - (1 - lambda_) * redundancy
+        best = remaining[int(np.argmax(scores))]
+        selected.append(best)
+        remaining.remove(best)
+    return [candidates[i] for i in selected]
+
+
+def _strip_overlap(previous: str, following: str, max_overlap: int = 300) -> str:
+    """Remove the splitter's overlap from the start of the following chunk"""
+    limit = min(max_overlap, len(previous), len(following))
+    for size in range(limit, 15, -1):
+        if previous.endswith(following[:size]):
+            return following[size:]
+    return following
+
+
+def _file_key(cand: Dict[str, Any]) -> Optional[str]:
+    """
+    Unique document key: SharePoint item id, uploaded solution id, or the "<source>#<file key>"
+    prefix of the chunk id. The filename is only a last resort, since different uploads can share one.
+    """
+    metadata = cand.get("metadata") or {}
+    if metadata.get("sharepoint_file_id"):
+        return f"sharepoint:{metadata['sharepoint_file_id']}"
+    if metadata.get("solution_id") is not None:
+        return f"upload:{metadata['solution_id']}"
+    parts = str(cand.get("id") or "").split("#")
+    if len(parts) == 4:
+        return f"id:{parts[0]}#{parts[1]}"
+    return f"filename:{metadata['filename']}" if metadata.get("filename") else None
+
+
+def merge_adjacent_chunks(candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Merge selected chunks that are consecutive in the same file (by chunk_index) into one passage.
+    All passages from a file are emitted together, in chunk order, at the position of the file's
+    best-ranked chunk.
+    """
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    order: List[tuple] = []
+    for rank, cand in enumerate(candidates):
+        metadata = cand.get("metadata") or {}
+        key = _file_key(cand)
+        index = metadata.get("chunk_index")
+        if key is None or index is None:
+            group_key = ("__single__", rank)
+        else:
+            group_key = ("file", key)
+        if group_key not in groups:
+            groups[group_key] = []
+            order.append(group_key)
+        groups[group_key].append(cand)
+
+    merged: List[Dict[str, Any]] = []
+    for group_key in order:
+        members = groups[group_key]
+        if len(members) == 1:
+            merged.append(members[0])
+            continue
+        members = sorted(members, key=lambda c: int(c["metadata"]["chunk_index"]))
+        run = [members[0]]
+        for cand in members[1:]:
+            if int(cand["metadata"]["chunk_index"]) == int(run[-1]["metadata"]["chunk_index"]) + 1:
+                run.append(cand)
+            else:
+                merged.append(_join_run(run))
+                run = [cand]
+        merged.append(_join_run(run))
+    return merged
+
+
+def _join_run(run: List[Dict[str, Any]]) -> Dict[str, Any]:
+    if len(run) == 1:
+        return run[0]
+    text = run[0]["text"]
+    for cand in run[1:]:
+        tail = _strip_overlap(text, cand["text"])
+        text += tail if len(tail) < len(cand["text"]) else "\n" + tail
+    metadata = dict(run[0]["metadata"])
+    metadata["merged_chunks"] = [int(c["metadata"]["chunk_index"]) for c in run]
+    return {"id": run[0]["id"], "text": text, "metadata": metadata, "values": run[0].get("values")}
+
+
+def diversify(candidates: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+    """Near-duplicate removal, MMR selection of k, then adjacent-chunk merging"""
+    unique = drop_near_duplicates(candidates)
+    selected = mmr_select(unique, k)
+    return merge_adjacent_chunks(selected)
@@ -0,0 +1,25 @@
+"""
+Shared embedding model
+A single all-MiniLM-L6-v2 instance for retrieval, upload ingestion and SharePoint sync.
+langchain_huggingface pulls in torch and transformers, so it is imported on first use.
+"""
+
+import logging
+import threading
+from typing import Any, Optional
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Singleton instance
+_embedding_model: Optional[Any] = None
+_embedding_model_lock = threading.Lock()
+
+def get_embedding_model():
+    """Get or create the embedding model singleton (HuggingFaceEmbeddings)"""
+    global _embedding_model
+    with _embedding_model_lock:
+        if _embedding_model is None:
+            from langchain_huggingface import HuggingFaceEmbeddings
+            logging.getLogger("retrieval.embeddings").info("Loading embedding model: %s", EMBEDDING_MODEL_NAME)
+            _embedding_model = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+        return _embedding_model
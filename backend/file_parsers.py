@@ -1,15 +1,42 @@
 """
 Modular file parsers for extracting text from various file formats
 Supports: DOCX, PPTX, XLSX, CSV, PDF, TXT
+
+One parsing engine for every ingestion path (RFP upload, solution upload, SharePoint sync).
+Each format is parsed into structural blocks (paragraphs, headings, table rows) tagged with
+their page, slide, sheet and section, so chunking can follow document structure.
+extract_text() renders the same blocks back to a flat string.
+
+PDF pages are extracted in parallel on a process pool; each document gets a timeout and
+workers run under a memory cap, so a pathological PDF fails on its own instead of taking
+down the server. DOCX and PPTX are read by streaming their XML parts with lxml iterparse
+rather than building the python-docx/python-pptx object model.
 """
 
 import io
+import os
 import re
-from typing import Optional
+import time
+import codecs
+import zipfile
+import posixpath
+import tempfile
+import threading
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+from itertools import groupby, islice
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 from pathlib import Path
+from dotenv import load_dotenv
+
+from parse_cache import get_parse_cache, cache_key
 
 try:
     from docx import Document
+    from docx.table import Table as DocxTable
+    from docx.styles import BabelFish
     DOCX_AVAILABLE = True
 except ImportError:
     DOCX_AVAILABLE = False
@@ -21,11 +48,30 @@ except ImportError:
     PPTX_AVAILABLE = False
 
 try:
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+try:
+    import numpy as np
     import pandas as pd
     PANDAS_AVAILABLE = True
 except ImportError:
     PANDAS_AVAILABLE = False
 
+try:
+    import openpyxl
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+try:
+    from charset_normalizer import from_bytes as detect_charset
+    CHARSET_NORMALIZER_AVAILABLE = True
+except ImportError:
+    CHARSET_NORMALIZER_AVAILABLE = False
+
 try:
     import fitz  # PyMuPDF
     PYMUPDF_AVAILABLE = True
@@ -38,227 +84,922 @@ try:
 except ImportError:
     PYPDF2_AVAILABLE = False
 
+try:
+    import resource  # POSIX only
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+load_dotenv()
+
+# Parse PDFs on a process pool (false: parse in the calling thread, without timeout or memory cap)
+PARSE_PROCESS_POOL = (os.getenv("PARSE_PROCESS_POOL", "true").lower() in ("1", "true", "yes"))
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Wall-clock budget per document
+PARSE_TIMEOUT_SECONDS = float(os.getenv("PARSE_TIMEOUT_SECONDS", "120"))
+# Address-space cap per parser worker (POSIX; 0 disables)
+PARSE_MEMORY_LIMIT_MB = int(os.getenv("PARSE_MEMORY_LIMIT_MB", "2048"))
+# Pages per pool task; a 200-page PDF is split into ranges parsed concurrently
+PARSE_PDF_PAGES_PER_TASK = int(os.getenv("PARSE_PDF_PAGES_PER_TASK", "16"))
+
+# Read DOCX/PPTX by streaming their XML (false: python-docx/python-pptx object model)
+PARSE_OFFICE_XML = (os.getenv("PARSE_OFFICE_XML", "true").lower() in ("1", "true", "yes"))
+
+# Rows read per sheet / CSV file (0 = no cap); very large pricing sheets are truncated
+PARSE_MAX_ROWS_PER_SHEET = int(os.getenv("PARSE_MAX_ROWS_PER_SHEET", "20000"))
+# Bytes sampled for encoding detection of non-UTF-8 text
+_CHARSET_SAMPLE_BYTES = 1024 * 1024
+# Streaming granularity: sheet/CSV rows per group, and blocks per group for DOCX sections and text
+_ROW_GROUP_SIZE = 1000
+_STREAM_GROUP_BLOCKS = 256
+# Streamed documents with more text than this are not written to the parse cache
+_STREAM_CACHE_MAX_CHARS = 16 * 1024 * 1024
+
+# PDF text blocks this much larger than the page's body text (and short) are treated as headings
+_PDF_HEADING_SIZE_RATIO = 1.2
+_PDF_HEADING_MAX_CHARS = 150
+
+# Bump when block output changes so cached parses (parse_cache.py) are not reused
+PARSER_VERSION = "4"
+
+# A block: {"text", "kind": "heading" | "text" | "row", optional "page" / "slide" / "sheet" / "section",
+# optional "header" (context repeated at the top of every chunk of the block's sheet, e.g. column names)}
+Block = Dict[str, Any]
+
+_MARKDOWN_HEADING_RE = re.compile(r"^#{1,6}\s+\S")
+_BLANK_LINE_RE = re.compile(r"\n\s*\n")
+
+
+def _group(blocks: List[Block], key: str):
+    """Consecutive blocks sharing the same page/slide/sheet"""
+    return groupby(blocks, key=lambda block: block.get(key))
+
+
+def _format_rows(df, names: List[str]) -> List[Tuple[int, str]]:
+    """
+    (row position, "col: value | col: value") for every row with a value.
+    Built column by column on object arrays instead of per-row iterrows (which also upcasts ints to floats).
+    """
+    joined = np.full(len(df), "", dtype=object)
+    for position, name in enumerate(names):
+        column = df.iloc[:, position]
+        present = column.notna().to_numpy()
+        if not present.any():
+            continue
+        values = column.to_numpy(dtype=object)[present]
+        joined[present] = joined[present] + f" | {name}: " + np.array([str(v) for v in values], dtype=object)
+    return [(int(i), joined[i][3:]) for i in np.flatnonzero(joined != "")]
+
+
+def _detect_encoding(file_content: bytes) -> str:
+    """UTF-8 (BOM tolerated) when the bytes are valid UTF-8, otherwise the encoding charset-normalizer detects"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        # Validated slice by slice, so no second full-size copy of the text is made
+        for start in range(0, len(file_content), _CHARSET_SAMPLE_BYTES):
+            decoder.decode(file_content[start:start + _CHARSET_SAMPLE_BYTES])
+        decoder.decode(b"", final=True)
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        pass
+    if CHARSET_NORMALIZER_AVAILABLE:
+        match = detect_charset(file_content[:_CHARSET_SAMPLE_BYTES]).best()
+        if match is not None:
+            return match.encoding
+    return "latin-1"
+
+
+class DocumentParseError(ValueError):
+    """A document could not be parsed (unsupported type, corrupt, timed out or over the memory cap)"""
+
+
+def _limit_worker_memory(limit_mb: int) -> None:
+    """Parser worker initializer: cap the address space so runaway documents raise MemoryError"""
+    if RESOURCE_AVAILABLE and limit_mb > 0:
+        limit = limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _open_pdf(source: Union[bytes, str]) -> "fitz.Document":
+    """PyMuPDF document from bytes, or from a file path (pages are then read from disk as needed)"""
+    if isinstance(source, str):
+        return fitz.open(source, filetype="pdf")
+    return fitz.open(stream=source, filetype="pdf")
+
+
+def _pdf_blocks_range(source: Union[bytes, str], start: int, end: int) -> List[Block]:
+    """Blocks of PDF pages [start, end) via PyMuPDF, from PDF bytes or a spooled file path; runs in parser workers"""
+    blocks: List[Block] = []
+    with _open_pdf(source) as pdf_doc:
+        for page_num in range(start, end):
+            page_blocks = []
+            sizes: Counter = Counter()
+            for block in pdf_doc[page_num].get_text("dict", flags=fitz.TEXTFLAGS_TEXT)["blocks"]:
+                if block.get("type") != 0:
+                    continue
+                lines = ["".join(span["text"] for span in line["spans"]) for line in block["lines"]]
+                text = "\n".join(lines).strip()
+                if not text:
+                    continue
+                span_sizes = [span["size"] for line in block["lines"] for span in line["spans"] if span["text"].strip()]
+                for line in block["lines"]:
+                    for span in line["spans"]:
+                        sizes[round(span["size"], 1)] += len(span["text"].strip())
+                page_blocks.append((text, max(span_sizes), len(lines)))
+
+            # Body size is the size carrying most characters on the page
+            body_size = sizes.most_common(1)[0][0] if sizes else 0
+            for text, size, line_count in page_blocks:
+                is_heading = (body_size and size >= body_size * _PDF_HEADING_SIZE_RATIO
+                              and line_count <= 3 and len(text) <= _PDF_HEADING_MAX_CHARS)
+                blocks.append({"text": text, "kind": "heading" if is_heading else "text", "page": page_num + 1})
+    return blocks
+
+
+# Parser process pool (spawned: the API process runs threads and holds torch state)
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_lock = threading.Lock()
+
+def _get_parse_pool() -> ProcessPoolExecutor:
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ProcessPoolExecutor(
+                max_workers=PARSE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_limit_worker_memory,
+                initargs=(PARSE_MEMORY_LIMIT_MB,),
+            )
+        return _parse_pool
+
+
+def _discard_parse_pool(pool: ProcessPoolExecutor) -> None:
+    """Kill a pool's workers (e.g. one stuck on a document past its timeout); the next call starts a fresh pool"""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is pool:
+            _parse_pool = None
+    # Documents still in flight on this pool see BrokenProcessPool and are resubmitted once
+    terminate = getattr(pool, "terminate_workers", None)  # Python 3.14+
+    if terminate is not None:
+        terminate()
+        return
+    for process in list((getattr(pool, "_processes", None) or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def warm_up_parse_pool() -> None:
+    """Start the parser workers ahead of the first PDF (spawned workers import this module)"""
+    if PARSE_PROCESS_POOL and PYMUPDF_AVAILABLE:
+        list(_get_parse_pool().map(abs, range(PARSE_WORKERS)))
+
+
+def shutdown_parse_pool() -> None:
+    """Stop the parser workers (they are not daemons, so a multiprocessing child must do this before it exits)"""
+    global _parse_pool
+    with _parse_pool_lock:
+        pool, _parse_pool = _parse_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _pdf_page_ranges(page_count: int, pages_per_task: int = PARSE_PDF_PAGES_PER_TASK) -> List[Tuple[int, int]]:
+    step = max(1, pages_per_task)
+    return [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+
+
+def _spool_pdf(file_content: bytes) -> Optional[str]:
+    """Write PDF bytes to a uniquely named temp file for the parser workers; None if that fails"""
+    try:
+        fd, path = tempfile.mkstemp(prefix="pdf-parse-", suffix=".pdf")
+        with os.fdopen(fd, "wb") as spool:
+            spool.write(file_content)
+        return path
+    except OSError as e:
+        print(f"Could not spool PDF for the parser pool, sending bytes instead: {e}")
+        return None
+
+
+def _iter_pdf_ranges(file_content: bytes, page_count: int) -> Iterator[List[Block]]:
+    """
+    Blocks of each page range, in order. Ranges are parsed concurrently on the parser pool with at most
+    PARSE_WORKERS * 2 in flight, so parsed pages never pile up ahead of a slow consumer.
+    The timeout counts time spent waiting on the workers, not time the consumer spends between ranges.
+    The PDF is written once to a temp file and each task gets its path, so the document is not
+    pickled to the workers once per range.
+    """
+    ranges = _pdf_page_ranges(page_count)
+    if not PARSE_PROCESS_POOL:
+        for start, end in ranges:
+            yield _pdf_blocks_range(file_content, start, end)
+        return
+
+    spool_path = _spool_pdf(file_content) if len(ranges) > 1 else None
+    try:
+        yield from _iter_pdf_ranges_in_pool(spool_path or file_content, ranges, page_count)
+    finally:
+        if spool_path is not None:
+            try:
+                os.unlink(spool_path)
+            except OSError as e:
+                print(f"Could not remove spooled PDF {spool_path}: {e}")
+
+
+def _iter_pdf_ranges_in_pool(source: Union[bytes, str], ranges: List[Tuple[int, int]], page_count: int) -> Iterator[List[Block]]:
+    window = max(1, PARSE_WORKERS * 2)
+    waited = 0.0
+    retried = False
+    next_range = 0
+    in_flight: deque = deque()
+    pool = _get_parse_pool()
+    while next_range < len(ranges) or in_flight:
+        wait_start = time.monotonic()
+        try:
+            while next_range < len(ranges) and len(in_flight) < window:
+                start, end = ranges[next_range]
+                in_flight.append((next_range, pool.submit(_pdf_blocks_range, source, start, end)))
+                next_range += 1
+            blocks = in_flight[0][1].result(timeout=max(0.0, PARSE_TIMEOUT_SECONDS - waited))
+        except FutureTimeoutError:
+            _discard_parse_pool(pool)
+            raise DocumentParseError(f"PDF parsing timed out after {PARSE_TIMEOUT_SECONDS:g}s ({page_count} pages)")
+        except MemoryError:
+            raise DocumentParseError(f"PDF parsing exceeded the {PARSE_MEMORY_LIMIT_MB} MB worker memory limit")
+        except BrokenProcessPool:
+            # A worker died (memory cap, crash) or the pool was discarded for another document's timeout
+            _discard_parse_pool(pool)
+            waited += time.monotonic() - wait_start
+            if retried or waited >= PARSE_TIMEOUT_SECONDS:
+                raise DocumentParseError("PDF parser worker crashed (possibly over the memory limit)")
+            # Resubmit every range not yet yielded to a fresh pool
+            retried = True
+            next_range = in_flight[0][0]
+            in_flight.clear()
+            pool = _get_parse_pool()
+            continue
+        waited += time.monotonic() - wait_start
+        in_flight.popleft()
+        yield blocks
+
+
+def _parse_document_task(parser_name: str, file_content: bytes) -> List[List[Block]]:
+    """All block groups of one document via FileParser.<parser_name>; runs in parser workers"""
+    return list(getattr(FileParser, parser_name)(file_content))
+
+
+def _parse_in_pool(parser_name: str, file_content: bytes, filename: str) -> List[List[Block]]:
+    """
+    Parse a whole (non-PDF) document on the parser pool, so CPU-bound DOCX/PPTX/XLSX parsing of
+    several files runs in parallel and outside the GIL. Same timeout, memory cap and one retry
+    on a broken pool as PDF page ranges.
+    """
+    for attempt in range(2):
+        pool = _get_parse_pool()
+        future = pool.submit(_parse_document_task, parser_name, file_content)
+        try:
+            return future.result(timeout=PARSE_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            _discard_parse_pool(pool)
+            raise DocumentParseError(f"Parsing {filename} timed out after {PARSE_TIMEOUT_SECONDS:g}s")
+        except MemoryError:
+            raise DocumentParseError(f"Parsing {filename} exceeded the {PARSE_MEMORY_LIMIT_MB} MB worker memory limit")
+        except BrokenProcessPool:
+            _discard_parse_pool(pool)
+    raise DocumentParseError(f"Parser worker crashed on {filename} (possibly over the memory limit)")
+
+
+def _assign_sections(blocks: List[Block], section: Optional[str] = None) -> Optional[str]:
+    """Set each block's section to the text of the closest preceding heading; returns the section in effect at the end"""
+    for block in blocks:
+        if block.get("kind") == "heading":
+            section = block["text"]
+        if section:
+            block["section"] = section
+    return section
+
+
+def _slices(items: List[Any], size: int) -> Iterator[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# --- Office Open XML streaming (DOCX/PPTX) ---
+
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_P_NS = "{http://schemas.openxmlformats.org/presentationml/2006/main}"
+_A_NS = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+_R_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+_PKG_RELATIONSHIP = "{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"
+
+# Run content as python-docx renders it in Paragraph.text (w:br is handled separately by break type)
+_DOCX_RUN_TEXT = {_W_NS + "tab": "\t", _W_NS + "ptab": "\t", _W_NS + "cr": "\n", _W_NS + "noBreakHyphen": "-"}
+_PPTX_SHAPE_TAGS = tuple(_P_NS + tag for tag in ("sp", "grpSp", "graphicFrame", "cxnSp", "pic", "contentPart"))
+
+
+def _xml_parser():
+    return etree.XMLParser(resolve_entities=False, huge_tree=True)
+
+
+def _package_rels(archive: zipfile.ZipFile, part: str) -> Dict[str, Tuple[str, str]]:
+    """rId -> (relationship type, target part name) for a part of an Office zip package ("" for the package itself)"""
+    folder, name = posixpath.split(part)
+    try:
+        root = etree.fromstring(archive.read(posixpath.join(folder, "_rels", name + ".rels")), _xml_parser())
+    except KeyError:
+        return {}
+    rels = {}
+    for rel in root.iter(_PKG_RELATIONSHIP):
+        target = rel.get("Target", "")
+        if rel.get("TargetMode") == "External" or not target:
+            continue
+        target = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join(folder, target))
+        rels[rel.get("Id")] = (rel.get("Type", "").rsplit("/", 1)[-1], target)
+    return rels
+
+
+def _related_part(rels: Dict[str, Tuple[str, str]], rel_type: str, default: Optional[str] = None) -> Optional[str]:
+    return next((target for kind, target in rels.values() if kind == rel_type), default)
+
+
+def _iterparse_top_level(stream, tags: Tuple[str, ...], container: str) -> Iterator[Any]:
+    """Elements with one of tags that are direct children of container, freed once the caller moves on"""
+    for _, element in etree.iterparse(stream, events=("end",), tag=tags, resolve_entities=False, huge_tree=True):
+        parent = element.getparent()
+        if parent is None or parent.tag != container:
+            continue
+        yield element
+        # Parsed siblings are dropped so the tree never holds more than the current element
+        element.clear()
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+def _docx_run_text(run, parts: List[str]) -> None:
+    for child in run:
+        tag = child.tag
+        if tag == _W_NS + "t":
+            parts.append(child.text or "")
+        elif tag == _W_NS + "br":
+            # Page and column breaks have no text
+            if child.get(_W_NS + "type", "textWrapping") == "textWrapping":
+                parts.append("\n")
+        elif tag in _DOCX_RUN_TEXT:
+            parts.append(_DOCX_RUN_TEXT[tag])
+
+
+def _docx_paragraph_text(paragraph) -> str:
+    """Text of a w:p: its runs and hyperlink runs"""
+    parts: List[str] = []
+    for child in paragraph:
+        if child.tag == _W_NS + "r":
+            _docx_run_text(child, parts)
+        elif child.tag == _W_NS + "hyperlink":
+            for run in child.iterchildren(_W_NS + "r"):
+                _docx_run_text(run, parts)
+    return "".join(parts)
+
+
+def _docx_int_property(properties, name: str, default: int) -> int:
+    element = properties.find(_W_NS + name) if properties is not None else None
+    value = element.get(_W_NS + "val") if element is not None else None
+    return int(value) if value is not None else default
+
+
+def _docx_table_rows(table) -> Iterator[List[str]]:
+    """
+    Cell texts of each row as python-docx's row.cells gives them: a cell spanning columns is repeated
+    per column, and a vertically merged continuation takes the text of the cell above
+    """
+    above: Dict[int, Tuple[str, int]] = {}
+    for row in table.iterchildren(_W_NS + "tr"):
+        offset = _docx_int_property(row.find(_W_NS + "trPr"), "gridBefore", 0)
+        current: Dict[int, Tuple[str, int]] = {}
+        texts: List[str] = []
+        for cell in row.iterchildren(_W_NS + "tc"):
+            properties = cell.find(_W_NS + "tcPr")
+            span = _docx_int_property(properties, "gridSpan", 1)
+            merge = properties.find(_W_NS + "vMerge") if properties is not None else None
+            if merge is not None and merge.get(_W_NS + "val", "continue") == "continue":
+                text, cell_span = above.get(offset, ("", span))
+            else:
+                text = "\n".join(_docx_paragraph_text(p) for p in cell.iterchildren(_W_NS + "p"))
+                cell_span = span
+            texts.extend([text] * cell_span)
+            current[offset] = (text, cell_span)
+            offset += span
+        above = current
+        yield texts
+
+
+def _docx_paragraph_styles(archive: zipfile.ZipFile, styles_part: Optional[str]) -> Tuple[Dict[str, Tuple[str, str]], str]:
+    """styleId -> (style type, UI name) from styles.xml, plus the default paragraph style's name"""
+    styles: Dict[str, Tuple[str, str]] = {}
+    default = ""
+    if not styles_part:
+        return styles, default
+    try:
+        root = etree.fromstring(archive.read(styles_part), _xml_parser())
+    except KeyError:
+        return styles, default
+    for style in root.iterchildren(_W_NS + "style"):
+        name_element = style.find(_W_NS + "name")
+        name = name_element.get(_W_NS + "val") if name_element is not None else None
+        name = BabelFish.internal2ui(name) if name else ""
+        style_type = style.get(_W_NS + "type", "paragraph")
+        styles.setdefault(style.get(_W_NS + "styleId"), (style_type, name))
+        if style_type == "paragraph" and style.get(_W_NS + "default") in ("1", "true", "on"):
+            default = name
+    return styles, default
+
+
+def _pptx_text(text_body) -> str:
+    """Text of a p:txBody/a:txBody as python-pptx renders it: paragraphs on lines, soft breaks as \\v"""
+    if text_body is None:
+        return ""
+    paragraphs = []
+    for paragraph in text_body.iterchildren(_A_NS + "p"):
+        parts = []
+        for child in paragraph:
+            if child.tag in (_A_NS + "r", _A_NS + "fld"):
+                text = child.find(_A_NS + "t")
+                parts.append((text.text if text is not None else None) or "")
+            elif child.tag == _A_NS + "br":
+                parts.append("\v")
+        paragraphs.append("".join(parts))
+    return "\n".join(paragraphs)
+
+
+def _pptx_slide_blocks(archive: zipfile.ZipFile, part: str, slide_num: int) -> List[Block]:
+    """Blocks of one slide part; the first placeholder with idx 0 is the title (as slide.shapes.title)"""
+    entries: List[Tuple[str, str, Optional[str]]] = []
+    title_id: Optional[str] = None
+    title = ""
+    with archive.open(part) as stream:
+        for shape in _iterparse_top_level(stream, _PPTX_SHAPE_TAGS, _P_NS + "spTree"):
+            non_visual = shape[0] if len(shape) else None
+            shape_id = None
+            placeholder = None
+            if non_visual is not None:
+                properties = non_visual.find(_P_NS + "cNvPr")
+                shape_id = properties.get("id") if properties is not None else None
+                placeholder = non_visual.find(f"{_P_NS}nvPr/{_P_NS}ph")
+            if title_id is None and placeholder is not None and int(placeholder.get("idx", "0")) == 0:
+                title_id = shape_id or ""
+                if shape.tag == _P_NS + "sp":
+                    title = _pptx_text(shape.find(_P_NS + "txBody")).strip()
+
+            if shape.tag == _P_NS + "sp":
+                text = _pptx_text(shape.find(_P_NS + "txBody")).strip()
+                if text:
+                    entries.append((text, "text", shape_id))
+            elif shape.tag == _P_NS + "graphicFrame":
+                table = shape.find(f"{_A_NS}graphic/{_A_NS}graphicData/{_A_NS}tbl")
+                if table is None:
+                    continue
+                for row in table.iterchildren(_A_NS + "tr"):
+                    cells = [_pptx_text(cell.find(_A_NS + "txBody")).strip() for cell in row.iterchildren(_A_NS + "tc")]
+                    row_text = [text for text in cells if text]
+                    if row_text:
+                        entries.append((" | ".join(row_text), "row", None))
+
+    section = title or None
+    return [
+        {"text": text, "kind": "heading" if kind == "text" and title_id is not None and shape_id == title_id else kind,
+         "slide": slide_num, "section": section}
+        for text, kind, shape_id in entries
+    ]
+
+
 
 class FileParser:
     """Base class for file parsers"""
     
     @staticmethod
-    def extract_text(file_content: bytes, filename: str) -> Optional[str]:
+    def _block_parsers() -> Dict[str, Any]:
+        return {
+            '.docx': FileParser._iter_docx,
+            '.pptx': FileParser._iter_pptx,
+            '.xlsx': FileParser._iter_xlsx,
+            '.csv': FileParser._iter_csv,
+            '.pdf': FileParser._iter_pdf,
+            '.txt': FileParser._iter_text,
+        }
+    
+    @staticmethod
+    def iter_blocks(file_content: bytes, filename: str, fallback_to_text: bool = False,
+                    offload: bool = False) -> Iterator[List[Block]]:
         """
-        Extract text from file content based on file extension
+        Parse file content into groups of structural blocks, yielded as they are parsed
+        (a PDF page range, a slide, a DOCX section, a group of sheet rows)
         
         Args:
             file_content: Raw bytes of the file
             filename: Original filename (for extension detection)
+            fallback_to_text: Parse unsupported extensions as plain text instead of failing
+            offload: Parse non-PDF documents whole on the parser pool (for callers parsing many files
+                at once); PDFs always fan out by page range
         
-        Returns:
-            Extracted text or None if parsing fails
+        Yields:
+            Lists of blocks in document order
+        
+        Raises:
+            DocumentParseError: unsupported type, corrupt file, timeout or memory cap
+        
+        Results are cached by content hash (parse_cache.py), so the same bytes are parsed once.
         """
         file_ext = Path(filename).suffix.lower()
         
-        parsers = {
-            '.docx': FileParser._parse_docx,
-            '.pptx': FileParser._parse_pptx,
-            '.xlsx': FileParser._parse_xlsx,
-            '.csv': FileParser._parse_csv,
-            '.pdf': FileParser._parse_pdf,
-            '.txt': FileParser._parse_text,
-        }
-        
-        parser = parsers.get(file_ext)
+        parser = FileParser._block_parsers().get(file_ext)
         if not parser:
-            print(f"Unsupported file type: {file_ext}")
-            return None
+            if not fallback_to_text:
+                raise DocumentParseError(f"Unsupported file type: {file_ext}")
+            parser = FileParser._iter_text
+        
+        cache = get_parse_cache()
+        key = cache_key(file_content, f"{PARSER_VERSION}:{parser.__name__}:{PARSE_MAX_ROWS_PER_SHEET}") if cache else None
+        if cache is not None:
+            try:
+                cached = cache.get(key)
+            except Exception as e:
+                print(f"Parse cache read failed: {e}")
+                cached = None
+            if cached is not None:
+                yield from _slices(cached, _STREAM_GROUP_BLOCKS)
+                return
         
+        # Blocks are kept for the cache only while the document stays reasonably small
+        collected: Optional[List[Block]] = [] if cache is not None else None
+        collected_chars = 0
+        in_pool = offload and PARSE_PROCESS_POOL and parser is not FileParser._iter_pdf
         try:
-            return parser(file_content)
+            groups = _parse_in_pool(parser.__name__, file_content, filename) if in_pool else parser(file_content)
+            for blocks in groups:
+                if collected is not None:
+                    collected.extend(blocks)
+                    collected_chars += sum(len(block["text"]) for block in blocks)
+                    if collected_chars > _STREAM_CACHE_MAX_CHARS:
+                        collected = None
+                yield blocks
+        except DocumentParseError:
+            raise
         except Exception as e:
-            print(f"Error parsing {filename}: {e}")
+            raise DocumentParseError(f"Error parsing {filename}: {e}") from e
+        
+        if collected is not None:
+            try:
+                cache.put(key, collected)
+            except Exception as e:
+                print(f"Parse cache write failed: {e}")
+    
+    @staticmethod
+    def parse(file_content: bytes, filename: str, fallback_to_text: bool = False) -> List[Block]:
+        """
+        Parse file content into structural blocks based on file extension
+        
+        Args:
+            file_content: Raw bytes of the file
+            filename: Original filename (for extension detection)
+            fallback_to_text: Parse unsupported extensions as plain text instead of failing
+        
+        Returns:
+            List of blocks in document order
+        
+        Raises:
+            DocumentParseError: unsupported type, corrupt file, timeout or memory cap
+        """
+        return [block for blocks in FileParser.iter_blocks(file_content, filename, fallback_to_text) for block in blocks]
+    
+    @staticmethod
+    def parse_text(file_content: bytes, filename: str) -> str:
+        """Parse file content and render it as text; raises DocumentParseError"""
+        return FileParser.render_text(FileParser.parse(file_content, filename), filename)
+    
+    @staticmethod
+    def extract_blocks(file_content: bytes, filename: str, fallback_to_text: bool = False) -> Optional[List[Block]]:
+        """
+        Extract structural blocks from file content based on file extension
+        
+        Args:
+            file_content: Raw bytes of the file
+            filename: Original filename (for extension detection)
+            fallback_to_text: Parse unsupported extensions as plain text instead of failing
+        
+        Returns:
+            List of blocks in document order, or None if parsing fails
+        """
+        try:
+            return FileParser.parse(file_content, filename, fallback_to_text=fallback_to_text)
+        except DocumentParseError as e:
+            print(e)
+            return None
+    
+    @staticmethod
+    def extract_text(file_content: bytes, filename: str) -> Optional[str]:
+        """
+        Extract text from file content based on file extension
+        
+        Args:
+            file_content: Raw bytes of the file
+            filename: Original filename (for extension detection)
+        
+        Returns:
+            Extracted text or None if parsing fails
+        """
+        try:
+            return FileParser.parse_text(file_content, filename)
+        except DocumentParseError as e:
+            print(e)
             return None
     
     @staticmethod
-    def _parse_docx(file_content: bytes) -> str:
-        """Extract text from DOCX file"""
+    def _iter_docx(file_content: bytes) -> Iterator[List[Block]]:
+        """Paragraphs and table rows of a DOCX file in document order, one group per heading section"""
+        if PARSE_OFFICE_XML and LXML_AVAILABLE and DOCX_AVAILABLE:
+            return FileParser._iter_docx_xml(file_content)
+        return FileParser._iter_docx_object_model(file_content)
+    
+    @staticmethod
+    def _iter_docx_xml(file_content: bytes) -> Iterator[List[Block]]:
+        """_iter_docx_object_model's blocks, streamed from word/document.xml with each body element freed after use"""
+        with zipfile.ZipFile(io.BytesIO(file_content)) as archive:
+            document_part = _related_part(_package_rels(archive, ""), "officeDocument", "word/document.xml")
+            styles, default_style = _docx_paragraph_styles(archive, _related_part(_package_rels(archive, document_part), "styles"))
+            blocks: List[Block] = []
+            section = None
+            
+            with archive.open(document_part) as stream:
+                for element in _iterparse_top_level(stream, (_W_NS + "p", _W_NS + "tbl"), _W_NS + "body"):
+                    if element.tag == _W_NS + "tbl":
+                        for cells in _docx_table_rows(element):
+                            row_text = [text.strip() for text in cells if text.strip()]
+                            if row_text:
+                                blocks.append({"text": " | ".join(row_text), "kind": "row", "section": section})
+                    else:
+                        text = _docx_paragraph_text(element).strip()
+                        if not text:
+                            continue
+                        style_id = element.find(f"{_W_NS}pPr/{_W_NS}pStyle")
+                        style_id = style_id.get(_W_NS + "val") if style_id is not None else None
+                        # Unknown or non-paragraph style ids fall back to the default style, as in python-docx
+                        style_type, style_name = styles.get(style_id, ("", ""))
+                        if style_type != "paragraph":
+                            style_name = default_style
+                        if style_name.startswith("Heading") or style_name == "Title":
+                            if blocks:
+                                yield blocks
+                                blocks = []
+                            section = text
+                            blocks.append({"text": text, "kind": "heading", "section": section})
+                        else:
+                            blocks.append({"text": text, "kind": "text", "section": section})
+                    if len(blocks) >= _STREAM_GROUP_BLOCKS:
+                        yield blocks
+                        blocks = []
+            
+            if blocks:
+                yield blocks
+    
+    @staticmethod
+    def _iter_docx_object_model(file_content: bytes) -> Iterator[List[Block]]:
+        """Paragraphs and table rows via python-docx (reference for _iter_docx_xml)"""
         if not DOCX_AVAILABLE:
             print("python-docx not available")
-            return ""
+            return
         
         doc = Document(io.BytesIO(file_content))
-        text_parts = []
-        
-        # Extract paragraphs
-        for paragraph in doc.paragraphs:
-            if paragraph.text.strip():
-                text_parts.append(paragraph.text)
+        blocks: List[Block] = []
+        section = None
         
-        # Extract tables
-        for table in doc.tables:
-            for row in table.rows:
-                row_text = []
-                for cell in row.cells:
-                    if cell.text.strip():
-                        row_text.append(cell.text.strip())
-                if row_text:
-                    text_parts.append(" | ".join(row_text))
+        for item in doc.iter_inner_content():
+            if isinstance(item, DocxTable):
+                for row in item.rows:
+                    cells = [cell.text.strip() for cell in row.cells]
+                    row_text = [text for text in cells if text]
+                    if row_text:
+                        blocks.append({"text": " | ".join(row_text), "kind": "row", "section": section})
+                continue
+            
+            text = item.text.strip()
+            if not text:
+                continue
+            style_name = (item.style.name if item.style is not None else "") or ""
+            if style_name.startswith("Heading") or style_name == "Title":
+                if blocks:
+                    yield blocks
+                    blocks = []
+                section = text
+                blocks.append({"text": text, "kind": "heading", "section": section})
+            else:
+                blocks.append({"text": text, "kind": "text", "section": section})
+            if len(blocks) >= _STREAM_GROUP_BLOCKS:
+                yield blocks
+                blocks = []
         
-        return "\n\n".join(text_parts)
+        if blocks:
+            yield blocks
     
     @staticmethod
-    def _parse_pptx(file_content: bytes) -> str:
-        """Extract text from PPTX file"""
+    def _iter_pptx(file_content: bytes) -> Iterator[List[Block]]:
+        """Text frames and table rows, one group per slide; the slide title is its section"""
+        if PARSE_OFFICE_XML and LXML_AVAILABLE:
+            return FileParser._iter_pptx_xml(file_content)
+        return FileParser._iter_pptx_object_model(file_content)
+    
+    @staticmethod
+    def _iter_pptx_xml(file_content: bytes) -> Iterator[List[Block]]:
+        """_iter_pptx_object_model's blocks, streamed slide by slide from the slide XML parts"""
+        with zipfile.ZipFile(io.BytesIO(file_content)) as archive:
+            presentation_part = _related_part(_package_rels(archive, ""), "officeDocument", "ppt/presentation.xml")
+            rels = _package_rels(archive, presentation_part)
+            presentation = etree.fromstring(archive.read(presentation_part), _xml_parser())
+            slide_parts = [rels[slide_id.get(_R_ID)][1] for slide_id in presentation.iter(_P_NS + "sldId")
+                           if slide_id.get(_R_ID) in rels]
+            
+            for slide_num, part in enumerate(slide_parts, 1):
+                blocks = _pptx_slide_blocks(archive, part, slide_num)
+                if blocks:
+                    yield blocks
+    
+    @staticmethod
+    def _iter_pptx_object_model(file_content: bytes) -> Iterator[List[Block]]:
+        """Text frames and table rows via python-pptx (reference for _iter_pptx_xml)"""
         if not PPTX_AVAILABLE:
             print("python-pptx not available")
-            return ""
+            return
         
         presentation = Presentation(io.BytesIO(file_content))
-        text_parts = []
         
         for slide_num, slide in enumerate(presentation.slides, 1):
-            slide_parts = [f"Slide {slide_num}:"]
+            blocks: List[Block] = []
+            title_shape = slide.shapes.title
+            title = title_shape.text.strip() if title_shape is not None and title_shape.has_text_frame else ""
+            section = title or None
             
             for shape in slide.shapes:
                 # Extract text from text boxes
                 if hasattr(shape, "text") and shape.text.strip():
-                    slide_parts.append(shape.text)
+                    is_title = title_shape is not None and shape.shape_id == title_shape.shape_id
+                    blocks.append({"text": shape.text.strip(), "kind": "heading" if is_title else "text",
+                                   "slide": slide_num, "section": section})
                 
                 # Extract text from tables
                 if shape.has_table:
-                    table = shape.table
-                    for row in table.rows:
-                        row_text = []
-                        for cell in row.cells:
-                            if cell.text.strip():
-                                row_text.append(cell.text.strip())
+                    for row in shape.table.rows:
+                        cells = [cell.text.strip() for cell in row.cells]
+                        row_text = [text for text in cells if text]
                         if row_text:
-                            slide_parts.append(" | ".join(row_text))
+                            blocks.append({"text": " | ".join(row_text), "kind": "row",
+                                           "slide": slide_num, "section": section})
             
-            if len(slide_parts) > 1:  # More than just the slide number
-                text_parts.append("\n".join(slide_parts))
-        
-        return "\n\n---\n\n".join(text_parts)
+            if blocks:
+                yield blocks
     
     @staticmethod
-    def _parse_xlsx(file_content: bytes) -> str:
-        """Extract text from XLSX file"""
-        if not PANDAS_AVAILABLE:
-            print("pandas not available")
-            return ""
-        
-        excel_file = io.BytesIO(file_content)
-        text_parts = []
+    def _iter_xlsx(file_content: bytes) -> Iterator[List[Block]]:
+        """One block per row with its sheet name and column header; sheets streamed read-only in row groups"""
+        if not PANDAS_AVAILABLE or not OPENPYXL_AVAILABLE:
+            print("pandas/openpyxl not available")
+            return
         
+        workbook = openpyxl.load_workbook(io.BytesIO(file_content), read_only=True, data_only=True)
         try:
-            # Read all sheets
-            xls = pd.ExcelFile(excel_file)
-            for sheet_name in xls.sheet_names:
-                df = pd.read_excel(excel_file, sheet_name=sheet_name, engine='openpyxl')
-                
-                # Create descriptive text representation
-                sheet_parts = [f"Sheet: {sheet_name}"]
-                
-                # Add column headers
-                headers = [str(col) for col in df.columns if pd.notna(col)]
-                if headers:
-                    sheet_parts.append(f"Columns: {', '.join(headers)}")
+            for worksheet in workbook.worksheets:
+                rows = worksheet.iter_rows(values_only=True)
+                header_row = next(rows, None)
+                if header_row is None:
+                    continue
                 
-                # Add data rows as text descriptions
-                for idx, row in df.iterrows():
-                    row_text = []
-                    for col in df.columns:
-                        value = row[col]
-                        if pd.notna(value):
-                            row_text.append(f"{col}: {value}")
-                    
-                    if row_text:
-                        sheet_parts.append(f"Row {idx + 1}: " + " | ".join(row_text))
+                # Sheet name and column headers are repeated in every chunk of the sheet
+                header = f"Sheet: {worksheet.title}"
+                named = [str(value) for value in header_row if value is not None]
+                if named:
+                    header += f"\nColumns: {', '.join(named)}"
                 
-                text_parts.append("\n".join(sheet_parts))
-        
-        except Exception as e:
-            print(f"Error parsing XLSX: {e}")
-            return ""
-        
-        return "\n\n---\n\n".join(text_parts)
+                offset = 0
+                while not PARSE_MAX_ROWS_PER_SHEET or offset < PARSE_MAX_ROWS_PER_SHEET:
+                    limit = _ROW_GROUP_SIZE if not PARSE_MAX_ROWS_PER_SHEET else min(_ROW_GROUP_SIZE, PARSE_MAX_ROWS_PER_SHEET - offset)
+                    data = list(islice(rows, limit))
+                    if not data:
+                        break
+                    # Object dtype keeps cell values as openpyxl read them; row groups never upcast ints to floats
+                    df = pd.DataFrame(data, dtype=object)
+                    names = [str(header_row[i]) if i < len(header_row) and header_row[i] is not None else f"Unnamed: {i}"
+                             for i in range(df.shape[1])]
+                    blocks = [
+                        {"text": f"Row {offset + position + 1}: {text}", "kind": "row",
+                         "sheet": str(worksheet.title), "header": header}
+                        for position, text in _format_rows(df, names)
+                    ]
+                    offset += len(data)
+                    if blocks:
+                        yield blocks
+                if PARSE_MAX_ROWS_PER_SHEET and offset >= PARSE_MAX_ROWS_PER_SHEET and next(rows, None) is not None:
+                    print(f"Sheet {worksheet.title}: only the first {PARSE_MAX_ROWS_PER_SHEET} rows are indexed")
+        finally:
+            workbook.close()
     
     @staticmethod
-    def _parse_csv(file_content: bytes) -> str:
-        """Extract text from CSV file"""
+    def _iter_csv(file_content: bytes) -> Iterator[List[Block]]:
+        """One block per row with the column header, in row groups (encoding detected once, values kept as written)"""
         if not PANDAS_AVAILABLE:
             print("pandas not available")
-            return ""
-        
-        try:
-            # Try different encodings
-            encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
-            df = None
-            
-            for encoding in encodings:
-                try:
-                    df = pd.read_csv(io.BytesIO(file_content), encoding=encoding)
-                    break
-                except UnicodeDecodeError:
-                    continue
-            
-            if df is None:
-                print("Could not decode CSV with any standard encoding")
-                return ""
-            
-            text_parts = []
-            
-            # Add column headers
-            headers = [str(col) for col in df.columns]
-            text_parts.append(f"Columns: {', '.join(headers)}")
-            
-            # Add data rows
-            for idx, row in df.iterrows():
-                row_text = []
-                for col in df.columns:
-                    value = row[col]
-                    if pd.notna(value):
-                        row_text.append(f"{col}: {value}")
-                
-                if row_text:
-                    text_parts.append(f"Row {idx + 1}: " + " | ".join(row_text))
-            
-            return "\n".join(text_parts)
+            return
         
-        except Exception as e:
-            print(f"Error parsing CSV: {e}")
-            return ""
+        text_stream = io.TextIOWrapper(io.BytesIO(file_content), encoding=_detect_encoding(file_content),
+                                       errors="replace", newline="")
+        # One extra row is read to tell a capped file from one that fits exactly
+        reader = pd.read_csv(text_stream, dtype=str, chunksize=_ROW_GROUP_SIZE,
+                             nrows=PARSE_MAX_ROWS_PER_SHEET + 1 if PARSE_MAX_ROWS_PER_SHEET else None)
+        offset = 0
+        with reader:
+            for df in reader:
+                if PARSE_MAX_ROWS_PER_SHEET and offset + len(df) > PARSE_MAX_ROWS_PER_SHEET:
+                    print(f"CSV: only the first {PARSE_MAX_ROWS_PER_SHEET} rows are indexed")
+                    df = df.iloc[:PARSE_MAX_ROWS_PER_SHEET - offset]
+                names = [str(col) for col in df.columns]
+                header = f"Columns: {', '.join(names)}"
+                blocks = [
+                    {"text": f"Row {offset + position + 1}: {text}", "kind": "row", "header": header}
+                    for position, text in _format_rows(df, names)
+                ]
+                offset += len(df)
+                if blocks:
+                    yield blocks
     
     @staticmethod
-    def _parse_pdf(file_content: bytes) -> str:
-        """Extract text from PDF file"""
-        text_parts = []
-        
+    def _iter_pdf(file_content: bytes) -> Iterator[List[Block]]:
+        """Text blocks and headings per page range (PyMuPDF on the parser pool, or paragraphs of PyPDF2 page text)"""
         # Try PyMuPDF first (more robust)
         if PYMUPDF_AVAILABLE:
             try:
-                pdf_doc = fitz.open(stream=file_content, filetype="pdf")
-                for page_num in range(len(pdf_doc)):
-                    page = pdf_doc[page_num]
-                    text = page.get_text()
-                    if text.strip():
-                        text_parts.append(f"Page {page_num + 1}:\n{text}")
-                pdf_doc.close()
-                return "\n\n---\n\n".join(text_parts)
+                with fitz.open(stream=file_content, filetype="pdf") as pdf_doc:
+                    page_count = pdf_doc.page_count
             except Exception as e:
                 print(f"PyMuPDF failed: {e}")
+            else:
+                # Timeouts and memory-cap failures (DocumentParseError) are not retried with a slower parser
+                section = None
+                for blocks in _iter_pdf_ranges(file_content, page_count):
+                    section = _assign_sections(blocks, section)
+                    yield blocks
+                return
         
         # Fallback to PyPDF2
         if PYPDF2_AVAILABLE:
-            try:
-                pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
-                for page_num, page in enumerate(pdf_reader.pages, 1):
-                    text = page.extract_text()
-                    if text.strip():
-                        text_parts.append(f"Page {page_num}:\n{text}")
-                return "\n\n---\n\n".join(text_parts)
-            except Exception as e:
-                print(f"PyPDF2 failed: {e}")
+            pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
+            for page_num, page in enumerate(pdf_reader.pages, 1):
+                text = page.extract_text() or ""
+                blocks = [{"text": paragraph.strip(), "kind": "text", "page": page_num}
+                          for paragraph in _BLANK_LINE_RE.split(text) if paragraph.strip()]
+                if blocks:
+                    yield blocks
+            return
         
         print("No PDF parser available")
-        return ""
+    
+    @staticmethod
+    def _iter_text(file_content: bytes) -> Iterator[List[Block]]:
+        """Blank-line separated paragraphs; markdown-style '#' lines start a section"""
+        blocks: List[Block] = []
+        section = None
+        for paragraph in _BLANK_LINE_RE.split(FileParser._parse_text(file_content)):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            if _MARKDOWN_HEADING_RE.match(paragraph) and "\n" not in paragraph:
+                section = paragraph.lstrip("#").strip()
+                blocks.append({"text": paragraph, "kind": "heading", "section": section})
+            else:
+                blocks.append({"text": paragraph, "kind": "text", "section": section})
+            if len(blocks) >= _STREAM_GROUP_BLOCKS:
+                yield blocks
+                blocks = []
+        if blocks:
+            yield blocks
+    
+    @staticmethod
+    def render_text(blocks: List[Block], filename: str) -> str:
+        """Flat text of parsed blocks: 'Page N:' / 'Slide N:' / sheet headers, sections separated by '---'"""
+        file_ext = Path(filename).suffix.lower()
+        
+        if file_ext == '.pptx':
+            return "\n\n---\n\n".join(
+                "\n".join([f"Slide {slide_num}:"] + [block["text"] for block in slide_blocks])
+                for slide_num, slide_blocks in _group(blocks, "slide")
+            )
+        if file_ext == '.pdf':
+            return "\n\n---\n\n".join(
+                f"Page {page_num}:\n" + "\n".join(block["text"] for block in page_blocks)
+                for page_num, page_blocks in _group(blocks, "page")
+            )
+        if file_ext in ('.xlsx', '.csv'):
+            text_parts = []
+            for _, sheet_blocks in _group(blocks, "sheet"):
+                sheet_blocks = list(sheet_blocks)
+                text_parts.append("\n".join([sheet_blocks[0]["header"]] + [block["text"] for block in sheet_blocks]))
+            return "\n\n---\n\n".join(text_parts)
+        return "\n\n".join(block["text"] for block in blocks)
     
     @staticmethod
     def _parse_text(file_content: bytes) -> str:
@@ -279,14 +1020,46 @@ class FileParser:
 def extract_text_from_bytes(file_content: bytes, filename: str) -> str:
     """
     Convenience function to extract text from file bytes
-    
+
     Args:
         file_content: Raw file bytes
         filename: Original filename
-    
+
     Returns:
         Extracted text or empty string
     """
     result = FileParser.extract_text(file_content, filename)
     return result if result else ""
 
+
+def iter_blocks_from_bytes(file_content: bytes, filename: str, fallback_to_text: bool = False,
+                           offload: bool = False) -> Iterator[List[Block]]:
+    """
+    Convenience generator over groups of structural blocks (see FileParser.iter_blocks)
+
+    Args:
+        file_content: Raw file bytes
+        filename: Original filename
+        fallback_to_text: Parse unsupported extensions as plain text
+        offload: Parse non-PDF documents on the parser pool
+
+    Raises:
+        DocumentParseError: unsupported type, corrupt file, timeout or memory cap
+    """
+    return FileParser.iter_blocks(file_content, filename, fallback_to_text=fallback_to_text, offload=offload)
+
+
+def extract_blocks_from_bytes(file_content: bytes, filename: str, fallback_to_text: bool = False) -> List[Block]:
+    """
+    Convenience function to extract structural blocks from file bytes
+
+    Args:
+        file_content: Raw file bytes
+        filename: Original filename
+        fallback_to_text: Parse unsupported extensions as plain text
+
+    Returns:
+        List of blocks or empty list
+    """
+    result = FileParser.extract_blocks(file_content, filename, fallback_to_text=fallback_to_text)
+    return result if result else []
@@ -0,0 +1,341 @@
+"""
+Async Microsoft Graph client
+One pooled httpx connection (HTTP/2 when the h2 package is installed) per sync run, per-call timeouts,
+$select projections limited to the drive-item fields the ingestion pipeline reads, and an access token
+shared with SharePointClient so concurrent callers trigger a single refresh. Every request goes
+through the shared rate controller (graph_rate_limiter.py), which retries throttled calls.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+import httpx
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+from graph_rate_limiter import (
+    get_rate_controller, parse_retry_after, GRAPH_MAX_RETRIES, RETRY_STATUSES, THROTTLE_STATUSES
+)
+from sharepoint_client import (
+    SharePointClient, get_sharepoint_client, DRIVE_ITEM_SELECT, GRAPH_TIMEOUT_SECONDS, GRAPH_DOWNLOAD_TIMEOUT_SECONDS
+)
+
+load_dotenv()
+
+GRAPH_HTTP2 = (os.getenv("GRAPH_HTTP2", "true").lower() in ("1", "true", "yes"))
+# Connection pool size shared by all concurrent Graph calls of a run
+GRAPH_MAX_CONNECTIONS = int(os.getenv("GRAPH_MAX_CONNECTIONS", "16"))
+# "batch": resolve download URLs (and fresh metadata) 20 items per $batch request;
+# "content": GET /items/{id}/content and follow the redirect to the file
+GRAPH_DOWNLOAD_MODE = os.getenv("GRAPH_DOWNLOAD_MODE", "batch").lower()
+# Graph accepts at most 20 requests per $batch
+GRAPH_BATCH_SIZE = 20
+# Folders expanded in parallel by the listing walk, and discovered files buffered ahead of the consumer
+GRAPH_LIST_CONCURRENCY = int(os.getenv("GRAPH_LIST_CONCURRENCY", "8"))
+_LIST_BUFFER_FILES = 1000
+_CONNECT_TIMEOUT_SECONDS = 10.0
+_DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+
+DOWNLOAD_URL_SELECT = "id,@microsoft.graph.downloadUrl"
+_BATCH_ITEM_SELECT = f"{DRIVE_ITEM_SELECT},@microsoft.graph.downloadUrl"
+
+
+def drive_item_info(item: Dict[str, Any]) -> Dict[str, Any]:
+    """file_info dict (as returned by SharePointClient listings) for a Graph drive item"""
+    return {
+        "id": item.get("id"),
+        "name": item.get("name", ""),
+        "webUrl": item.get("webUrl", ""),
+        "lastModifiedDateTime": item.get("lastModifiedDateTime", ""),
+        "size": item.get("size", 0),
+        "mimeType": (item.get("file") or {}).get("mimeType", ""),
+        "deleted": item.get("deleted") is not None,
+        "downloadUrl": item.get("@microsoft.graph.downloadUrl"),
+    }
+
+
+class AsyncGraphClient:
+    """
+    Async Graph calls for one event loop. Use as `async with AsyncGraphClient() as graph:`;
+    site/drive resolution and token acquisition are delegated to the SharePointClient singleton.
+    """
+
+    def __init__(self, sharepoint: Optional[SharePointClient] = None, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.logger = logging.getLogger("sharepoint.graph")
+        self.sharepoint = sharepoint or get_sharepoint_client()
+        self.graph_endpoint = self.sharepoint.graph_endpoint
+        self._token: Optional[str] = None
+        self._token_lock = asyncio.Lock()
+        # Per-client (per sync run) counters; the rate controller is shared process-wide
+        self.stats = {"folders_listed": 0, "folder_errors": 0, "files_found": 0, "throttled": 0, "retries": 0}
+        self.rate = get_rate_controller()
+        http2 = GRAPH_HTTP2 and HTTP2_AVAILABLE and transport is None
+        self._client = httpx.AsyncClient(
+            http2=http2,
+            transport=transport,
+            limits=httpx.Limits(max_connections=GRAPH_MAX_CONNECTIONS, max_keepalive_connections=GRAPH_MAX_CONNECTIONS),
+            timeout=httpx.Timeout(GRAPH_TIMEOUT_SECONDS, connect=_CONNECT_TIMEOUT_SECONDS),
+            headers={"Accept": "application/json"},
+        )
+        self.logger.debug("[graph] Async client ready (http2=%s, max_connections=%d)", http2, GRAPH_MAX_CONNECTIONS)
+
+    async def __aenter__(self) -> "AsyncGraphClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    @property
+    def drive_path(self) -> str:
+        return f"/sites/{self.sharepoint.site_id}/drives/{self.sharepoint.drive_id}"
+
+    async def get_access_token(self) -> str:
+        """Cached token; concurrent callers wait on one refresh (MSAL runs off the event loop)"""
+        if self._token and self._token == self.sharepoint.access_token and self.sharepoint.token_is_fresh():
+            return self._token
+        async with self._token_lock:
+            if not (self._token and self._token == self.sharepoint.access_token and self.sharepoint.token_is_fresh()):
+                self._token = await asyncio.to_thread(self.sharepoint.get_access_token)
+            return self._token
+
+    async def _send(self, method: str, url: str, *, timeout: Optional[float] = None, authenticated: bool = True,
+                    stream: bool = False, **kwargs) -> httpx.Response:
+        """
+        Request through the shared rate controller. Throttled (429/503/509), transient 5xx and network
+        failures are retried with Retry-After or jittered backoff; a 401 invalidates the shared token
+        and is retried once. With stream=True the caller must close the response.
+        """
+        if not url.startswith("http"):
+            url = f"{self.graph_endpoint}{url}"
+        request_timeout = httpx.Timeout(timeout or GRAPH_TIMEOUT_SECONDS, connect=_CONNECT_TIMEOUT_SECONDS)
+        extra_headers = kwargs.pop("headers", None) or {}
+        follow_redirects = kwargs.pop("follow_redirects", False)
+        attempt = 0
+        refreshed = False
+        while True:
+            headers = dict(extra_headers)
+            token = None
+            if authenticated:
+                token = await self.get_access_token()
+                headers["Authorization"] = f"Bearer {token}"
+            request = self._client.build_request(method, url, headers=headers, timeout=request_timeout, **kwargs)
+            sent_at = await self.rate.acquire_async()
+            try:
+                response = await self._client.send(request, stream=stream, follow_redirects=follow_redirects)
+            except httpx.TransportError as e:
+                self.rate.release(sent_at, None)
+                if attempt >= GRAPH_MAX_RETRIES:
+                    self.rate.record_failure()
+                    raise
+                delay = self.rate.retry_delay(attempt)
+                attempt += 1
+                self.stats["retries"] += 1
+                self.logger.warning("[graph] %s %s failed (%s); retry %d in %.1fs", method, url, e, attempt, delay)
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Cancelled or failed otherwise: the slot must go back to the shared controller
+                self.rate.release(sent_at, None)
+                raise
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            self.rate.release(sent_at, response.status_code, retry_after)
+            if response.status_code == 401 and token is not None and not refreshed:
+                refreshed = True
+                await response.aclose()
+                self.logger.info("[graph] 401 from %s; refreshing token", url)
+                self.sharepoint.invalidate_token(token)
+                continue
+            if response.status_code in RETRY_STATUSES:
+                if response.status_code in THROTTLE_STATUSES:
+                    self.stats["throttled"] += 1
+                if attempt < GRAPH_MAX_RETRIES:
+                    await response.aclose()
+                    delay = self.rate.retry_delay(attempt, retry_after)
+                    attempt += 1
+                    self.stats["retries"] += 1
+                    self.logger.warning("[graph] %s %s returned %d; retry %d in %.1fs", method, url, response.status_code, attempt, delay)
+                    await asyncio.sleep(delay)
+                    continue
+                self.rate.record_failure()
+            return response
+
+    async def get_json(self, endpoint: str, params: Optional[Dict[str, Any]] = None,
+                       timeout: Optional[float] = None) -> Dict[str, Any]:
+        """GET a Graph endpoint (path relative to /v1.0, or an absolute nextLink/deltaLink)"""
+        self.logger.debug("[graph] GET %s params=%s", endpoint, params)
+        response = await self._send("GET", endpoint, params=params, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    async def iter_pages(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield each page of a collection, following @odata.nextLink (the last page carries any deltaLink)"""
+        page = await self.get_json(endpoint, params)
+        yield page
+        while page.get("@odata.nextLink"):
+            # nextLink already encodes the query (including $select)
+            page = await self.get_json(page["@odata.nextLink"])
+            yield page
+
+    async def iter_children(self, children_endpoint: str) -> AsyncIterator[Dict[str, Any]]:
+        """Items of a /children collection (by item id or root:{path}:), projected to DRIVE_ITEM_SELECT"""
+        async for page in self.iter_pages(children_endpoint, {"$select": DRIVE_ITEM_SELECT, "$top": 999}):
+            for item in page.get("value", []):
+                yield item
+
+    def list_children(self, folder_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Children of a folder item, projected to DRIVE_ITEM_SELECT"""
+        return self.iter_children(f"{self.drive_path}/items/{folder_id}/children")
+
+    async def iter_files(self, children_endpoint: str, recursive: bool = True,
+                         concurrency: int = GRAPH_LIST_CONCURRENCY) -> AsyncIterator[Dict[str, Any]]:
+        """
+        file_info of every file under a folder, yielded as soon as its page is read.
+        Folders are walked breadth-first from a deque, up to `concurrency` of them paged at once;
+        a folder that fails to list is logged and counted (stats['folder_errors']) and the walk goes on.
+        """
+        pending = deque([children_endpoint])
+        found: asyncio.Queue = asyncio.Queue(maxsize=_LIST_BUFFER_FILES)
+        folder_done = object()
+        seen_folders = set()
+        tasks = set()
+
+        async def _expand(endpoint: str) -> None:
+            try:
+                async for item in self.iter_children(endpoint):
+                    if item.get("folder") is not None:
+                        if recursive and item.get("id") not in seen_folders:
+                            seen_folders.add(item.get("id"))
+                            pending.append(f"{self.drive_path}/items/{item['id']}/children")
+                    else:
+                        self.stats["files_found"] += 1
+                        await found.put(drive_item_info(item))
+                self.stats["folders_listed"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["folder_errors"] += 1
+                self.logger.error("[graph] Listing %s failed: %s", endpoint, e)
+            await found.put(folder_done)
+
+        running = 0
+
+        def _start_folders() -> None:
+            nonlocal running
+            while pending and running < max(1, concurrency):
+                running += 1
+                task = asyncio.create_task(_expand(pending.popleft()))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+        try:
+            _start_folders()
+            while running:
+                entry = await found.get()
+                if entry is folder_done:
+                    running -= 1
+                else:
+                    yield entry
+                # Subfolders found on the pages read so far start as soon as a slot is free
+                _start_folders()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def get_item(self, item_id: str, select: str = DRIVE_ITEM_SELECT) -> Dict[str, Any]:
+        return await self.get_json(f"{self.drive_path}/items/{item_id}", {"$select": select})
+
+    async def get_download_url(self, file_id: str) -> Optional[str]:
+        item = await self.get_item(file_id, DOWNLOAD_URL_SELECT)
+        return item.get("@microsoft.graph.downloadUrl")
+
+    async def post_batch(self, requests: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Send up to GRAPH_BATCH_SIZE sub-requests ({"id", "method", "url"} with urls relative to /v1.0)
+        in one JSON $batch call; returns the sub-responses by id
+        """
+        response = await self._send("POST", "/$batch", json={"requests": requests})
+        response.raise_for_status()
+        return {str(entry.get("id")): entry for entry in response.json().get("responses", [])}
+
+    async def resolve_items(self, file_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Metadata plus @microsoft.graph.downloadUrl for many items, GRAPH_BATCH_SIZE per $batch request.
+        Throttled sub-requests are retried; items that still fail are left out (callers fall back to
+        /content downloads).
+        """
+        resolved: Dict[str, Dict[str, Any]] = {}
+        for start in range(0, len(file_ids), GRAPH_BATCH_SIZE):
+            chunk = file_ids[start:start + GRAPH_BATCH_SIZE]
+            for attempt in range(GRAPH_MAX_RETRIES + 1):
+                requests = [
+                    {"id": str(n), "method": "GET", "url": f"{self.drive_path}/items/{file_id}?$select={_BATCH_ITEM_SELECT}"}
+                    for n, file_id in enumerate(chunk)
+                ]
+                responses = await self.post_batch(requests)
+                throttled: List[str] = []
+                retry_after: Optional[float] = None
+                for n, file_id in enumerate(chunk):
+                    entry = responses.get(str(n)) or {}
+                    status = entry.get("status")
+                    if status == 200 and isinstance(entry.get("body"), dict):
+                        resolved[file_id] = entry["body"]
+                    elif status in THROTTLE_STATUSES:
+                        throttled.append(file_id)
+                        wait = parse_retry_after((entry.get("headers") or {}).get("Retry-After"))
+                        retry_after = max(retry_after or 0.0, wait) if wait is not None else retry_after
+                    else:
+                        self.logger.debug("[graph] $batch lookup of %s returned %s", file_id, status)
+                if not throttled:
+                    break
+                self.rate.observe(429, retry_after)
+                self.stats["throttled"] += len(throttled)
+                if attempt >= GRAPH_MAX_RETRIES:
+                    self.logger.warning("[graph] %d $batch lookups still throttled; falling back to /content", len(throttled))
+                    break
+                chunk = throttled
+                self.stats["retries"] += 1
+                await asyncio.sleep(self.rate.retry_delay(attempt, retry_after))
+        return resolved
+
+    def _download_target(self, file_id: str, download_url: Optional[str]) -> Tuple[str, bool]:
+        """(url, needs_token): the pre-authenticated download URL, or /content (which redirects to the file)"""
+        if download_url:
+            return download_url, False
+        return f"{self.graph_endpoint}{self.drive_path}/items/{file_id}/content", True
+
+    async def download_file_content(self, file_id: str, download_url: Optional[str] = None) -> bytes:
+        """
+        File bytes over the pooled connection. Without a resolved download URL the file is fetched
+        via /items/{id}/content, whose redirect is followed without a separate metadata call.
+        """
+        start = time.perf_counter()
+        url, needs_token = self._download_target(file_id, download_url)
+        # httpx drops the Authorization header when the /content redirect leaves graph.microsoft.com
+        response = await self._send("GET", url, timeout=GRAPH_DOWNLOAD_TIMEOUT_SECONDS, authenticated=needs_token,
+                                    follow_redirects=True)
+        response.raise_for_status()
+        self.logger.debug("[graph] Downloaded %s: %d bytes in %.2fs", file_id, len(response.content), time.perf_counter() - start)
+        return response.content
+
+    async def download_file_stream(self, file_id: str, download_url: Optional[str] = None) -> AsyncIterator[bytes]:
+        """File bytes in chunks of about 1 MB, for large files"""
+        url, needs_token = self._download_target(file_id, download_url)
+        response = await self._send("GET", url, timeout=GRAPH_DOWNLOAD_TIMEOUT_SECONDS, authenticated=needs_token,
+                                    follow_redirects=True, stream=True)
+        try:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(_DOWNLOAD_CHUNK_BYTES):
+                yield chunk
+        finally:
+            await response.aclose()
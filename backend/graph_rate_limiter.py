@@ -0,0 +1,162 @@
+"""
+Shared rate control for Microsoft Graph / SharePoint calls
+Every Graph request (sync SharePointClient and async AsyncGraphClient) takes a slot from one
+controller. Throttling responses (429/503/509) halve the number of slots, successes add them back
+one per window (AIMD), and a Retry-After pauses all callers until it expires. Throttled and failed
+calls are retried with jittered exponential backoff, so large syncs settle at the highest rate the
+tenant allows instead of dropping files.
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Concurrent Graph requests allowed: starts at the maximum, never drops below the minimum
+GRAPH_MAX_CONCURRENCY = int(os.getenv("GRAPH_MAX_CONCURRENCY", "16"))
+GRAPH_MIN_CONCURRENCY = int(os.getenv("GRAPH_MIN_CONCURRENCY", "1"))
+GRAPH_MAX_RETRIES = int(os.getenv("GRAPH_MAX_RETRIES", "6"))
+GRAPH_BACKOFF_BASE = float(os.getenv("GRAPH_BACKOFF_BASE", "1.0"))
+GRAPH_BACKOFF_MAX = float(os.getenv("GRAPH_BACKOFF_MAX", "60"))
+
+THROTTLE_STATUSES = (429, 503, 509)
+# Transient server errors: retried, but not treated as a throttling signal
+RETRY_STATUSES = THROTTLE_STATUSES + (500, 502, 504)
+
+_POLL_SECONDS = 0.05
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class GraphRateController:
+    """AIMD concurrency limit plus a global Retry-After pause, shared by threads and event loops"""
+
+    def __init__(self, max_concurrency: int = GRAPH_MAX_CONCURRENCY, min_concurrency: int = GRAPH_MIN_CONCURRENCY):
+        self.logger = logging.getLogger("sharepoint.ratelimit")
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self._limit = float(self.max_concurrency)
+        self._in_flight = 0
+        self._resume_at = 0.0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "throttled": 0, "retries": 0, "failed": 0, "retry_after_seconds": 0.0}
+
+    def _try_acquire(self) -> Tuple[float, float]:
+        """(0, send time) when a slot was taken, else (seconds to wait before trying again, 0)"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._resume_at:
+                return self._resume_at - now, 0.0
+            if self._in_flight < int(self._limit):
+                self._in_flight += 1
+                self._counters["requests"] += 1
+                return 0.0, now
+        return _POLL_SECONDS, 0.0
+
+    def acquire(self) -> float:
+        """Block the calling thread until a request may be sent; returns the send time for release()"""
+        while True:
+            wait, sent_at = self._try_acquire()
+            if not wait:
+                return sent_at
+            time.sleep(min(wait, 1.0))
+
+    async def acquire_async(self) -> float:
+        """Wait (without blocking the event loop) until a request may be sent; returns the send time"""
+        while True:
+            wait, sent_at = self._try_acquire()
+            if not wait:
+                return sent_at
+            await asyncio.sleep(min(wait, 1.0))
+
+    def release(self, sent_at: float, status: Optional[int], retry_after: Optional[float] = None) -> None:
+        """Return a slot with the response status (None for a network error) and adapt the limit"""
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+            self._observe(sent_at, status, retry_after)
+
+    def observe(self, status: Optional[int], retry_after: Optional[float] = None) -> None:
+        """Adapt the limit to a response that did not hold its own slot (a $batch sub-response)"""
+        with self._lock:
+            self._observe(time.monotonic(), status, retry_after)
+
+    def _observe(self, sent_at: float, status: Optional[int], retry_after: Optional[float]) -> None:
+        now = time.monotonic()
+        if status in THROTTLE_STATUSES:
+            self._counters["throttled"] += 1
+            if retry_after:
+                self._resume_at = max(self._resume_at, now + retry_after)
+                self._counters["retry_after_seconds"] += retry_after
+            # Requests sent before the last decrease were throttled at the old limit: one decrease per round
+            if sent_at >= self._last_decrease:
+                # Multiplicative decrease
+                self._last_decrease = now
+                self._limit = max(float(self.min_concurrency), self._limit / 2)
+                self.logger.warning("Graph throttled (%s, retry_after=%s); concurrency limit now %d",
+                                    status, retry_after, int(self._limit))
+        elif status is not None and status < 500:
+            # Additive increase: about one slot per full window of successful requests
+            self._limit = min(float(self.max_concurrency), self._limit + 1.0 / self._limit)
+
+    def retry_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Delay before retry number attempt + 1: Retry-After when given, else jittered exponential backoff"""
+        with self._lock:
+            self._counters["retries"] += 1
+        if retry_after is not None:
+            return retry_after + random.uniform(0, GRAPH_BACKOFF_BASE)
+        return random.uniform(0, min(GRAPH_BACKOFF_MAX, GRAPH_BACKOFF_BASE * (2 ** attempt)))
+
+    def record_failure(self) -> None:
+        """A request that ran out of retries"""
+        with self._lock:
+            self._counters["failed"] += 1
+
+    def counters(self) -> Dict[str, Any]:
+        """Cumulative counters plus the current limit and requests in flight"""
+        with self._lock:
+            counters = dict(self._counters)
+            counters["limit"] = int(self._limit)
+            counters["in_flight"] = self._in_flight
+        return counters
+
+    def run_stats(self, start: Dict[str, Any]) -> Dict[str, Any]:
+        """Counters accumulated since `start` (an earlier counters() snapshot), for per-run reporting"""
+        now = self.counters()
+        stats = {key: now[key] - start.get(key, 0) for key in ("requests", "throttled", "retries", "failed", "retry_after_seconds")}
+        stats["retry_after_seconds"] = round(stats["retry_after_seconds"], 1)
+        stats["limit"] = now["limit"]
+        return stats
+
+
+# Singleton instance
+_rate_controller: Optional[GraphRateController] = None
+_rate_controller_lock = threading.Lock()
+
+def get_rate_controller() -> GraphRateController:
+    """Get or create the process-wide Graph rate controller"""
+    global _rate_controller
+    with _rate_controller_lock:
+        if _rate_controller is None:
+            _rate_controller = GraphRateController()
+        return _rate_controller
@@ -0,0 +1,669 @@
+"""
+Shared ingestion helpers for the upload and SharePoint paths
+Deterministic chunk ids, change detection, the file -> vector manifest, and the streaming
+parse -> chunk -> embed -> upsert stages
+"""
+
+import os
+import json
+import time
+import queue
+import random
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Set, Iterable, Iterator, Optional, Dict, Any, Callable, Tuple
+
+from vector_store import VectorIndex, DEFAULT_NAMESPACE, _normalize_vectors
+from lexical_index import LexicalIndex
+from chunk_store import get_chunk_store, chunk_metadata
+from database import SessionLocal, VectorManifest, UploadedSolution, IngestionJob
+
+logger = logging.getLogger("ingestion")
+
+# Ids per fetch call when checking which chunks are already indexed
+FETCH_BATCH_SIZE = 100
+# Ids per delete call (Pinecone accepts up to 1000)
+DELETE_BATCH_SIZE = 1000
+# Bound for SQL IN (...) lists (SQLite variable limit)
+SQL_IN_BATCH_SIZE = 500
+
+# Upsert batching: Pinecone recommends <= 100 vectors and caps requests at 2 MB
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+UPSERT_BATCH_BYTES = int(os.getenv("UPSERT_BATCH_BYTES", str(2 * 1024 * 1024)))
+UPSERT_WORKERS = int(os.getenv("UPSERT_WORKERS", "4"))
+UPSERT_MAX_RETRIES = int(os.getenv("UPSERT_MAX_RETRIES", "5"))
+UPSERT_BACKOFF_BASE = float(os.getenv("UPSERT_BACKOFF_BASE", "0.5"))
+UPSERT_BACKOFF_MAX = float(os.getenv("UPSERT_BACKOFF_MAX", "30"))
+
+# Streaming ingestion: chunks per embedding call, and parsed block groups buffered ahead of the chunker
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+STREAM_PREFETCH_GROUPS = int(os.getenv("STREAM_PREFETCH_GROUPS", "4"))
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 of chunk text (hex)"""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def chunk_id_prefix(source: str, file_id: str) -> str:
+    """"<source>#<file key>#", shared by every chunk id of one file"""
+    file_key = hashlib.sha1(str(file_id).encode("utf-8")).hexdigest()[:16]
+    return f"{source}#{file_key}#"
+
+
+def chunk_vector_id(source: str, file_id: str, chunk_index: int, text: str) -> str:
+    """
+    Deterministic vector id for a chunk: "<source>#<file key>#<chunk index>#<content hash>"
+
+    The same chunk of the same file always maps to the same id, so re-ingesting unchanged
+    content overwrites instead of duplicating, and a changed chunk gets a new id.
+    """
+    return f"{chunk_id_prefix(source, file_id)}{chunk_index}#{content_hash(text)[:16]}"
+
+
+def _id_prefix(vector_id: str) -> str:
+    parts = vector_id.split("#", 2)
+    return f"{parts[0]}#{parts[1]}#" if len(parts) == 3 else vector_id
+
+
+class _ActiveFiles:
+    """
+    Chunk-id prefixes of files being ingested in this process, from their first manifest row until
+    every batch they queued was written or failed. Reconciliation leaves their half-written state
+    (manifest rows ahead of the index, stored text ahead of the manifest) alone.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active: Dict[str, int] = {}
+        self._watchers: List[Set[str]] = []
+
+    def add(self, prefix: str) -> None:
+        with self._lock:
+            self._active[prefix] = self._active.get(prefix, 0) + 1
+            for seen in self._watchers:
+                seen.add(prefix)
+
+    def remove(self, prefix: str) -> None:
+        with self._lock:
+            count = self._active.get(prefix, 0) - 1
+            if count > 0:
+                self._active[prefix] = count
+            else:
+                self._active.pop(prefix, None)
+
+    @contextmanager
+    def watch(self) -> Iterator[Set[str]]:
+        """Prefixes active now or started while the block runs (the set keeps growing until it exits)"""
+        with self._lock:
+            seen = set(self._active)
+            self._watchers.append(seen)
+        try:
+            yield seen
+        finally:
+            with self._lock:
+                self._watchers.remove(seen)
+
+
+_active_files = _ActiveFiles()
+
+
+def existing_vector_ids(index: VectorIndex, ids: Iterable[str], namespace: str = DEFAULT_NAMESPACE) -> Set[str]:
+    """Return the subset of ids already present in a namespace of the index (batched fetches)"""
+    ids = list(ids)
+    found: Set[str] = set()
+    for start in range(0, len(ids), FETCH_BATCH_SIZE):
+        batch = ids[start:start + FETCH_BATCH_SIZE]
+        try:
+            found.update(index.fetch(batch, namespace=namespace).keys())
+        except Exception as e:
+            # Treat as unknown: re-embedding is safe because ids are deterministic
+            logger.warning("Existence check failed for %d ids: %s", len(batch), e)
+    return found
+
+
+def new_chunk_positions(index: VectorIndex, ids: List[str], namespace: str = DEFAULT_NAMESPACE) -> List[int]:
+    """Positions in ids whose vectors are not in the namespace yet"""
+    existing = existing_vector_ids(index, ids, namespace)
+    return [i for i, vec_id in enumerate(ids) if vec_id not in existing]
+
+
+# --- Manifest: every (namespace, vector id) per source file ---
+
+def _batches(items: List[Any], size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _referenced_ids(db, ids: List[str]) -> Set[str]:
+    """Ids still recorded in the manifest under any file or namespace"""
+    referenced: Set[str] = set()
+    for batch in _batches(ids, SQL_IN_BATCH_SIZE):
+        referenced.update(row[0] for row in db.query(VectorManifest.vector_id).filter(VectorManifest.vector_id.in_(batch)))
+    return referenced
+
+
+def delete_vectors(index: VectorIndex, pairs: Iterable[Tuple[str, str]], lexical_index: Optional[LexicalIndex] = None,
+                   keep_text_for: Optional[Set[str]] = None) -> int:
+    """
+    Delete (namespace, id) vectors in batches, plus their BM25 entries and stored text
+    unless the id is in keep_text_for (still indexed in another namespace); returns count
+    """
+    by_namespace: Dict[str, List[str]] = {}
+    for namespace, vec_id in pairs:
+        by_namespace.setdefault(namespace, []).append(vec_id)
+    keep_text_for = keep_text_for or set()
+    chunk_store = get_chunk_store()
+    deleted = 0
+    for namespace, ids in by_namespace.items():
+        for batch in _batches(ids, DELETE_BATCH_SIZE):
+            index.delete(batch, namespace=namespace)
+            local = [vec_id for vec_id in batch if vec_id not in keep_text_for]
+            if lexical_index is not None:
+                lexical_index.delete(local)
+            chunk_store.delete(local)
+            deleted += len(batch)
+    return deleted
+
+
+def record_file_vectors(source: str, file_id: Any, vector_ids: Iterable[str], namespace: str = DEFAULT_NAMESPACE) -> None:
+    """Add manifest rows for vector ids of a file (idempotent); call before upserting"""
+    file_id = str(file_id)
+    db = SessionLocal()
+    try:
+        wanted = set(vector_ids)
+        current = {row[0] for row in db.query(VectorManifest.vector_id).filter(
+            VectorManifest.source == source, VectorManifest.file_id == file_id, VectorManifest.namespace == namespace)}
+        added = wanted - current
+        if added:
+            db.bulk_insert_mappings(VectorManifest, [
+                {"source": source, "file_id": file_id, "namespace": namespace, "vector_id": vec_id} for vec_id in added
+            ])
+            db.commit()
+    finally:
+        db.close()
+
+
+def replace_file_vectors(index: VectorIndex, source: str, file_id: Any, vector_ids: Iterable[str],
+                         lexical_index: Optional[LexicalIndex] = None, namespace: str = DEFAULT_NAMESPACE) -> int:
+    """
+    Make vector_ids (in namespace) the complete vector set of a file: manifest rows for other ids or
+    namespaces are dropped and those vectors deleted, unless another file still references them.
+    Call after upserting.
+
+    Returns:
+        Number of vectors deleted
+    """
+    file_id = str(file_id)
+    wanted = {(namespace, vec_id) for vec_id in vector_ids}
+    if wanted:
+        record_file_vectors(source, file_id, [vec_id for _, vec_id in wanted], namespace)
+    db = SessionLocal()
+    try:
+        current = {(row[0] or "", row[1]) for row in db.query(VectorManifest.namespace, VectorManifest.vector_id).filter(
+            VectorManifest.source == source, VectorManifest.file_id == file_id)}
+        stale = sorted(current - wanted)
+        if not stale:
+            return 0
+        for batch in _batches(stale, SQL_IN_BATCH_SIZE):
+            for ns in {ns for ns, _ in batch}:
+                db.query(VectorManifest).filter(
+                    VectorManifest.source == source,
+                    VectorManifest.file_id == file_id,
+                    VectorManifest.namespace == ns,
+                    VectorManifest.vector_id.in_([vec_id for n, vec_id in batch if n == ns])
+                ).delete(synchronize_session=False)
+        db.commit()
+        # Identical uploads share chunk ids; keep vectors another file still points at
+        still_referenced: Set[Tuple[str, str]] = set()
+        for batch in _batches(stale, SQL_IN_BATCH_SIZE):
+            still_referenced.update((row[0] or "", row[1]) for row in db.query(
+                VectorManifest.namespace, VectorManifest.vector_id).filter(
+                VectorManifest.vector_id.in_([vec_id for _, vec_id in batch])))
+        orphaned = [pair for pair in stale if pair not in still_referenced]
+        # Text and BM25 entries are keyed by id only; keep them while any namespace still holds the id
+        keep_text_for = _referenced_ids(db, [vec_id for _, vec_id in orphaned])
+    finally:
+        db.close()
+    delete_vectors(index, orphaned, lexical_index, keep_text_for)
+    logger.info("Replaced vectors for %s:%s (deleted=%d)", source, file_id, len(orphaned))
+    return len(orphaned)
+
+
+def purge_file_vectors(index: VectorIndex, source: str, file_id: Any,
+                       lexical_index: Optional[LexicalIndex] = None) -> int:
+    """Delete every vector recorded for a file, in all namespaces; returns count deleted"""
+    return replace_file_vectors(index, source, file_id, [], lexical_index)
+
+
+def reconcile_vectors(index: VectorIndex, lexical_index: Optional[LexicalIndex] = None,
+                      purge_legacy: bool = False) -> Dict[str, Any]:
+    """
+    Diff the manifest against every namespace of the index and repair both sides:
+    - manifest rows of uploads whose UploadedSolution record is gone are dropped
+    - manifest rows whose vector is missing from the index are dropped
+    - index vectors with deterministic ids but no manifest row (orphans) are deleted
+    - legacy uuid vectors (pre-manifest) are only reported, or deleted with purge_legacy
+    - BM25 entries and stored chunk text without a manifest row are dropped
+    Files still being ingested (in this process, or uploads with a queued/running job) are skipped:
+    their manifest rows and chunk text are written ahead of their vectors.
+
+    Returns:
+        Dictionary with reconciliation statistics
+    """
+    with _active_files.watch() as active_prefixes:
+        return _reconcile(index, lexical_index, purge_legacy, active_prefixes)
+
+
+def _reconcile(index: VectorIndex, lexical_index: Optional[LexicalIndex], purge_legacy: bool,
+               active_prefixes: Set[str]) -> Dict[str, Any]:
+    db = SessionLocal()
+    try:
+        # Uploads still queued or running (possibly in another process) are skipped like active files
+        busy_uploads = [str(row[0]) for row in db.query(IngestionJob.solution_id).filter(
+            IngestionJob.status.in_(("queued", "running")))]
+        busy_ids: Set[str] = set()
+        for batch in _batches(busy_uploads, SQL_IN_BATCH_SIZE):
+            busy_ids.update(row[0] for row in db.query(VectorManifest.vector_id).filter(
+                VectorManifest.source == "upload", VectorManifest.file_id.in_(batch)))
+
+        def _in_flight(vec_id: str) -> bool:
+            return vec_id in busy_ids or _id_prefix(vec_id) in active_prefixes
+
+        live_uploads = {str(row[0]) for row in db.query(UploadedSolution.id)}
+        dead_upload_files = sorted({row[0] for row in db.query(VectorManifest.file_id).filter(
+            VectorManifest.source == "upload")} - live_uploads)
+        for batch in _batches(dead_upload_files, SQL_IN_BATCH_SIZE):
+            db.query(VectorManifest).filter(
+                VectorManifest.source == "upload", VectorManifest.file_id.in_(batch)
+            ).delete(synchronize_session=False)
+        db.commit()
+
+        manifest_pairs = {(row[0] or "", row[1]) for row in db.query(VectorManifest.namespace, VectorManifest.vector_id)}
+        namespaces = set(index.list_namespaces()) | {ns for ns, _ in manifest_pairs}
+        index_pairs = {(ns, vec_id) for ns in namespaces for vec_id in index.list_ids(namespace=ns)}
+
+        # Manifest rows are written before their upsert: ids of files still being ingested are not missing
+        missing = sorted(pair for pair in manifest_pairs - index_pairs if not _in_flight(pair[1]))
+        for batch in _batches(missing, SQL_IN_BATCH_SIZE):
+            for ns in {ns for ns, _ in batch}:
+                db.query(VectorManifest).filter(
+                    VectorManifest.namespace == ns,
+                    VectorManifest.vector_id.in_([vec_id for n, vec_id in batch if n == ns])
+                ).delete(synchronize_session=False)
+        db.commit()
+        manifest_pairs -= set(missing)
+    finally:
+        db.close()
+
+    manifest_ids = {vec_id for _, vec_id in manifest_pairs}
+    index_ids = {vec_id for _, vec_id in index_pairs}
+    unknown = {pair for pair in index_pairs - manifest_pairs if not _in_flight(pair[1])}
+    orphans = sorted(pair for pair in unknown if "#" in pair[1])
+    legacy = sorted(pair for pair in unknown if "#" not in pair[1])
+    delete_vectors(index, orphans + (legacy if purge_legacy else []), lexical_index, keep_text_for=manifest_ids)
+
+    lexical_orphans = []
+    if lexical_index is not None:
+        lexical_orphans = [i for i in lexical_index.list_ids() if "#" in i and i not in manifest_ids and not _in_flight(i)]
+        lexical_index.delete(lexical_orphans)
+
+    chunk_store = get_chunk_store()
+    stored_orphans = [i for i in chunk_store.list_ids() if i not in manifest_ids and i not in index_ids and not _in_flight(i)]
+    chunk_store.delete(stored_orphans)
+
+    stats = {
+        "namespaces": sorted(namespaces),
+        "index_vectors": len(index_pairs),
+        "manifest_vectors": len(manifest_pairs),
+        "dead_upload_files": len(dead_upload_files),
+        "missing_from_index": len(missing),
+        "orphans_deleted": len(orphans),
+        "legacy_vectors": len(legacy),
+        "legacy_deleted": len(legacy) if purge_legacy else 0,
+        "lexical_orphans_deleted": len(lexical_orphans),
+        "stored_text_orphans_deleted": len(stored_orphans),
+    }
+    logger.info("Reconciled vector manifest: %s", stats)
+    return stats
+
+
+# --- Batched, concurrent upserts ---
+
+def estimate_vector_bytes(vector_id: str, values: List[float], metadata: Dict[str, Any]) -> int:
+    """Approximate request payload of one vector (JSON floats ~12 bytes each)"""
+    return len(vector_id) + 12 * len(values) + len(json.dumps(metadata, default=str)) + 64
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Client errors (4xx other than 408/429) will fail again; everything else may be transient"""
+    status = getattr(error, "status", None) or getattr(error, "status_code", None)
+    if isinstance(status, int) and 400 <= status < 500 and status not in (408, 429):
+        return False
+    return not isinstance(error, (ValueError, TypeError))
+
+
+class _Ticket:
+    """Completion tracking for one add() call, whose vectors may span several batches"""
+
+    def __init__(self, remaining: int, on_complete: Optional[Callable[[], None]]):
+        self.remaining = remaining
+        self.failed = False
+        self.on_complete = on_complete
+        self.on_settled: Optional[Callable[[], None]] = None
+
+
+class UpsertWriter:
+    """
+    Accumulates vectors across files and writes them to one namespace in batches bounded by count and payload size.
+    Batches are sent concurrently on a bounded pool, retried with jittered exponential backoff,
+    and add() blocks when too many batches are in flight. on_complete callbacks run (on a writer
+    thread) once every vector of that add() call has been written.
+
+    Usage:
+        with UpsertWriter(index) as writer:
+            writer.add(vectors, on_complete=...)
+        writer.stats()
+    """
+
+    def __init__(self, index: VectorIndex, namespace: str = DEFAULT_NAMESPACE, batch_size: int = UPSERT_BATCH_SIZE,
+                 batch_bytes: int = UPSERT_BATCH_BYTES, workers: int = UPSERT_WORKERS, max_retries: int = UPSERT_MAX_RETRIES):
+        self.logger = logging.getLogger("ingestion.upsert")
+        self.index = index
+        self.namespace = namespace
+        self.batch_size = batch_size
+        self.batch_bytes = batch_bytes
+        self.max_retries = max_retries
+        # The local engine serialises writes internally; concurrency only helps over the network
+        self.workers = 1 if getattr(index, "backend", None) == "local" else max(1, workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="upsert")
+        self._in_flight = threading.BoundedSemaphore(self.workers * 2)
+        self._lock = threading.Lock()
+        self._futures = []
+        self._pending: List[Any] = []
+        self._pending_tickets: List[Any] = []
+        self._pending_bytes = 0
+        self._started = time.perf_counter()
+        self._stats = {"vectors_written": 0, "vectors_failed": 0, "batches": 0, "bytes": 0, "retries": 0, "failed_batches": 0}
+
+    def __enter__(self) -> "UpsertWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def add(self, vectors: Iterable[Any], on_complete: Optional[Callable[[], None]] = None,
+            on_settled: Optional[Callable[[], None]] = None) -> int:
+        """
+        Queue (id, values, metadata) vectors; returns count queued. on_settled runs after every
+        batch holding them was written or failed (after on_complete, when that runs).
+        """
+        vectors = _normalize_vectors(vectors)
+        if not vectors:
+            if on_complete is not None:
+                on_complete()
+            if on_settled is not None:
+                on_settled()
+            return 0
+        ticket = _Ticket(len(vectors), on_complete)
+        ticket.on_settled = on_settled
+        for vec in vectors:
+            size = estimate_vector_bytes(*vec)
+            if self._pending and (len(self._pending) >= self.batch_size or self._pending_bytes + size > self.batch_bytes):
+                self._submit()
+            self._pending.append(vec)
+            self._pending_tickets.append(ticket)
+            self._pending_bytes += size
+        if len(self._pending) >= self.batch_size:
+            self._submit()
+        return len(vectors)
+
+    def _submit(self) -> None:
+        batch, tickets, size = self._pending, self._pending_tickets, self._pending_bytes
+        self._pending, self._pending_tickets, self._pending_bytes = [], [], 0
+        self._in_flight.acquire()
+        self._futures.append(self._executor.submit(self._write, batch, tickets, size))
+
+    def _write(self, batch: List[Any], tickets: List[_Ticket], size: int) -> None:
+        try:
+            ok = self._upsert_with_retry(batch)
+            done: List[_Ticket] = []
+            with self._lock:
+                self._stats["batches"] += 1
+                if ok:
+                    self._stats["vectors_written"] += len(batch)
+                    self._stats["bytes"] += size
+                else:
+                    self._stats["vectors_failed"] += len(batch)
+                    self._stats["failed_batches"] += 1
+                for ticket in tickets:
+                    ticket.failed = ticket.failed or not ok
+                    ticket.remaining -= 1
+                    if ticket.remaining == 0:
+                        done.append(ticket)
+            for ticket in done:
+                for callback in ((ticket.on_complete if not ticket.failed else None), ticket.on_settled):
+                    if callback is None:
+                        continue
+                    try:
+                        callback()
+                    except Exception as e:
+                        self.logger.exception("Upsert completion callback failed: %s", e)
+        finally:
+            self._in_flight.release()
+
+    def _upsert_with_retry(self, batch: List[Any]) -> bool:
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.index.upsert(batch, namespace=self.namespace)
+                return True
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    self.logger.error("Upsert of %d vectors failed after %d attempt(s): %s", len(batch), attempt + 1, e)
+                    return False
+                delay = min(UPSERT_BACKOFF_MAX, UPSERT_BACKOFF_BASE * (2 ** attempt)) * random.uniform(0.5, 1.0)
+                with self._lock:
+                    self._stats["retries"] += 1
+                self.logger.warning("Upsert of %d vectors failed (%s); retry %d in %.1fs", len(batch), e, attempt + 1, delay)
+                time.sleep(delay)
+        return False
+
+    def flush(self) -> Dict[str, Any]:
+        """Send everything queued and wait for all batches; returns stats"""
+        if self._pending:
+            self._submit()
+        futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+        return self.stats()
+
+    def close(self) -> Dict[str, Any]:
+        """Flush and shut the pool down; returns stats"""
+        try:
+            return self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters plus throughput since the writer was created"""
+        elapsed = max(time.perf_counter() - self._started, 1e-9)
+        with self._lock:
+            stats = dict(self._stats)
+        stats["seconds"] = round(elapsed, 2)
+        stats["vectors_per_sec"] = round(stats["vectors_written"] / elapsed, 1)
+        stats["mb_per_sec"] = round(stats["bytes"] / elapsed / (1024 * 1024), 3)
+        return stats
+
+
+# --- Streaming stages: parse -> chunk -> embed -> upsert ---
+
+_END_OF_STREAM = object()
+
+
+def iter_prefetched(items: Iterable[Any], maxsize: int = STREAM_PREFETCH_GROUPS) -> Iterator[Any]:
+    """
+    Iterate items produced on a background thread, at most maxsize ahead of the consumer,
+    so parsing the next pages overlaps embedding the previous ones.
+    Producer exceptions are re-raised to the consumer; closing the iterator stops the producer.
+    """
+    buffer: "queue.Queue[Tuple[Any, Optional[BaseException]]]" = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+
+    def _put(entry: Tuple[Any, Optional[BaseException]]) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce() -> None:
+        iterator = iter(items)
+        try:
+            for item in iterator:
+                if not _put((item, None)):
+                    return
+        except BaseException as e:
+            _put((_END_OF_STREAM, e))
+            return
+        finally:
+            # Generators (e.g. a half-read parse) release their resources when abandoned
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+        _put((_END_OF_STREAM, None))
+
+    producer = threading.Thread(target=_produce, name="ingest-prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is _END_OF_STREAM:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+class _StreamCompletion:
+    """Runs a callback once a stream has ended and every batch it queued has called done()"""
+
+    def __init__(self, on_complete: Optional[Callable[[], None]]):
+        # The stream itself holds one count until finish()
+        self._pending = 1
+        self._lock = threading.Lock()
+        self._on_complete = on_complete
+
+    def add(self) -> None:
+        with self._lock:
+            self._pending += 1
+
+    def done(self) -> None:
+        with self._lock:
+            self._pending -= 1
+            complete = self._pending == 0
+        if complete and self._on_complete is not None:
+            self._on_complete()
+
+    finish = done
+
+
+def index_chunk_stream(chunks: Iterable[Dict[str, Any]], writer: UpsertWriter, embedding_model: Any, *,
+                       source: str, file_id: Any, id_key: Optional[str] = None,
+                       base_metadata: Optional[Dict[str, Any]] = None, lexical_index: Optional[LexicalIndex] = None,
+                       batch_size: int = EMBED_BATCH_SIZE,
+                       on_progress: Optional[Callable[[Dict[str, int]], None]] = None,
+                       on_batch_written: Optional[Callable[[int], None]] = None,
+                       on_file_complete: Optional[Callable[[List[str]], None]] = None) -> Dict[str, Any]:
+    """
+    Embed one file's chunks batch by batch as the chunker produces them and queue each batch on the writer,
+    so only one embedding batch is held and embedding starts before the file is fully parsed.
+
+    Chunk ids are deterministic (chunk_vector_id), so chunks already in the writer's namespace are
+    skipped without being embedded. New ids go into the manifest before their upsert, and the chunk
+    text into the chunk store.
+
+    Args:
+        chunks: Chunks in document order (chunking.iter_chunks)
+        writer: Upsert writer for the target namespace
+        embedding_model: Model with embed_documents(texts)
+        source, file_id: Manifest key of the file
+        id_key: File key hashed into chunk ids (defaults to file_id)
+        base_metadata: Vector metadata shared by every chunk of the file
+        lexical_index: BM25 index updated once each batch is written
+        batch_size: Chunks per embedding call
+        on_progress: Called after each batch with the running counts
+        on_batch_written: Called (on a writer thread) with the vector count of each written batch
+        on_file_complete: Called with every chunk id of the file once the stream ended and all its batches
+            were written; not called if the stream raised or any batch failed
+
+    Returns:
+        {"chunks", "chunks_skipped", "chunks_embedded", "vectors_queued", "chunk_ids"}
+    """
+    namespace = writer.namespace
+    id_key = str(file_id) if id_key is None else id_key
+    base_metadata = base_metadata or {}
+    chunk_store = get_chunk_store()
+    chunk_ids: List[str] = []
+    counts = {"chunks": 0, "chunks_skipped": 0, "chunks_embedded": 0, "vectors_queued": 0}
+    completion = _StreamCompletion((lambda: on_file_complete(chunk_ids)) if on_file_complete is not None else None)
+
+    def _index_batch(batch: List[Dict[str, Any]]) -> None:
+        offset = counts["chunks"]
+        ids = [chunk_vector_id(source, id_key, offset + i, chunk["text"]) for i, chunk in enumerate(batch)]
+        chunk_ids.extend(ids)
+        counts["chunks"] += len(batch)
+        new_positions = new_chunk_positions(writer.index, ids, namespace)
+        counts["chunks_skipped"] += len(batch) - len(new_positions)
+        # Every id is recorded, including ones already indexed for another file (identical uploads share ids).
+        # Rows go in before the upsert; reconciliation skips them while the file is registered as active
+        record_file_vectors(source, file_id, ids, namespace)
+        if new_positions:
+            embeddings = embedding_model.embed_documents([batch[i]["text"] for i in new_positions])
+            counts["chunks_embedded"] += len(new_positions)
+            vectors = []
+            for position, embedding in zip(new_positions, embeddings):
+                # Page/slide/sheet/section the chunk came from
+                metadata = {**base_metadata, "chunk_index": offset + position, **batch[position]["metadata"]}
+                vectors.append((ids[position], embedding, chunk_metadata(metadata, batch[position]["text"])))
+            texts = {ids[i]: batch[i]["text"] for i in new_positions}
+
+            def _written(vectors=vectors, texts=texts):
+                # Keep the BM25 index in step with the vector index for hybrid retrieval
+                if lexical_index is not None:
+                    lexical_index.add(((vec_id, texts[vec_id], metadata) for vec_id, _, metadata in vectors), namespace=namespace)
+                if on_batch_written is not None:
+                    on_batch_written(len(vectors))
+                completion.done()
+
+            # Chunk text lives in the local chunk store; the index carries ids, embeddings and metadata
+            chunk_store.put(texts.items())
+            completion.add()
+            settled.add()
+            counts["vectors_queued"] += writer.add(vectors, on_complete=_written, on_settled=settled.done)
+        if on_progress is not None:
+            on_progress(dict(counts))
+
+    # Registered until the stream ended and every batch it queued was written or failed
+    prefix = chunk_id_prefix(source, id_key)
+    _active_files.add(prefix)
+    settled = _StreamCompletion(lambda: _active_files.remove(prefix))
+    try:
+        batch: List[Dict[str, Any]] = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                _index_batch(batch)
+                batch = []
+        if batch:
+            _index_batch(batch)
+        completion.finish()
+    finally:
+        settled.finish()
+    return {**counts, "chunk_ids": chunk_ids}
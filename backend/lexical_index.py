@@ -0,0 +1,169 @@
+"""
+Lexical (BM25) index for hybrid retrieval
+Backed by SQLite FTS5, maintained alongside the vector index during ingestion
+"""
+
+import os
+import re
+import json
+import sqlite3
+import logging
+import threading
+from collections import Counter
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LEXICAL_INDEX_PATH = os.getenv(
+    "LEXICAL_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "lexical_index.db")
+)
+# Long RFPs are reduced to their most distinctive terms before matching
+LEXICAL_MAX_QUERY_TERMS = int(os.getenv("LEXICAL_MAX_QUERY_TERMS", "64"))
+
+# Metadata fields stored as plain columns so they can be filtered on
+FILTER_FIELDS = ("knowledge_base", "user_id", "filename")
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is", "it",
+    "its", "of", "on", "or", "that", "the", "this", "to", "was", "were", "will", "with", "shall",
+    "should", "must", "can", "may", "all", "any", "such", "their", "they", "which", "who", "not",
+}
+
+
+def build_match_query(text: str, max_terms: int = LEXICAL_MAX_QUERY_TERMS) -> str:
+    """
+    Turn free text into an FTS5 OR-query of quoted terms.
+    Terms carrying digits or capitals (part numbers, acronyms, product names) are kept first.
+    """
+    counts: Counter = Counter()
+    distinctive = set()
+    for token in _TOKEN_RE.findall(text or ""):
+        lowered = token.lower()
+        if len(lowered) < 2 or lowered in _STOPWORDS:
+            continue
+        counts[lowered] += 1
+        if any(ch.isdigit() for ch in token) or any(ch.isupper() for ch in token[1:]):
+            distinctive.add(lowered)
+    ranked = sorted(counts, key=lambda t: (t not in distinctive, -counts[t]))[:max_terms]
+    return " OR ".join('"' + term.replace('"', '""') + '"' for term in ranked)
+
+
+class LexicalIndex:
+    """BM25 index over chunk text with knowledge_base/user_id/filename filters"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.logger = logging.getLogger("retrieval.lexical")
+        self.path = path or LEXICAL_INDEX_PATH
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            "rowid INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, "
+            "knowledge_base TEXT, user_id TEXT, filename TEXT, metadata TEXT, namespace TEXT)"
+        )
+        # Indexes created before namespaces: existing rows belong to the default namespace (NULL)
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info('docs')").fetchall()]
+        if "namespace" not in columns:
+            self._db.execute("ALTER TABLE docs ADD COLUMN namespace TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_docs_kb ON docs (knowledge_base)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_docs_user ON docs (user_id)")
+        self._db.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(text, tokenize='unicode61 remove_diacritics 2')"
+        )
+        self._db.commit()
+
+    def add(self, entries: Iterable[Tuple[str, str, Dict[str, Any]]], namespace: Optional[str] = None) -> int:
+        """Insert or replace (id, text, metadata) entries of a vector namespace; returns count"""
+        entries = list(entries)
+        if not entries:
+            return 0
+        with self._lock:
+            cur = self._db.cursor()
+            for doc_id, text, metadata in entries:
+                metadata = {k: v for k, v in (metadata or {}).items() if k != "text"}
+                row = cur.execute("SELECT rowid FROM docs WHERE id = ?", (doc_id,)).fetchone()
+                if row:
+                    cur.execute("DELETE FROM docs_fts WHERE rowid = ?", (row[0],))
+                    cur.execute("DELETE FROM docs WHERE rowid = ?", (row[0],))
+                cur.execute(
+                    "INSERT INTO docs (id, knowledge_base, user_id, filename, metadata, namespace) VALUES (?, ?, ?, ?, ?, ?)",
+                    (doc_id, *(metadata.get(f) for f in FILTER_FIELDS), json.dumps(metadata), namespace)
+                )
+                cur.execute("INSERT INTO docs_fts (rowid, text) VALUES (?, ?)", (cur.lastrowid, text or ""))
+            self._db.commit()
+        return len(entries)
+
+    def delete(self, ids: Iterable[str]) -> None:
+        """Delete entries by id (missing ids are ignored)"""
+        ids = list(ids)
+        if not ids:
+            return
+        with self._lock:
+            cur = self._db.cursor()
+            for doc_id in ids:
+                row = cur.execute("SELECT rowid FROM docs WHERE id = ?", (doc_id,)).fetchone()
+                if row:
+                    cur.execute("DELETE FROM docs_fts WHERE rowid = ?", (row[0],))
+                    cur.execute("DELETE FROM docs WHERE rowid = ?", (row[0],))
+            self._db.commit()
+
+    def list_ids(self) -> List[str]:
+        """All ids in the index"""
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT id FROM docs").fetchall()]
+
+    def search(self, query_text: str, top_k: int = 5, filter: Optional[Dict[str, Any]] = None,
+               namespaces: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        BM25 search
+
+        Args:
+            query_text: Free text (RFP or question)
+            top_k: Number of results
+            filter: Equality filter on knowledge_base/user_id/filename ({"field": value} or {"field": {"$eq": value}})
+            namespaces: Restrict to entries of these vector namespaces ("" matches entries without one)
+
+        Returns:
+            [{"id", "score", "text", "metadata", "namespace"}, ...] sorted by score desc
+        """
+        match = build_match_query(query_text)
+        if not match:
+            return []
+        sql = (
+            "SELECT d.id, d.metadata, d.namespace, docs_fts.text, bm25(docs_fts) AS rank "
+            "FROM docs_fts JOIN docs d ON d.rowid = docs_fts.rowid WHERE docs_fts MATCH ?"
+        )
+        params: List[Any] = [match]
+        for field, condition in (filter or {}).items():
+            if field not in FILTER_FIELDS:
+                raise ValueError(f"Unsupported lexical filter field: {field}")
+            value = condition.get("$eq") if isinstance(condition, dict) else condition
+            sql += f" AND d.{field} = ?"
+            params.append(value)
+        if namespaces is not None:
+            sql += f" AND COALESCE(d.namespace, '') IN ({','.join('?' * len(namespaces))})"
+            params.extend(namespaces)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(top_k)
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [
+            {"id": doc_id, "score": -rank, "text": text, "metadata": json.loads(metadata or "{}"), "namespace": namespace or ""}
+            for doc_id, metadata, namespace, text, rank in rows
+        ]
+
+
+# Singleton instance
+_lexical_index: Optional[LexicalIndex] = None
+_lexical_index_lock = threading.Lock()
+
+def get_lexical_index() -> LexicalIndex:
+    """Get or create the lexical index singleton"""
+    global _lexical_index
+    with _lexical_index_lock:
+        if _lexical_index is None:
+            _lexical_index = LexicalIndex()
+        return _lexical_index
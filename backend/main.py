@@ -1,8 +1,8 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Header
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Dict
 import sys
 import warnings
 import sys
@@ -15,7 +15,6 @@ import asyncio
 from groq import Groq
 from dotenv import load_dotenv
 import logging
-import PyPDF2
 from docx import Document
 from docx.shared import Inches, Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_TAB_ALIGNMENT, WD_TAB_LEADER
@@ -25,12 +24,18 @@ import requests,base64
 from fastapi import Request
 import asyncio
 import time
+import threading
 
-from pinecone import Pinecone
-from langchain_pinecone import PineconeVectorStore
+from vector_store import get_vector_index, VECTOR_STORE_BACKEND
+from lexical_index import get_lexical_index
+from chunk_store import get_chunk_store
+from retrieval import Retriever
+from reranker import get_reranker, RERANKER_ENABLED
+from embeddings import get_embedding_model
+from warmup import get_warmup
+from file_parsers import FileParser, warm_up_parse_pool
 
 #from langchain_community.embeddings.sentence_transformer import SentenceTransformerEmbeddings
-from langchain_huggingface import HuggingFaceEmbeddings
 
 app = FastAPI(title="RFP Solution Generator")
 
@@ -95,28 +100,48 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 if not GROQ_API_KEY:
     raise ValueError("GROQ_API_KEY environment variable is required")
 
-# --- NEW PINECONE CONFIGURATION ---
+# --- VECTOR STORE CONFIGURATION ---
+# VECTOR_STORE_BACKEND=pinecone (default) or local; see vector_store.py
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_ENVIRONMENT = os.getenv("PINECONE_ENVIRONMENT")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
 
-if not all([PINECONE_API_KEY, PINECONE_ENVIRONMENT, PINECONE_INDEX_NAME]):
+if VECTOR_STORE_BACKEND == "pinecone" and not all([PINECONE_API_KEY, PINECONE_ENVIRONMENT, PINECONE_INDEX_NAME]):
     raise ValueError("Pinecone environment variables are required")
 
-EMBEDDING_MODEL = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+# The embedding model and vector index are built on first use (or by the background warm-up below),
+# so importing this module stays cheap and startup does not depend on Pinecone being reachable
+_retriever: Optional[Retriever] = None
+_retriever_lock = threading.Lock()
 
-# Initialize Pinecone client and vector store
-pc = Pinecone(api_key=PINECONE_API_KEY)
-
-# Use existing index
-try:
-    VECTOR_STORE = PineconeVectorStore(
-        index_name=PINECONE_INDEX_NAME,
-        embedding=EMBEDDING_MODEL
-    )
-except Exception as e:
-    raise RuntimeError(f"Failed to connect to Pinecone index: {e}")
-# --- END NEW PINECONE CONFIGURATION ---
+def get_retriever() -> Retriever:
+    """Get or create the retriever (loads the embedding model and connects the vector index)"""
+    global _retriever
+    with _retriever_lock:
+        if _retriever is None:
+            try:
+                index = get_vector_index()
+            except Exception as e:
+                raise RuntimeError(f"Failed to connect to vector store ({VECTOR_STORE_BACKEND}): {e}")
+            _retriever = Retriever(get_embedding_model(), index, get_lexical_index(), reranker=get_reranker(), chunk_store=get_chunk_store())
+        return _retriever
+
+# Background warm-up: preload models and connections; /api/ready reports progress
+_warmup = get_warmup()
+_warmup.register("embedding_model", lambda: get_embedding_model().embed_query("warm-up"))
+_warmup.register("vector_index", get_vector_index)
+_warmup.register("lexical_index", get_lexical_index)
+_warmup.register("chunk_store", get_chunk_store)
+if RERANKER_ENABLED:
+    # Optional: reranking falls back to first-stage order while the cross-encoder loads
+    _warmup.register("reranker", lambda: get_reranker().warm_up(), required=False)
+_warmup.register("retriever", get_retriever)
+_warmup.register("parser_pool", warm_up_parse_pool, required=False)
+
+@app.on_event("startup")
+async def _startup_warmup():
+    _warmup.start()
+# --- END VECTOR STORE CONFIGURATION ---
 
 # New: environment-driven configuration
 GROQ_MODEL = os.getenv("GROQ_MODEL", "moonshotai/kimi-k2-instruct")
@@ -139,18 +164,21 @@ groq_client = Groq(api_key=GROQ_API_KEY, max_retries=0)
 SHAREPOINT_AUTO_SYNC_ENABLED = (os.getenv("SHAREPOINT_AUTO_SYNC_ENABLED", "true").lower() in ("1","true","yes"))
 SHAREPOINT_SYNC_INTERVAL_MINUTES = int(os.getenv("SHAREPOINT_SYNC_INTERVAL_MINUTES", "60"))  # default hourly
 SHAREPOINT_INITIAL_SYNC_ON_START = (os.getenv("SHAREPOINT_INITIAL_SYNC_ON_START", "true").lower() in ("1","true","yes"))
+VECTOR_RECONCILE_INTERVAL_HOURS = float(os.getenv("VECTOR_RECONCILE_INTERVAL_HOURS", "24"))  # 0 disables
 
 async def _sharepoint_sync_worker() -> None:
     """Background task to keep AIonOS Knowledge Base up-to-date automatically."""
     try:
-        from sharepoint_pipeline import SharePointIngestionPipeline, run_incremental_sync
-        pipeline = SharePointIngestionPipeline()
+        from sharepoint_pipeline import SharePointIngestionPipeline, run_incremental_sync, run_reconcile
+        # Sync work is blocking (downloads, parsing, embedding); keep it off the event loop
+        pipeline = await asyncio.to_thread(SharePointIngestionPipeline)
+        last_reconcile = time.monotonic()
 
         # Perform initial sync once if requested and not yet done
         if SHAREPOINT_INITIAL_SYNC_ON_START and not pipeline.delta_link:
             safe_print("[SharePoint Sync] Running initial sync on startup...")
             try:
-                result = pipeline.initial_sync()
+                result = await asyncio.to_thread(pipeline.initial_sync)
                 safe_print(f"[SharePoint Sync] Initial sync finished: files={result.get('files_processed')} chunks={result.get('chunks_created')} vectors={result.get('vectors_uploaded')}")
             except Exception as e:
                 safe_print(f"[SharePoint Sync] Initial sync failed: {e}")
@@ -160,11 +188,19 @@ async def _sharepoint_sync_worker() -> None:
         while True:
             try:
                 safe_print("[SharePoint Sync] Running incremental sync...")
-                result = run_incremental_sync()
+                result = await asyncio.to_thread(run_incremental_sync)
                 # result is a dict with stats
                 safe_print(f"[SharePoint Sync] Incremental sync completed: files_processed={result.get('files_processed')} files_updated={result.get('files_updated')} files_deleted={result.get('files_deleted')} vectors={result.get('vectors_uploaded')}")
             except Exception as e:
                 safe_print(f"[SharePoint Sync] Incremental sync failed: {e}")
+            # Periodic orphan cleanup against the file -> vector manifest
+            if VECTOR_RECONCILE_INTERVAL_HOURS > 0 and time.monotonic() - last_reconcile >= VECTOR_RECONCILE_INTERVAL_HOURS * 3600:
+                last_reconcile = time.monotonic()
+                try:
+                    result = await asyncio.to_thread(run_reconcile)
+                    safe_print(f"[SharePoint Sync] Reconcile completed: orphans_deleted={result.get('orphans_deleted')} missing_from_index={result.get('missing_from_index')} legacy_vectors={result.get('legacy_vectors')}")
+                except Exception as e:
+                    safe_print(f"[SharePoint Sync] Reconcile failed: {e}")
             await asyncio.sleep(interval_seconds)
     except Exception as e:
         safe_print(f"[SharePoint Sync] Worker crashed: {e}")
@@ -305,35 +341,51 @@ class RetrievalInfo(BaseModel):
     top_k: Optional[int] = None
     retrieved_count: int = 0
     filenames: List[str] = []
+    mode: Optional[str] = None  # 'hybrid' (dense + BM25) or 'dense'
+    namespaces: List[str] = []  # vector index namespaces searched
+    timings_ms: Dict[str, float] = {}
+    reranked: bool = False  # True when the cross-encoder order was used
+    rerank_scores: List[float] = []
 
 class SolutionWithRecommendations(BaseModel):
     solution: GeneratedSolution
     recommendations: List[ProductRecommendation] = []
     retrieval_info: Optional[RetrievalInfo] = None
 
-# Document extraction functions
-def extract_text_from_pdf(file_path: str) -> str:
-    """Extract text from PDF file"""
-    text = ""
+# Document extraction functions (shared parsing engine, see file_parsers.py)
+def extract_text_from_pdf(file_content: bytes) -> str:
+    """Extract text from PDF bytes"""
     try:
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
+        return FileParser.parse_text(file_content, "document.pdf")
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error reading PDF: {str(e)}")
-    return text
 
-def extract_text_from_docx(file_path: str) -> str:
-    """Extract text from Word document"""
-    text = ""
+def extract_text_from_docx(file_content: bytes) -> str:
+    """Extract text from Word document bytes"""
     try:
-        doc = Document(file_path)
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
+        return FileParser.parse_text(file_content, "document.docx")
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error reading Word document: {str(e)}")
-    return text
+
+async def read_upload(file: UploadFile) -> bytearray:
+    """
+    Read an upload in 1 MB chunks into one in-memory buffer, enforcing MAX_FILE_SIZE_MB.
+    The buffer belongs to the request (no shared temp path) and is parsed in place: the parsers
+    accept any bytes-like object, so it is never copied or written to disk.
+    """
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(1024 * 1024)
+        if not chunk:
+            break
+        if len(buffer) + len(chunk) > MAX_FILE_SIZE_BYTES:
+            raise HTTPException(status_code=400, detail=f"File too large. Max size is {MAX_FILE_SIZE_MB}MB.")
+        buffer += chunk
+    await file.close()
+
+    if not buffer:
+        raise HTTPException(status_code=400, detail="Uploaded file is empty.")
+    return buffer
 
 # Legacy .doc is intentionally not supported per requirements
 
@@ -1149,46 +1201,24 @@ async def async_llm_complete(messages: List[dict], temperature: float = 0.3, max
     return await asyncio.to_thread(_call_with_retries)
 
 # LLM Processing
-async def analyze_rfp_with_groq(rfp_text: str, use_rag: bool = True, knowledge_base: Optional[str] = None):
+async def analyze_rfp_with_groq(rfp_text: str, use_rag: bool = True, knowledge_base: Optional[str] = None, user_id: Optional[str] = None):
     """Analyze RFP text using Groq and generate solution with multi-stage expansion
     
     Args:
         rfp_text: Input RFP text or problem statement
         use_rag: Whether to use RAG retrieval
         knowledge_base: Optional knowledge base filter ('AIonOS' for SharePoint, None for uploaded solutions)
+        user_id: Requesting user (X-User-Id); scopes retrieval of uploaded solutions
     """
 
-    # Step 1: Retrieve relevant documents from vector store
+    # Step 1: Retrieve relevant documents (dense + BM25, fused with RRF)
     retrieved_docs = []
+    retrieval_stats: dict = {}
     if use_rag:
         try:
-            # If knowledge_base is specified, use Pinecone client directly for metadata filtering
-            if knowledge_base == "AIonOS":
-                try:
-                    # Use Pinecone query with metadata filter
-                    query_vector = EMBEDDING_MODEL.embed_query(rfp_text)
-                    results = pc.Index(PINECONE_INDEX_NAME).query(
-                        vector=query_vector,
-                        top_k=5,
-                        include_metadata=True,
-                        filter={"knowledge_base": {"$eq": "AIonOS"}}
-                    )
-                    # Convert to LangChain Document format
-                    from langchain.schema import Document
-                    retrieved_docs = [
-                        Document(
-                            page_content=match['metadata'].get('text', ''),
-                            metadata=match['metadata']
-                        )
-                        for match in results['matches']
-                    ]
-                    safe_print(f"Retrieved {len(retrieved_docs)} documents from AIonOS knowledge base")
-                except Exception as e:
-                    safe_print(f"Error querying Pinecone with filter: {e}, falling back to standard search")
-                    retrieved_docs = VECTOR_STORE.similarity_search(rfp_text, k=5)
-            else:
-                # Standard RAG without filter (uses uploaded solutions)
-                retrieved_docs = VECTOR_STORE.similarity_search(rfp_text, k=5)
+            retriever = await asyncio.to_thread(get_retriever)
+            retrieved_docs, retrieval_stats = await retriever.retrieve(rfp_text, top_k=5, knowledge_base=knowledge_base, user_id=user_id)
+            safe_print(f"Retrieved {len(retrieved_docs)} documents ({retrieval_stats.get('mode')}) timings_ms={retrieval_stats.get('timings_ms')}")
         except Exception as e:
             safe_print(f"Error retrieving from vector store: {str(e)}")
             retrieved_docs = []
@@ -1219,7 +1249,12 @@ async def analyze_rfp_with_groq(rfp_text: str, use_rag: bool = True, knowledge_b
             knowledge_base=knowledge_base,
             top_k=5,
             retrieved_count=len(retrieved_docs),
-            filenames=filenames[:10]
+            filenames=filenames[:10],
+            mode=retrieval_stats.get("mode"),
+            namespaces=retrieval_stats.get("namespaces", []),
+            timings_ms=retrieval_stats.get("timings_ms", {}),
+            reranked=retrieval_stats.get("reranked", False),
+            rerank_scores=retrieval_stats.get("rerank_scores", [])
         )
     
     # Step 2: Build enhanced prompt with detailed architecture diagram instructions
@@ -1940,7 +1975,7 @@ def create_word_document(solution: GeneratedSolution) -> str:
 
 # API Endpoints
 @app.post("/api/generate-solution", response_model=SolutionWithRecommendations)
-async def generate_solution(file: UploadFile = File(...), method: str = "knowledgeBase", knowledge_base: Optional[str] = None):
+async def generate_solution(file: UploadFile = File(...), method: str = "knowledgeBase", knowledge_base: Optional[str] = None, x_user_id: Optional[str] = Header(None)):
     """Generate solution from uploaded RFP document"""
     logging.getLogger("sharepoint.flow").info("generate-solution called method=%s knowledge_base=%s", method, knowledge_base)
     
@@ -1949,33 +1984,15 @@ async def generate_solution(file: UploadFile = File(...), method: str = "knowled
     if file.content_type not in allowed_types:
         raise HTTPException(status_code=400, detail=f"Unsupported file type: {file.content_type}. Only PDF and DOCX are supported.")
     
-    # Create temporary file
-    temp_dir = tempfile.gettempdir()
-    temp_file_path = os.path.join(temp_dir, file.filename)
-    
     try:
-        # Save uploaded file while enforcing size limit
-        with open(temp_file_path, "wb") as buffer:
-            total_written = 0
-            while True:
-                chunk = await file.read(1024 * 1024)
-                if not chunk:
-                    break
-                total_written += len(chunk)
-                if total_written > MAX_FILE_SIZE_BYTES:
-                    raise HTTPException(status_code=400, detail=f"File too large. Max size is {MAX_FILE_SIZE_MB}MB.")
-                buffer.write(chunk)
-        await file.close()
-
-        # Double-check file size on disk
-        if os.path.getsize(temp_file_path) == 0:
-            raise HTTPException(status_code=400, detail="Uploaded file is empty.")
+        # Read the upload (size limit enforced) and parse straight from the buffer
+        file_content = await read_upload(file)
         
         # Extract text based on file type
         if file.content_type == 'application/pdf':
-            rfp_text = extract_text_from_pdf(temp_file_path)
+            rfp_text = await asyncio.to_thread(extract_text_from_pdf, file_content)
         elif file.content_type == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document':
-            rfp_text = extract_text_from_docx(temp_file_path)
+            rfp_text = await asyncio.to_thread(extract_text_from_docx, file_content)
         else:
             raise HTTPException(status_code=400, detail=f"Unsupported file type: {file.content_type}")
         
@@ -1986,7 +2003,7 @@ async def generate_solution(file: UploadFile = File(...), method: str = "knowled
         if method == "llmOnly":
             solution, retrieval_info = await analyze_rfp_with_groq(rfp_text, use_rag=False)
         else:
-            solution, retrieval_info = await analyze_rfp_with_groq(rfp_text, use_rag=True, knowledge_base=knowledge_base)
+            solution, retrieval_info = await analyze_rfp_with_groq(rfp_text, use_rag=True, knowledge_base=knowledge_base, user_id=x_user_id or "anonymous")
         
         recs = find_product_recommendations(solution.problem_statement, threshold=0.20)
         return SolutionWithRecommendations(solution=solution, recommendations=recs, retrieval_info=retrieval_info)
@@ -1996,23 +2013,16 @@ async def generate_solution(file: UploadFile = File(...), method: str = "knowled
     except Exception as e:
         safe_print(f"FATAL ERROR in /api/generate-solution: {e}") 
         raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
-    finally:
-        # Cleanup temporary file
-        if os.path.exists(temp_file_path):
-            try:
-                os.remove(temp_file_path)
-            except Exception:
-                pass
 
 @app.post("/api/generate-solution-text", response_model=SolutionWithRecommendations)
-async def generate_solution_text(body: GenerateTextBody):
+async def generate_solution_text(body: GenerateTextBody, x_user_id: Optional[str] = Header(None)):
     """Generate solution directly from a raw problem statement / use case text."""
     rfp_text = (body.text or "").strip()
     if not rfp_text:
         raise HTTPException(status_code=400, detail="Text is required")
     try:
         logging.getLogger("sharepoint.flow").info("generate-solution-text called method=%s knowledge_base=%s", body.method, body.knowledge_base)
-        solution, retrieval_info = await analyze_rfp_with_groq(rfp_text, use_rag=(body.method != "llmOnly"), knowledge_base=body.knowledge_base)
+        solution, retrieval_info = await analyze_rfp_with_groq(rfp_text, use_rag=(body.method != "llmOnly"), knowledge_base=body.knowledge_base, user_id=x_user_id or "anonymous")
         recs = find_product_recommendations(solution.problem_statement, threshold=0.20)
         return SolutionWithRecommendations(solution=solution, recommendations=recs, retrieval_info=retrieval_info)
     except Exception as e:
@@ -2446,6 +2456,13 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness endpoint: 200 once required components are warmed up, 503 (with per-component status) until then"""
+    status = _warmup.status()
+    status["timestamp"] = datetime.now().isoformat()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
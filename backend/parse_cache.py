@@ -0,0 +1,135 @@
+"""
+Extracted-text cache
+Parsed blocks keyed by SHA-256 of the file bytes plus the parser version, stored as zstd-compressed
+JSON in SQLite with a size cap and least-recently-used eviction. A file that arrives again
+(re-upload, SharePoint re-sync, another entry point) skips parsing entirely.
+"""
+
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+load_dotenv()
+
+PARSE_CACHE_ENABLED = (os.getenv("PARSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes"))
+PARSE_CACHE_PATH = os.getenv(
+    "PARSE_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "parse_cache.db")
+)
+PARSE_CACHE_MAX_MB = int(os.getenv("PARSE_CACHE_MAX_MB", "512"))
+# Eviction trims the cache to this fraction of the cap, so it does not run on every insert
+_EVICT_TO_FRACTION = 0.9
+
+_CODEC_ZSTD = "zstd"
+_CODEC_ZLIB = "zlib"
+
+
+def cache_key(file_content: bytes, variant: str) -> str:
+    """SHA-256 of the bytes plus the parser variant (version, extension, options)"""
+    return f"{hashlib.sha256(file_content).hexdigest()}:{variant}"
+
+
+class ParseCache:
+    """key -> parsed blocks, compressed with zstd (zlib when zstandard is not installed)"""
+
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.logger = logging.getLogger("parsing.cache")
+        self.path = path or PARSE_CACHE_PATH
+        self.max_bytes = max_bytes if max_bytes is not None else PARSE_CACHE_MAX_MB * 1024 * 1024
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS parsed ("
+            "key TEXT PRIMARY KEY, codec TEXT NOT NULL, body BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_parsed_access ON parsed (last_access)")
+        self._db.commit()
+        self._total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM parsed").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        if ZSTD_AVAILABLE:
+            self._compressor = zstandard.ZstdCompressor(level=3)
+            self._decompressor = zstandard.ZstdDecompressor()
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """Cached blocks for key (refreshing its LRU position), or None"""
+        with self._lock:
+            row = self._db.execute("SELECT codec, body FROM parsed WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE parsed SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            self.hits += 1
+        codec, body = row
+        if codec == _CODEC_ZSTD:
+            if not ZSTD_AVAILABLE:
+                return None
+            raw = self._decompressor.decompress(body)
+        else:
+            raw = zlib.decompress(body)
+        return json.loads(raw.decode("utf-8"))
+
+    def put(self, key: str, blocks: List[Dict[str, Any]]) -> None:
+        """Store blocks under key, evicting least recently used entries beyond the size cap"""
+        raw = json.dumps(blocks, ensure_ascii=False).encode("utf-8")
+        if ZSTD_AVAILABLE:
+            codec, body = _CODEC_ZSTD, self._compressor.compress(raw)
+        else:
+            codec, body = _CODEC_ZLIB, zlib.compress(raw)
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._db.execute("SELECT size FROM parsed WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO parsed (key, codec, body, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, codec, body, len(body), time.time())
+            )
+            self._total_bytes += len(body) - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict(int(self.max_bytes * _EVICT_TO_FRACTION))
+            self._db.commit()
+
+    def _evict(self, target_bytes: int) -> None:
+        evicted = 0
+        for key, size in self._db.execute("SELECT key, size FROM parsed ORDER BY last_access").fetchall():
+            if self._total_bytes <= target_bytes:
+                break
+            self._db.execute("DELETE FROM parsed WHERE key = ?", (key,))
+            self._total_bytes -= size
+            evicted += 1
+        self.logger.info("Evicted %d cached documents (cache now %.1f MB)", evicted, self._total_bytes / 1e6)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM parsed").fetchone()[0]
+        return {"entries": entries, "bytes": self._total_bytes, "hits": self.hits, "misses": self.misses}
+
+
+# Singleton instance
+_parse_cache: Optional[ParseCache] = None
+_parse_cache_lock = threading.Lock()
+
+def get_parse_cache() -> Optional[ParseCache]:
+    """Get or create the parse cache singleton, or None when PARSE_CACHE_ENABLED is off"""
+    global _parse_cache
+    if not PARSE_CACHE_ENABLED:
+        return None
+    with _parse_cache_lock:
+        if _parse_cache is None:
+            _parse_cache = ParseCache()
+        return _parse_cache
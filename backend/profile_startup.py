@@ -0,0 +1,43 @@
+"""
+Import-time profile of the API module
+Runs `python -X importtime -c "import main"` in a fresh interpreter and prints the total plus the
+slowest top-level imports, so changes to startup cost can be compared before/after.
+
+Usage: python profile_startup.py [module] [top_n]
+"""
+
+import os
+import re
+import sys
+import subprocess
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def profile_imports(module: str = "main"):
+    """[(cumulative_us, self_us, depth, name), ...] for one import of module"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        print(proc.stderr.splitlines()[-1] if proc.stderr else f"import {module} failed")
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((int(cumulative_us), int(self_us), len(indent) // 2, name))
+    return rows
+
+
+if __name__ == "__main__":
+    module = sys.argv[1] if len(sys.argv) > 1 else "main"
+    top_n = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rows = profile_imports(module)
+    top_level = [row for row in rows if row[2] == 0]
+    total = sum(row[0] for row in top_level)
+    print(f"import {module}: {total / 1e6:.2f}s across {len(rows)} modules")
+    print(f"{'cumulative':>12} {'self':>10}  module")
+    for cumulative_us, self_us, _, name in sorted(top_level, reverse=True)[:top_n]:
+        print(f"{cumulative_us / 1e3:>10.1f}ms {self_us / 1e3:>8.1f}ms  {name}")
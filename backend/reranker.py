@@ -0,0 +1,103 @@
+"""
+Cross-encoder reranking stage for retrieval
+Rescores first-stage candidates on CPU under a hard latency budget
+"""
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RERANKER_ENABLED = (os.getenv("RERANKER_ENABLED", "false").lower() in ("1", "true", "yes"))
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# First-stage candidates handed to the reranker
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "50"))
+RERANK_BUDGET_MS = int(os.getenv("RERANK_BUDGET_MS", "400"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+# Cross-encoders read ~512 word pieces per pair; keep the query side short
+RERANK_QUERY_WORDS = int(os.getenv("RERANK_QUERY_WORDS", "96"))
+
+
+class CrossEncoderReranker:
+    """
+    sentence-transformers CrossEncoder with a latency budget.
+    Scoring runs on a single dedicated worker; if it does not finish within the budget
+    (including a cold model load or a previous overrun still holding the worker) rerank() returns None
+    and callers keep the first-stage order.
+    """
+
+    def __init__(self, model_name: str = RERANKER_MODEL, budget_ms: int = RERANK_BUDGET_MS,
+                 batch_size: int = RERANK_BATCH_SIZE):
+        self.logger = logging.getLogger("retrieval.reranker")
+        self.model_name = model_name
+        self.budget_ms = budget_ms
+        self.batch_size = batch_size
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reranker")
+
+    def _get_model(self):
+        with self._model_lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+                self.logger.info("Loading cross-encoder: %s", self.model_name)
+                self._model = CrossEncoder(self.model_name, device="cpu")
+            return self._model
+
+    def warm_up(self) -> None:
+        """Load the model ahead of the first request"""
+        self._get_model()
+
+    def _score(self, query: str, passages: List[str], deadline: float) -> Optional[List[float]]:
+        model = self._get_model()
+        scores: List[float] = []
+        for start in range(0, len(passages), self.batch_size):
+            if time.perf_counter() > deadline:
+                return None
+            batch = passages[start:start + self.batch_size]
+            scores.extend(float(s) for s in model.predict([(query, p) for p in batch], batch_size=self.batch_size))
+        return scores
+
+    def rerank(self, query: str, passages: List[str]) -> Optional[Tuple[List[int], List[float]]]:
+        """
+        Score (query, passage) pairs
+
+        Returns:
+            (passage indices sorted by score desc, their scores) or None if the budget was exceeded
+        """
+        if not passages:
+            return [], []
+        query = " ".join(query.split()[:RERANK_QUERY_WORDS])
+        deadline = time.perf_counter() + self.budget_ms / 1000.0
+        future = self._executor.submit(self._score, query, passages, deadline)
+        try:
+            scores = future.result(timeout=self.budget_ms / 1000.0)
+        except FutureTimeoutError:
+            self.logger.warning("Rerank exceeded %d ms budget; keeping first-stage order", self.budget_ms)
+            return None
+        except Exception as e:
+            self.logger.warning("Rerank failed: %s; keeping first-stage order", e)
+            return None
+        if scores is None:
+            self.logger.warning("Rerank exceeded %d ms budget; keeping first-stage order", self.budget_ms)
+            return None
+        order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        return order, [scores[i] for i in order]
+
+
+# Singleton instance
+_reranker: Optional[CrossEncoderReranker] = None
+
+def get_reranker() -> Optional[CrossEncoderReranker]:
+    """Get the reranker singleton, or None when RERANKER_ENABLED is off"""
+    global _reranker
+    if not RERANKER_ENABLED:
+        return None
+    if _reranker is None:
+        _reranker = CrossEncoderReranker()
+    return _reranker
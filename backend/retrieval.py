@@ -0,0 +1,309 @@
+"""
+Retrieval pipeline for RAG
+Runs dense (vector) and lexical (BM25) retrieval concurrently and fuses them with reciprocal rank fusion
+"""
+
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+from dotenv import load_dotenv
+
+from vector_store import (
+    VectorIndex, DEFAULT_NAMESPACE, AIONOS_NAMESPACE, LEGACY_NAMESPACE_FALLBACK, upload_namespace
+)
+from lexical_index import LexicalIndex
+from chunk_store import ChunkStore
+from reranker import CrossEncoderReranker, RERANK_CANDIDATES
+from diversify import diversify, DIVERSIFY_ENABLED
+
+load_dotenv()
+
+HYBRID_RETRIEVAL_ENABLED = (os.getenv("HYBRID_RETRIEVAL_ENABLED", "true").lower() in ("1", "true", "yes"))
+# Candidates pulled from each retriever before fusion
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "20"))
+# Standard RRF damping constant (Cormack et al.)
+RRF_K = int(os.getenv("RRF_K", "60"))
+# all-MiniLM-L6-v2 truncates at 256 word pieces (~180 words); long RFPs are queried as several windows
+QUERY_WINDOW_WORDS = int(os.getenv("QUERY_WINDOW_WORDS", "160"))
+QUERY_WINDOW_OVERLAP = int(os.getenv("QUERY_WINDOW_OVERLAP", "30"))
+MAX_QUERY_WINDOWS = int(os.getenv("MAX_QUERY_WINDOWS", "8"))
+# How per-window scores combine per chunk: "max" or "sum"
+QUERY_AGGREGATION = os.getenv("QUERY_AGGREGATION", "max").lower()
+# Ranked candidates considered by diversification (dedup + MMR) per requested result
+DIVERSITY_POOL_FACTOR = int(os.getenv("DIVERSITY_POOL_FACTOR", "3"))
+# Upper bound on concurrent index queries (query windows x search targets)
+MAX_QUERY_CONCURRENCY = int(os.getenv("MAX_QUERY_CONCURRENCY", "16"))
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists: score(id) = sum over lists of 1 / (k + rank)"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def split_query_windows(text: str, window_words: int = QUERY_WINDOW_WORDS,
+                        overlap: int = QUERY_WINDOW_OVERLAP, max_windows: int = MAX_QUERY_WINDOWS) -> List[str]:
+    """
+    Split a long query into overlapping word windows that fit the embedding model.
+    When there are more than max_windows, windows are sampled evenly so the whole document is covered.
+    """
+    words = (text or "").split()
+    if len(words) <= window_words:
+        return [" ".join(words)] if words else []
+    step = max(1, window_words - overlap)
+    windows = [" ".join(words[i:i + window_words]) for i in range(0, len(words) - overlap, step)]
+    if len(windows) > max_windows:
+        last = len(windows) - 1
+        picks = sorted({round(i * last / (max_windows - 1)) for i in range(max_windows)}) if max_windows > 1 else [0]
+        windows = [windows[i] for i in picks]
+    return windows
+
+
+def aggregate_window_matches(per_window: List[List[Dict[str, Any]]], mode: str = QUERY_AGGREGATION) -> List[Dict[str, Any]]:
+    """
+    Merge per-window match lists into one deduplicated, diversified ranking.
+    Each window's best chunk is placed first (so every part of the RFP is represented),
+    the rest follow by aggregated score (max or sum over windows).
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for matches in per_window:
+        for match in matches:
+            current = merged.get(match["id"])
+            if current is None:
+                merged[match["id"]] = dict(match)
+            elif mode == "sum":
+                current["score"] += match["score"]
+            else:
+                current["score"] = max(current["score"], match["score"])
+    by_score = sorted(merged.values(), key=lambda m: m["score"], reverse=True)
+    leaders: List[str] = []
+    for matches in per_window:
+        if matches and matches[0]["id"] not in leaders:
+            leaders.append(matches[0]["id"])
+    leaders.sort(key=lambda doc_id: merged[doc_id]["score"], reverse=True)
+    leader_set = set(leaders)
+    return [merged[doc_id] for doc_id in leaders] + [m for m in by_score if m["id"] not in leader_set]
+
+
+def knowledge_base_filter(knowledge_base: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Metadata filter for a knowledge base ('AIonOS' for SharePoint, None for everything)"""
+    if knowledge_base == "AIonOS":
+        return {"knowledge_base": {"$eq": "AIonOS"}}
+    return None
+
+
+def user_filter(user_id: Optional[str]) -> Dict[str, Any]:
+    """Metadata filter for one user's uploaded solutions"""
+    return {"user_id": {"$eq": user_id or "anonymous"}}
+
+
+SearchTarget = Tuple[str, Optional[Dict[str, Any]]]
+
+
+def search_targets(knowledge_base: Optional[str], user_id: Optional[str] = None) -> List[SearchTarget]:
+    """
+    (namespace, filter) pairs visible to a request: AIonOS only for 'AIonOS', otherwise AIonOS plus
+    the requesting user's uploads. Uploads are always filtered on user_id, since the uploads namespace
+    is shared unless PER_USER_NAMESPACES. While LEGACY_NAMESPACE_FALLBACK is on the default namespace
+    is searched too, restricted to AIonOS content and the user's own uploads.
+    """
+    kb_filter = knowledge_base_filter(knowledge_base)
+    if knowledge_base == "AIonOS":
+        targets: List[SearchTarget] = [(AIONOS_NAMESPACE, kb_filter)]
+        if LEGACY_NAMESPACE_FALLBACK:
+            targets.append((DEFAULT_NAMESPACE, kb_filter))
+        return targets
+    targets = [(AIONOS_NAMESPACE, kb_filter), (upload_namespace(user_id), user_filter(user_id))]
+    if LEGACY_NAMESPACE_FALLBACK:
+        # One query per filter: the local engine and the lexical index only AND their conditions
+        targets.append((DEFAULT_NAMESPACE, knowledge_base_filter("AIonOS")))
+        targets.append((DEFAULT_NAMESPACE, user_filter(user_id)))
+    return targets
+
+
+def _target_namespaces(targets: List[SearchTarget]) -> List[str]:
+    namespaces: List[str] = []
+    for namespace, _ in targets:
+        if namespace not in namespaces:
+            namespaces.append(namespace)
+    return namespaces
+
+
+def _merge_namespace_matches(matches: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+    """Merge one window's per-namespace results by score, keeping the best copy of each id"""
+    merged: List[Dict[str, Any]] = []
+    seen = set()
+    for match in sorted(matches, key=lambda m: m["score"], reverse=True):
+        if match["id"] not in seen:
+            seen.add(match["id"])
+            merged.append(match)
+    return merged[:top_k]
+
+
+class Retriever:
+    """Dense + lexical retriever used by the RFP analysis endpoints"""
+
+    def __init__(self, embedding_model: Any, index: VectorIndex, lexical_index: Optional[LexicalIndex] = None,
+                 reranker: Optional[CrossEncoderReranker] = None, chunk_store: Optional[ChunkStore] = None):
+        self.logger = logging.getLogger("retrieval")
+        self.embedding_model = embedding_model
+        self.index = index
+        self.lexical_index = lexical_index if HYBRID_RETRIEVAL_ENABLED else None
+        self.reranker = reranker
+        self.chunk_store = chunk_store
+
+    def _query_namespace(self, vector: List[float], top_k: int, filter: Optional[Dict[str, Any]],
+                         namespace: str) -> List[Dict[str, Any]]:
+        matches = self.index.query(vector=vector, top_k=top_k, filter=filter, include_metadata=True,
+                                   include_values=DIVERSIFY_ENABLED, namespace=namespace)["matches"]
+        for match in matches:
+            match["namespace"] = namespace
+        return matches
+
+    def _dense_search(self, query_text: str, top_k: int, targets: List[SearchTarget]) -> List[Dict[str, Any]]:
+        windows = split_query_windows(query_text)
+        if len(windows) <= 1:
+            vectors = [self.embedding_model.embed_query(query_text)]
+        else:
+            # One batched forward pass for all windows
+            vectors = self.embedding_model.embed_documents(windows)
+
+        # Every (window, target) pair is an independent index query; run them in parallel
+        jobs = [(w, namespace, filter) for w in range(len(vectors)) for namespace, filter in targets]
+        if len(jobs) == 1:
+            results = [self._query_namespace(vectors[0], top_k, jobs[0][2], jobs[0][1])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(len(jobs), MAX_QUERY_CONCURRENCY)) as pool:
+                results = list(pool.map(lambda job: self._query_namespace(vectors[job[0]], top_k, job[2], job[1]), jobs))
+        per_window: List[List[Dict[str, Any]]] = [[] for _ in vectors]
+        for (w, _, _), matches in zip(jobs, results):
+            per_window[w].extend(matches)
+        per_window = [_merge_namespace_matches(matches, top_k) for matches in per_window]
+        if len(per_window) == 1:
+            return per_window[0]
+        self.logger.debug("Dense retrieval over %d query windows x %d search targets", len(windows), len(targets))
+        return aggregate_window_matches(per_window)[:top_k]
+
+    def _lexical_search(self, query_text: str, top_k: int, targets: List[SearchTarget]) -> List[Dict[str, Any]]:
+        # BM25 scores come from one FTS table, so per-target results merge by score
+        matches: List[Dict[str, Any]] = []
+        for namespace, filter in targets:
+            matches.extend(self.lexical_index.search(query_text, top_k=top_k, filter=filter, namespaces=[namespace]))
+        return _merge_namespace_matches(matches, top_k)
+
+    async def _timed(self, name: str, func, timings: Dict[str, float], *args) -> List[Dict[str, Any]]:
+        start = time.perf_counter()
+        try:
+            return await asyncio.to_thread(func, *args)
+        except Exception as e:
+            self.logger.warning("%s retrieval failed: %s", name, e)
+            return []
+        finally:
+            timings[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    async def retrieve(self, query_text: str, top_k: int = 5, knowledge_base: Optional[str] = None,
+                       user_id: Optional[str] = None) -> Tuple[List[Any], Dict[str, Any]]:
+        """
+        Retrieve the top_k chunks for query_text from the namespaces visible to user_id
+
+        Returns:
+            (LangChain Documents, stats dict with mode, namespaces, per-stage timings_ms and rerank scores)
+        """
+        from langchain.schema import Document
+
+        start = time.perf_counter()
+        timings: Dict[str, float] = {}
+        targets = search_targets(knowledge_base, user_id)
+        namespaces = _target_namespaces(targets)
+        candidates = max(top_k, RETRIEVAL_CANDIDATES)
+        if self.reranker is not None:
+            candidates = max(candidates, RERANK_CANDIDATES)
+
+        tasks = [self._timed("dense", self._dense_search, timings, query_text, candidates, targets)]
+        if self.lexical_index is not None:
+            tasks.append(self._timed("lexical", self._lexical_search, timings, query_text, candidates, targets))
+        results = await asyncio.gather(*tasks)
+        dense_matches = results[0]
+        lexical_matches = results[1] if len(results) > 1 else []
+
+        # Chunk text and metadata by id. Text is hydrated from the local chunk store in one batched read;
+        # vectors indexed before the store existed still carry it in metadata, lexical rows carry their own
+        chunks: Dict[str, Dict[str, Any]] = {}
+        for match in lexical_matches:
+            chunks[match["id"]] = {"text": match["text"], "metadata": match["metadata"], "namespace": match["namespace"]}
+        for match in dense_matches:
+            metadata = match.get("metadata") or {}
+            chunks[match["id"]] = {
+                "text": metadata.get("text") or chunks.get(match["id"], {}).get("text", ""),
+                "metadata": metadata,
+                "values": match.get("values"),
+                "namespace": match["namespace"],
+            }
+        if self.chunk_store is not None and chunks:
+            hydrate_start = time.perf_counter()
+            try:
+                stored = await asyncio.to_thread(self.chunk_store.get_many, list(chunks))
+                for doc_id, text in stored.items():
+                    chunks[doc_id]["text"] = text
+            except Exception as e:
+                self.logger.warning("Chunk store read failed; using indexed text: %s", e)
+            timings["hydrate"] = round((time.perf_counter() - hydrate_start) * 1000, 1)
+
+        rankings = [[m["id"] for m in dense_matches]]
+        if lexical_matches:
+            rankings.append([m["id"] for m in lexical_matches])
+        fused_ids = [doc_id for doc_id, _ in reciprocal_rank_fusion(rankings)]
+
+        # Optional cross-encoder pass over the fused candidates; falls back to fused order on budget overrun
+        reranked = False
+        rerank_scores: List[float] = []
+        if self.reranker is not None and len(fused_ids) > 1:
+            rerank_ids = fused_ids[:RERANK_CANDIDATES]
+            rerank_start = time.perf_counter()
+            result = await asyncio.to_thread(self.reranker.rerank, query_text, [chunks[i]["text"] for i in rerank_ids])
+            timings["rerank"] = round((time.perf_counter() - rerank_start) * 1000, 1)
+            if result is not None:
+                order, scores = result
+                fused_ids = [rerank_ids[i] for i in order]
+                rerank_scores = [round(s, 4) for s in scores[:top_k]]
+                reranked = True
+        if DIVERSIFY_ENABLED:
+            diversify_start = time.perf_counter()
+            pool = [{"id": i, **chunks[i]} for i in fused_ids[:max(top_k * DIVERSITY_POOL_FACTOR, top_k)]]
+            missing: Dict[str, List[str]] = {}
+            for cand in pool:
+                if not cand.get("values"):
+                    missing.setdefault(cand["namespace"], []).append(cand["id"])
+            for namespace, ids in missing.items():
+                try:
+                    fetched = await asyncio.to_thread(self.index.fetch, ids, namespace)
+                    for cand in pool:
+                        if cand["namespace"] == namespace and cand["id"] in fetched:
+                            cand["values"] = fetched[cand["id"]]["values"]
+                except Exception as e:
+                    self.logger.warning("Could not fetch embeddings for diversification: %s", e)
+            selected = diversify(pool, top_k)
+            timings["diversify"] = round((time.perf_counter() - diversify_start) * 1000, 1)
+        else:
+            selected = [{"id": i, **chunks[i]} for i in fused_ids[:top_k]]
+
+        docs = [Document(page_content=c["text"], metadata=c["metadata"]) for c in selected]
+        timings["total"] = round((time.perf_counter() - start) * 1000, 1)
+        stats = {
+            "mode": "hybrid" if self.lexical_index is not None else "dense",
+            "namespaces": namespaces,
+            "query_windows": len(split_query_windows(query_text)),
+            "timings_ms": timings,
+            "dense_count": len(dense_matches),
+            "lexical_count": len(lexical_matches),
+            "reranked": reranked,
+            "rerank_scores": rerank_scores,
+        }
+        self.logger.info("Retrieved %d chunks mode=%s timings_ms=%s", len(docs), stats["mode"], timings)
+        return docs, stats
@@ -5,13 +5,20 @@ Handles authentication, file discovery, delta queries, and content extraction
 
 import os
 import time
+import asyncio
 import requests
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 from msal import ConfidentialClientApplication
+from graph_rate_limiter import get_rate_controller, parse_retry_after, GRAPH_MAX_RETRIES, RETRY_STATUSES
+from dotenv import load_dotenv
 import base64
 
+load_dotenv()
+
 # Optional built-in defaults (env vars still take precedence)
 # These are used only if corresponding environment variables are missing
 DEFAULT_SHAREPOINT_SITE_ID = "aionos.sharepoint.com,e5bdab60-b975-4a67-b7e0a02437f27dd6,a21796fe-5c45-4cf3-b793-2113eeef9840"
@@ -19,6 +26,12 @@ DEFAULT_SHAREPOINT_DRIVE_ID = "b!YKu95XW5Z0q34KAkN_J91v6WF6JFXPNMt5MhE-7vmECCXBx
 DEFAULT_SHAREPOINT_FOLDER_ID = "01Y4E4XAAP7KOEGKTTL5GLSZF2FIPMW4SF"  # Agritech
 DEFAULT_SHAREPOINT_FOLDER_PATH = "/Bid/SXRepository/Agritech"
 
+# Timeouts for metadata calls (listing, delta, lookups) and file downloads
+GRAPH_TIMEOUT_SECONDS = float(os.getenv("GRAPH_TIMEOUT_SECONDS", "30"))
+GRAPH_DOWNLOAD_TIMEOUT_SECONDS = float(os.getenv("GRAPH_DOWNLOAD_TIMEOUT_SECONDS", "300"))
+# Drive-item fields the pipeline uses (file_info keys plus folder/deleted markers)
+DRIVE_ITEM_SELECT = "id,name,webUrl,lastModifiedDateTime,size,file,folder,deleted"
+
 class SharePointClient:
     """Client for interacting with SharePoint via Microsoft Graph API"""
     
@@ -51,6 +64,10 @@ class SharePointClient:
         
         self.access_token: Optional[str] = None
         self.token_expires_at: float = 0
+        # One refresh at a time; threads (and AsyncGraphClient) share the cached token
+        self._token_lock = threading.Lock()
+        # Keep-alive connection pool for the synchronous calls
+        self.session = requests.Session()
         
         # Initialize MSAL app
         self.app = ConfidentialClientApplication(
@@ -63,10 +80,25 @@ class SharePointClient:
         """
         Get or refresh access token using Client Credentials Flow
         """
-        # Check if token is still valid (with 5 min buffer)
-        if self.access_token and time.time() < (self.token_expires_at - 300):
+        if self.token_is_fresh():
             return self.access_token
-        
+        with self._token_lock:
+            if self.token_is_fresh():
+                return self.access_token
+            return self._acquire_token()
+
+    def token_is_fresh(self) -> bool:
+        """True while the cached token is valid (with 5 min buffer)"""
+        return bool(self.access_token) and time.time() < (self.token_expires_at - 300)
+
+    def invalidate_token(self, token: str) -> None:
+        """Drop a token the API rejected, unless another caller already replaced it"""
+        with self._token_lock:
+            if self.access_token == token:
+                self.access_token = None
+                self.token_expires_at = 0
+
+    def _acquire_token(self) -> str:
         try:
             self.logger.debug("[graph] Acquiring Microsoft Graph access token via client credentials")
             # Request token
@@ -87,19 +119,58 @@ class SharePointClient:
             self.logger.exception("Error acquiring SharePoint access token: %s", e)
             raise
     
+    def _get(self, url: str, timeout: float, **kwargs) -> requests.Response:
+        """
+        Authenticated GET through the shared rate controller: throttled (429/503/509), transient 5xx
+        and connection failures are retried with Retry-After or jittered backoff
+        """
+        rate = get_rate_controller()
+        refreshed = False
+        attempt = 0
+        while True:
+            token = self.get_access_token()
+            headers = {"Authorization": f"Bearer {token}", "Accept": "application/json"}
+            sent_at = rate.acquire()
+            try:
+                response = self.session.get(url, headers=headers, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                rate.release(sent_at, None)
+                if attempt >= GRAPH_MAX_RETRIES:
+                    rate.record_failure()
+                    raise
+                delay = rate.retry_delay(attempt)
+                attempt += 1
+                self.logger.warning("[graph] GET %s failed (%s); retry %d in %.1fs", url, e, attempt, delay)
+                time.sleep(delay)
+                continue
+            except BaseException:
+                # Any other failure (invalid request, interrupt): the slot must go back to the shared controller
+                rate.release(sent_at, None)
+                raise
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            rate.release(sent_at, response.status_code, retry_after)
+            if response.status_code == 401 and not refreshed:
+                refreshed = True
+                self.invalidate_token(token)
+                continue
+            if response.status_code in RETRY_STATUSES:
+                if attempt < GRAPH_MAX_RETRIES:
+                    response.close()
+                    delay = rate.retry_delay(attempt, retry_after)
+                    attempt += 1
+                    self.logger.warning("[graph] GET %s returned %d; retry %d in %.1fs", url, response.status_code, attempt, delay)
+                    time.sleep(delay)
+                    continue
+                rate.record_failure()
+            return response
+
     def _make_request(self, endpoint: str, params: Optional[Dict] = None) -> Dict[str, Any]:
         """
         Make authenticated request to Microsoft Graph API
         """
-        token = self.get_access_token()
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Accept": "application/json"
-        }
-        
         url = f"{self.graph_endpoint}{endpoint}"
         self.logger.debug("[graph] GET %s params=%s", endpoint, params)
-        response = requests.get(url, headers=headers, params=params)
+        response = self._get(url, GRAPH_TIMEOUT_SECONDS, params=params)
         response.raise_for_status()
         
         return response.json()
@@ -149,6 +220,39 @@ class SharePointClient:
         if not self.drive_id:
             raise ValueError("SHAREPOINT_DRIVE_ID must be set or resolvable from site")
     
+    def listing_endpoint(self, folder_id: Optional[str] = None) -> str:
+        """
+        /children endpoint of the folder to list: folder_id, else SHAREPOINT_FOLDER_ID,
+        else SHAREPOINT_FOLDER_PATH (drive root when neither is set)
+        """
+        target_folder_id = folder_id or self.folder_id
+        if target_folder_id:
+            return f"/sites/{self.site_id}/drives/{self.drive_id}/items/{target_folder_id}/children"
+        folder_path = self.folder_path or ""
+        if folder_path and not folder_path.startswith('/'):
+            folder_path = '/' + folder_path
+        if folder_path.rstrip('/'):
+            return f"/sites/{self.site_id}/drives/{self.drive_id}/root:{folder_path.rstrip('/')}:/children"
+        return f"/sites/{self.site_id}/drives/{self.drive_id}/root/children"
+
+    def _walk_files(self, children_endpoint: str, recursive: bool) -> List[Dict[str, Any]]:
+        """All files under a folder via the concurrent breadth-first walk (graph_client.AsyncGraphClient.iter_files)"""
+        from graph_client import AsyncGraphClient
+
+        async def _collect() -> List[Dict[str, Any]]:
+            async with AsyncGraphClient(self) as graph:
+                files = [file_info async for file_info in graph.iter_files(children_endpoint, recursive=recursive)]
+                self.logger.info("Listed %d folders (%d failed)", graph.stats['folders_listed'], graph.stats['folder_errors'])
+                return files
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(_collect())
+        # Called from a thread that runs an event loop (e.g. an async route): walk on a helper thread
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="graph-walk") as executor:
+            return executor.submit(asyncio.run, _collect()).result()
+
     def list_files_in_folder(self, folder_id: Optional[str] = None, 
                             recursive: bool = True) -> List[Dict[str, Any]]:
         """
@@ -156,188 +260,26 @@ class SharePointClient:
         """
         # Resolve site/drive if needed
         self._ensure_site_drive()
-
-        # If folder_path is configured, prefer path-based listing (more reliable)
-        if self.folder_path and not folder_id and not self.folder_id:
-            self.logger.info("Listing files by path (preferred): %s (recursive=%s)", self.folder_path, recursive)
-            return self._list_files_by_path(self.folder_path, recursive)
-
-        # Otherwise, resolve target folder id (env-provided or resolved from path)
-        resolved_folder_id: Optional[str] = None
-        if self.folder_path and not folder_id and not self.folder_id:
-            try:
-                self.logger.info("Resolving folder id from path: %s", self.folder_path)
-                item = self._make_request(f"/sites/{self.site_id}/drives/{self.drive_id}/root:{self.folder_path}:")
-                resolved_folder_id = item.get('id')
-            except Exception as e:
-                self.logger.exception("Failed to resolve folder path to id: %s", e)
-        target_folder_id = folder_id or resolved_folder_id or self.folder_id
-        self.logger.info("Listing files by folder_id=%s (recursive=%s)", target_folder_id, recursive)
-        
-        all_files = []
-        files_queue = [target_folder_id] if not recursive else []
-        
+        endpoint = self.listing_endpoint(folder_id)
+        self.logger.info("Listing files under %s (recursive=%s)", endpoint, recursive)
         try:
-            if recursive:
-                # Get all items recursively
-                endpoint = f"/sites/{self.site_id}/drives/{self.drive_id}/items/{target_folder_id}/children"
-                
-                while True:
-                    response_data = self._make_request(endpoint)
-                    items = response_data.get("value", [])
-                    
-                    for item in items:
-                        item_type = item.get("folder")
-                        item_id = item.get("id")
-                        item_name = item.get("name", "")
-                        
-                        # If it's a folder and we're being recursive, add to queue
-                        if recursive and item_type:
-                            files_queue.append(item_id)
-                        
-                        # If it's a file, add to results
-                        elif not item_type:
-                            file_info = {
-                                "id": item_id,
-                                "name": item_name,
-                                "webUrl": item.get("webUrl", ""),
-                                "lastModifiedDateTime": item.get("lastModifiedDateTime", ""),
-                                "size": item.get("size", 0),
-                                "mimeType": item.get("file", {}).get("mimeType", ""),
-                                "downloadUrl": None
-                            }
-                            all_files.append(file_info)
-                    
-                    # Check if there's a next page
-                    next_link = response_data.get("@odata.nextLink")
-                    if not next_link:
-                        break
-                    
-                    # Parse next link (remove graph endpoint prefix)
-                    endpoint = next_link.replace(self.graph_endpoint, "")
-                
-                # Process folders in queue recursively
-                processed_folders = set()
-                while files_queue:
-                    folder_id = files_queue.pop(0)
-                    if folder_id in processed_folders:
-                        continue
-                    processed_folders.add(folder_id)
-                    
-                    try:
-                        endpoint = f"/sites/{self.site_id}/drives/{self.drive_id}/items/{folder_id}/children"
-                        
-                        while True:
-                            response_data = self._make_request(endpoint)
-                            items = response_data.get("value", [])
-                            
-                            for item in items:
-                                item_type = item.get("folder")
-                                item_id = item.get("id")
-                                item_name = item.get("name", "")
-                                
-                                if item_type:
-                                    files_queue.append(item_id)
-                                else:
-                                    file_info = {
-                                        "id": item_id,
-                                        "name": item_name,
-                                        "webUrl": item.get("webUrl", ""),
-                                        "lastModifiedDateTime": item.get("lastModifiedDateTime", ""),
-                                        "size": item.get("size", 0),
-                                        "mimeType": item.get("file", {}).get("mimeType", ""),
-                                        "downloadUrl": None
-                                    }
-                                    all_files.append(file_info)
-                            
-                            next_link = response_data.get("@odata.nextLink")
-                            if not next_link:
-                                break
-                            endpoint = next_link.replace(self.graph_endpoint, "")
-                    
-                    except Exception as e:
-                        print(f"Error processing folder {folder_id}: {e}")
-                        continue
-            
-            else:
-                # Non-recursive listing
-                if self.folder_path and not folder_id and not self.folder_id:
-                    # Use path-based children endpoint directly
-                    endpoint = f"/sites/{self.site_id}/drives/{self.drive_id}/root:{self.folder_path}:/children"
-                else:
-                    endpoint = f"/sites/{self.site_id}/drives/{self.drive_id}/items/{target_folder_id}/children"
-                response_data = self._make_request(endpoint)
-                items = response_data.get("value", [])
-                
-                for item in items:
-                    if not item.get("folder"):
-                        file_info = {
-                            "id": item.get("id"),
-                            "name": item.get("name", ""),
-                            "webUrl": item.get("webUrl", ""),
-                            "lastModifiedDateTime": item.get("lastModifiedDateTime", ""),
-                            "size": item.get("size", 0),
-                            "mimeType": item.get("file", {}).get("mimeType", ""),
-                            "downloadUrl": None
-                        }
-                        all_files.append(file_info)
-            
+            all_files = self._walk_files(endpoint, recursive)
             self.logger.info("Found %d files in SharePoint folder", len(all_files))
             return all_files
-        
         except Exception as e:
             self.logger.exception("Error listing SharePoint files: %s", e)
             return []
 
     def _list_files_by_path(self, folder_path: str, recursive: bool) -> List[Dict[str, Any]]:
         """List files under a drive root path: /drive/root:/path:/children"""
-        all_files: List[Dict[str, Any]] = []
+        # Normalize path: ensure it starts with /
+        if not folder_path.startswith('/'):
+            folder_path = '/' + folder_path
+        self._ensure_site_drive()
+        endpoint = f"/sites/{self.site_id}/drives/{self.drive_id}/root:{folder_path.rstrip('/')}:/children"
+        self.logger.debug("Listing path: %s (endpoint: %s)", folder_path, endpoint)
         try:
-            # Normalize path: ensure it starts with /
-            if not folder_path.startswith('/'):
-                folder_path = '/' + folder_path
-            
-            # Normalize spaces to URL-encoded where needed; Graph handles raw path in this endpoint
-            endpoint = f"/sites/{self.site_id}/drives/{self.drive_id}/root:{folder_path}:/children"
-            self.logger.debug("Listing path: %s (endpoint: %s)", folder_path, endpoint)
-            
-            while True:
-                response_data = self._make_request(endpoint)
-                items = response_data.get("value", [])
-                self.logger.debug("Found %d items in path %s", len(items), folder_path)
-                
-                for item in items:
-                    if item.get('folder'):
-                        if recursive:
-                            # Recurse into subfolder by constructing full path
-                            name = item.get('name', '')
-                            # Build full path: current path + folder name
-                            if folder_path.endswith('/'):
-                                next_path = f"{folder_path}{name}"
-                            else:
-                                next_path = f"{folder_path}/{name}"
-                            self.logger.debug("Recursing into folder: %s (path: %s)", name, next_path)
-                            all_files.extend(self._list_files_by_path(next_path, recursive))
-                        # If not recursive, skip folders (only return files)
-                    else:
-                        # It's a file, add it
-                        file_info = {
-                            "id": item.get('id'),
-                            "name": item.get('name', ''),
-                            "webUrl": item.get('webUrl', ''),
-                            "lastModifiedDateTime": item.get('lastModifiedDateTime', ''),
-                            "size": item.get('size', 0),
-                            "mimeType": item.get('file', {}).get('mimeType', ''),
-                            "downloadUrl": None
-                        }
-                        all_files.append(file_info)
-                        self.logger.debug("Added file: %s", file_info.get('name'))
-                
-                next_link = response_data.get("@odata.nextLink")
-                if not next_link:
-                    break
-                endpoint = next_link.replace(self.graph_endpoint, "")
-            
+            all_files = self._walk_files(endpoint, recursive)
             self.logger.info("Found %d files in SharePoint path %s", len(all_files), folder_path)
             return all_files
         except Exception as e:
@@ -375,8 +317,9 @@ class SharePointClient:
             changed_items = []
             next_delta_link = None
             
+            params = None if delta_link else {"$select": DRIVE_ITEM_SELECT}
             while True:
-                response_data = self._make_request(endpoint)
+                response_data = self._make_request(endpoint, params)
                 items = response_data.get("value", [])
                 
                 for item in items:
@@ -402,6 +345,8 @@ class SharePointClient:
                     next_delta_link = response_data.get("@odata.deltaLink")
                     break
                 endpoint = next_link.replace(self.graph_endpoint, "")
+                # nextLink already carries the query
+                params = None
             
             self.logger.info("Delta query returned %d changed items", len(changed_items))
             return changed_items, next_delta_link
@@ -428,20 +373,18 @@ class SharePointClient:
             self.logger.exception("Error getting download URL for file %s: %s", file_id, e)
             return None
     
+    def _content_url(self, file_id: str) -> str:
+        return f"{self.graph_endpoint}/sites/{self.site_id}/drives/{self.drive_id}/items/{file_id}/content"
+
     def download_file_content(self, file_id: str) -> Optional[bytes]:
         """
         Download file content as binary
         """
         try:
             self.logger.info("Downloading file content: file_id=%s", file_id)
-            download_url = self.get_file_download_url(file_id)
-            if not download_url:
-                return None
-            
-            token = self.get_access_token()
-            headers = {"Authorization": f"Bearer {token}"}
-            
-            response = requests.get(download_url, headers=headers, timeout=60)
+            # /content redirects to the file (one request instead of a download URL lookup plus the download);
+            # requests drops the bearer token when following the redirect to another host
+            response = self._get(self._content_url(file_id), GRAPH_DOWNLOAD_TIMEOUT_SECONDS)
             response.raise_for_status()
             
             return response.content
@@ -456,14 +399,7 @@ class SharePointClient:
         """
         try:
             self.logger.info("Streaming download for file: file_id=%s", file_id)
-            download_url = self.get_file_download_url(file_id)
-            if not download_url:
-                return None
-            
-            token = self.get_access_token()
-            headers = {"Authorization": f"Bearer {token}"}
-            
-            response = requests.get(download_url, headers=headers, stream=True, timeout=60)
+            response = self._get(self._content_url(file_id), GRAPH_DOWNLOAD_TIMEOUT_SECONDS, stream=True)
             response.raise_for_status()
             
             return response
@@ -475,11 +411,13 @@ class SharePointClient:
 
 # Singleton instance
 _sharepoint_client = None
+_sharepoint_client_lock = threading.Lock()
 
 def get_sharepoint_client() -> SharePointClient:
     """Get or create SharePoint client singleton"""
     global _sharepoint_client
-    if _sharepoint_client is None:
-        _sharepoint_client = SharePointClient()
-    return _sharepoint_client
+    with _sharepoint_client_lock:
+        if _sharepoint_client is None:
+            _sharepoint_client = SharePointClient()
+        return _sharepoint_client
 
@@ -1,51 +1,182 @@
 """
 SharePoint-to-Pinecone Ingestion Pipeline
 Handles continuous learning via delta queries and vector store updates
+
+Files move through bounded stages that run concurrently: downloads (async Graph client),
+parsing (parser process pool), embedding, and batched concurrent upserts. A full queue blocks
+the stage feeding it, so memory stays bounded however many files a sync covers.
 """
 
 import os
 import json
-import uuid
+import time
+import queue
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
+import threading
+from itertools import islice
+from contextlib import aclosing
+from typing import List, Dict, Any, AsyncIterator, Callable, Iterable, Iterator, Optional, Tuple, Union
 from datetime import datetime
 from dotenv import load_dotenv
 
 from sharepoint_client import get_sharepoint_client
-from file_parsers import extract_text_from_bytes
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
-from pinecone import Pinecone
+from graph_rate_limiter import get_rate_controller
+from graph_client import AsyncGraphClient, drive_item_info, GRAPH_BATCH_SIZE, GRAPH_DOWNLOAD_MODE
+from file_parsers import iter_blocks_from_bytes, PARSE_WORKERS
+from chunking import StreamingChunker
+from embeddings import get_embedding_model
+from vector_store import get_vector_index, AIONOS_NAMESPACE
+from lexical_index import get_lexical_index
+from chunk_store import get_chunk_store
+from ingestion import replace_file_vectors, purge_file_vectors, reconcile_vectors, UpsertWriter, index_chunk_stream, STREAM_PREFETCH_GROUPS
 
 load_dotenv()
 
+# Files with less extracted text than this are skipped
+MIN_TEXT_CHARS = 50
+
+# Sync pipeline: concurrent downloads, parser threads (each drives the parser process pool),
+# and files buffered between stages (downloaded -> parse, parsed -> embed)
+SYNC_DOWNLOAD_CONCURRENCY = int(os.getenv("SYNC_DOWNLOAD_CONCURRENCY", "8"))
+SYNC_PARSE_WORKERS = int(os.getenv("SYNC_PARSE_WORKERS", str(PARSE_WORKERS)))
+SYNC_QUEUE_FILES = int(os.getenv("SYNC_QUEUE_FILES", "8"))
+
+_END_OF_FILES = object()
+
+# Files to sync: a list, or a function opening a stream of files on the run's Graph client
+# (e.g. the folder walk, so downloads start while listing continues)
+FileSource = Union[Iterable[Dict[str, Any]], Callable[[AsyncGraphClient], AsyncIterator[Dict[str, Any]]]]
+
+
+async def _file_batches(files: Union[Iterable[Dict[str, Any]], AsyncIterator[Dict[str, Any]]], size: int) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Lists of up to size files from a sync or async iterable"""
+    if hasattr(files, "__aiter__"):
+        batch: List[Dict[str, Any]] = []
+        async for file_info in files:
+            batch.append(file_info)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+        return
+    iterator = iter(files)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class _StageStats:
+    """Throughput counters of one pipeline stage (updated from its worker threads)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.files = 0
+        self.bytes = 0
+        self.chunks = 0
+        self.busy_seconds = 0.0
+        self._first: Optional[float] = None
+        self._last: Optional[float] = None
+
+    def record(self, seconds: float, files: int = 1, nbytes: int = 0, chunks: int = 0) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            self.files += files
+            self.bytes += nbytes
+            self.chunks += chunks
+            self.busy_seconds += seconds
+            self._first = min(self._first, now - seconds) if self._first is not None else now - seconds
+            self._last = now
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters plus rates over the stage's active span (first start to last finish)"""
+        with self._lock:
+            span = max((self._last - self._first) if self._first is not None else 0.0, 1e-9)
+            return {
+                "files": self.files,
+                "mb": round(self.bytes / (1024 * 1024), 2),
+                "chunks": self.chunks,
+                "seconds": round(span if self._first is not None else 0.0, 2),
+                "busy_seconds": round(self.busy_seconds, 2),
+                "files_per_sec": round(self.files / span, 2),
+                "mb_per_sec": round(self.bytes / span / (1024 * 1024), 3),
+                "chunks_per_sec": round(self.chunks / span, 1),
+            }
+
+
+class _ChunkStream:
+    """
+    Chunk batches of one file, passed from its parse worker to the embed stage while it is parsed.
+    At most STREAM_PREFETCH_GROUPS batches wait in between; the end marker (or the parse error)
+    tells the embed stage the file is complete. Either side can close the stream to abandon the file.
+    """
+
+    def __init__(self, stop: threading.Event):
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, STREAM_PREFETCH_GROUPS))
+        self._stop = stop
+        self._closed = threading.Event()
+        self.wait_seconds = 0.0
+
+    def _put(self, entry: Any) -> bool:
+        start = time.perf_counter()
+        try:
+            while not (self._closed.is_set() or self._stop.is_set()):
+                try:
+                    self._queue.put(entry, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            self.wait_seconds += time.perf_counter() - start
+
+    def put(self, chunks: List[Dict[str, Any]]) -> bool:
+        """Queue a batch (blocks while the embed stage is behind); False once the stream is abandoned"""
+        return self._put(chunks)
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self._put((_END_OF_FILES, error))
+
+    def close(self) -> None:
+        self._closed.set()
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        try:
+            while True:
+                entry = self._queue.get()
+                if isinstance(entry, tuple) and entry[0] is _END_OF_FILES:
+                    if entry[1] is not None:
+                        raise entry[1]
+                    return
+                yield from entry
+        finally:
+            self.close()
+
+
 class SharePointIngestionPipeline:
-    """Pipeline for ingesting SharePoint documents into Pinecone vector store"""
+    """Pipeline for ingesting SharePoint documents into the AIonOS namespace of the vector store"""
     
     def __init__(self):
         self.logger = logging.getLogger("sharepoint.pipeline")
         # Initialize components
         self.sharepoint = get_sharepoint_client()
         
-        # Pinecone setup
-        self.pinecone_api_key = os.getenv("PINECONE_API_KEY")
-        self.pinecone_index_name = os.getenv("PINECONE_INDEX_NAME")
-        
-        if not self.pinecone_api_key or not self.pinecone_index_name:
-            raise ValueError("PINECONE_API_KEY and PINECONE_INDEX_NAME must be set")
+        # Vector index (Pinecone or local engine, per VECTOR_STORE_BACKEND)
+        self.index = get_vector_index()
+        self.pinecone_index_name = getattr(self.index, "index_name", None)
+        # BM25 index maintained alongside the vector index (hybrid retrieval)
+        self.lexical_index = get_lexical_index()
+        # Chunk text store (the vector index carries ids, embeddings and metadata only)
+        self.chunk_store = get_chunk_store()
+        # Guards stats updated from upsert writer threads
+        self._stats_lock = threading.Lock()
+        self.logger.info("Using %s vector index: %s", self.index.backend, self.pinecone_index_name or "local")
         
-        self.logger.info("Connecting to Pinecone index: %s", self.pinecone_index_name)
-        self.pc = Pinecone(api_key=self.pinecone_api_key)
-        self.index = self.pc.Index(self.pinecone_index_name)
-        
-        # Embedding model
-        self.embedding_model = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-        
-        # Text splitter
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=100
-        )
+        # Embedding model (process-wide singleton, shared with retrieval and uploads)
+        self.embedding_model = get_embedding_model()
         
         # Delta link storage (should be persisted to database in production)
         self.delta_link: Optional[str] = None
@@ -73,6 +204,278 @@ class SharePointIngestionPipeline:
         except Exception as e:
             self.logger.exception("Error saving delta link: %s", e)
     
+    def _index_chunks(self, file_info: Dict[str, Any], chunks: Iterable[Dict[str, Any]], tag: str, writer: UpsertWriter,
+                      stats: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Embed the chunks of one SharePoint file (streamed by its parse worker) batch by batch as they are produced,
+        queueing each batch on the upsert writer. Chunk ids are derived from (file id, chunk index,
+        content hash), so chunks that are already indexed are skipped without being embedded or
+        upserted. Once all of the file's vectors are written, vectors left over from a previous
+        version are deleted via the manifest (counted into stats['vectors_deleted']).
+        """
+        base_metadata = {
+            "source": "sharepoint",
+            "knowledge_base": "AIonOS",
+            "sharepoint_file_id": file_info['id'],
+            "filename": file_info['name'],
+            "web_url": file_info.get('webUrl', ''),
+            "last_modified": file_info.get('lastModifiedDateTime', ''),
+            "file_type": file_info.get('mimeType', ''),
+        }
+
+        def _file_written(doc_ids: List[str]) -> None:
+            deleted = replace_file_vectors(self.index, "sharepoint", file_info['id'], doc_ids, self.lexical_index, AIONOS_NAMESPACE)
+            with self._stats_lock:
+                stats['vectors_deleted'] += deleted
+
+        self.logger.debug("[%s] Embedding start: %s", tag, file_info.get('name'))
+        result = index_chunk_stream(chunks, writer, self.embedding_model, source="sharepoint", file_id=file_info['id'],
+                                    base_metadata=base_metadata, lexical_index=self.lexical_index,
+                                    on_file_complete=_file_written)
+        if result['vectors_queued']:
+            self.logger.info("[%s] Queued %d vectors for %s (chunks=%d skipped=%d)", tag, result['vectors_queued'],
+                             file_info.get('name'), result['chunks'], result['chunks_skipped'])
+        else:
+            self.logger.info("[%s] %s unchanged (%d chunks already indexed)", tag, file_info.get('name'), result['chunks_skipped'])
+        return result
+
+    def _finish_upserts(self, writer: UpsertWriter, stats: Dict[str, Any]) -> None:
+        """Flush the writer and fold its counters and throughput into stats"""
+        upsert_stats = writer.close()
+        stats['vectors_uploaded'] = upsert_stats['vectors_written']
+        stats['errors'] += upsert_stats['failed_batches']
+        stats['upsert'] = upsert_stats
+        self.logger.info("Upserted %d vectors in %d batches (%.1f vectors/s, %.3f MB/s, retries=%d, failed_batches=%d)",
+                         upsert_stats['vectors_written'], upsert_stats['batches'], upsert_stats['vectors_per_sec'],
+                         upsert_stats['mb_per_sec'], upsert_stats['retries'], upsert_stats['failed_batches'])
+    
+    def _bump(self, stats: Dict[str, Any], key: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            stats[key] += amount
+
+    async def _resolve_downloads(self, graph: AsyncGraphClient, batch: List[Dict[str, Any]], tag: str) -> Dict[str, Dict[str, Any]]:
+        """Fresh metadata and download URLs for a batch of files in one $batch call ({} in "content" mode or on failure)"""
+        if GRAPH_DOWNLOAD_MODE != "batch":
+            return {}
+        try:
+            return await graph.resolve_items([file_info['id'] for file_info in batch])
+        except Exception as e:
+            self.logger.warning("[%s] $batch lookup of %d files failed, downloading via /content: %s", tag, len(batch), e)
+            return {}
+
+    async def _download_files(self, files: FileSource, parse_queue: "queue.Queue", stop: threading.Event,
+                              stage: _StageStats, tag: str, stats: Dict[str, Any]) -> None:
+        """
+        Download up to SYNC_DOWNLOAD_CONCURRENCY files at once over one pooled Graph connection.
+        Download URLs are resolved GRAPH_BATCH_SIZE files per $batch request, so each file costs
+        one request of its own; files the batch could not resolve go through /items/{id}/content.
+        """
+        slots = asyncio.Semaphore(max(1, SYNC_DOWNLOAD_CONCURRENCY))
+        tasks = set()
+
+        async def _download(file_info: Dict[str, Any], item: Optional[Dict[str, Any]]) -> None:
+            try:
+                start = time.perf_counter()
+                download_url = None
+                if item:
+                    # The listing may be older than the batch lookup (e.g. delta entries)
+                    fresh = drive_item_info(item)
+                    file_info.update({key: fresh[key] for key in ('name', 'webUrl', 'lastModifiedDateTime', 'size', 'mimeType') if fresh[key]})
+                    download_url = fresh['downloadUrl']
+                self.logger.debug("[%s] Download start: id=%s (resolved=%s)", tag, file_info['id'], bool(download_url))
+                content = await graph.download_file_content(file_info['id'], download_url)
+                stage.record(time.perf_counter() - start, nbytes=len(content))
+                self.logger.debug("[%s] Downloaded bytes=%d for %s", tag, len(content), file_info.get('name'))
+                # Waits while the parse queue is full, which holds back further downloads
+                await asyncio.to_thread(parse_queue.put, (file_info, content))
+            except Exception as e:
+                self.logger.warning("[%s] Skipping file due to download failure: %s (%s)", tag, file_info.get('name'), e)
+                self._bump(stats, 'errors')
+            finally:
+                slots.release()
+
+        async with AsyncGraphClient(self.sharepoint) as graph:
+            source = files(graph) if callable(files) else files
+            async with aclosing(_file_batches(source, GRAPH_BATCH_SIZE)) as batches:
+                async for batch in batches:
+                    self._bump(stats, 'files_discovered', len(batch))
+                    resolved = await self._resolve_downloads(graph, batch, tag)
+                    for file_info in batch:
+                        await slots.acquire()
+                        if stop.is_set():
+                            slots.release()
+                            break
+                        self.logger.info("[%s] Processing file: name=%s id=%s size=%s url=%s", tag, file_info.get('name'),
+                                         file_info.get('id'), file_info.get('size'), file_info.get('webUrl'))
+                        task = asyncio.create_task(_download(file_info, resolved.get(file_info['id'])))
+                        tasks.add(task)
+                        task.add_done_callback(tasks.discard)
+                    if stop.is_set():
+                        break
+            if tasks:
+                await asyncio.gather(*tasks)
+            stats['graph'] = dict(graph.stats)
+            self._bump(stats, 'errors', graph.stats['folder_errors'])
+
+    def _download_stage(self, files: FileSource, parse_queue: "queue.Queue", stop: threading.Event,
+                        stage: _StageStats, tag: str, stats: Dict[str, Any]) -> None:
+        try:
+            asyncio.run(self._download_files(files, parse_queue, stop, stage, tag, stats))
+        except Exception as e:
+            self.logger.exception("[%s] Download stage failed: %s", tag, e)
+            self._bump(stats, 'errors')
+        finally:
+            for _ in range(SYNC_PARSE_WORKERS):
+                parse_queue.put(_END_OF_FILES)
+
+    def _stream_chunks(self, file_info: Dict[str, Any], content: bytes, embed_queue: "queue.Queue",
+                       stop: threading.Event, tag: str, stats: Dict[str, Any],
+                       on_insufficient_text: Optional[Callable[[Dict[str, Any]], None]]) -> Tuple[int, float]:
+        """
+        Parse one file and stream its chunks to the embed stage as the chunker completes them.
+        Block groups are only held until MIN_TEXT_CHARS of text is seen (files with less are skipped);
+        after that nothing larger than one group and its chunks is kept here. Returns (chunks, seconds
+        spent waiting on the embed stage).
+        """
+        chunker = StreamingChunker()
+        stream: Optional[_ChunkStream] = None
+        pending: List[List[Dict[str, Any]]] = []
+        text_chars = 0
+        chunks = 0
+        # Structural blocks (pages, slides, sheet rows, sections), then chunks by structure and token budget
+        groups = iter_blocks_from_bytes(content, file_info['name'], offload=True)
+        try:
+            for group in groups:
+                if stream is None:
+                    pending.append(group)
+                    text_chars += sum(len(block['text'].strip()) for block in group)
+                    if text_chars < MIN_TEXT_CHARS:
+                        continue
+                    stream = _ChunkStream(stop)
+                    # Waits while the embed queue is full, which holds back parsing
+                    embed_queue.put((file_info, stream))
+                    batches, pending = pending, []
+                else:
+                    batches = [group]
+                for blocks in batches:
+                    batch = list(chunker.feed(blocks))
+                    chunks += len(batch)
+                    if batch and not stream.put(batch):
+                        return chunks, stream.wait_seconds
+            if stream is None:
+                self.logger.warning("[%s] Skipping %s: insufficient text extracted (chars=%d)", tag, file_info.get('name'), text_chars)
+                if on_insufficient_text is not None:
+                    on_insufficient_text(file_info)
+                return 0, 0.0
+            batch = list(chunker.finish())
+            chunks += len(batch)
+            if not batch or stream.put(batch):
+                stream.finish()
+            return chunks, stream.wait_seconds
+        except Exception as e:
+            if stream is None:
+                self.logger.exception("[%s] Error parsing %s: %s", tag, file_info.get('name', 'unknown'), e)
+                self._bump(stats, 'errors')
+                return chunks, 0.0
+            # Reported (and counted) by the embed stage, which fails the file
+            stream.finish(e)
+            return chunks, stream.wait_seconds
+        finally:
+            groups.close()
+
+    def _parse_stage(self, parse_queue: "queue.Queue", embed_queue: "queue.Queue", stop: threading.Event,
+                     stage: _StageStats, tag: str, stats: Dict[str, Any],
+                     on_insufficient_text: Optional[Callable[[Dict[str, Any]], None]]) -> None:
+        """Parse (on the parser pool) and chunk downloaded files; ends by forwarding one end marker"""
+        try:
+            while True:
+                item = parse_queue.get()
+                if item is _END_OF_FILES:
+                    return
+                if stop.is_set():
+                    continue
+                file_info, content = item
+                start = time.perf_counter()
+                chunks, waited = self._stream_chunks(file_info, content, embed_queue, stop, tag, stats, on_insufficient_text)
+                stage.record(time.perf_counter() - start - waited, nbytes=len(content), chunks=chunks)
+                del content
+        finally:
+            embed_queue.put(_END_OF_FILES)
+
+    def _run_pipeline(self, files: FileSource, tag: str, writer: UpsertWriter, stats: Dict[str, Any],
+                      on_insufficient_text: Optional[Callable[[Dict[str, Any]], None]] = None) -> int:
+        """
+        Ingest files through the download -> parse -> embed -> upsert stages, all running at once.
+        Bounded queues between stages apply backpressure; embedding runs on the calling thread.
+        Per-stage throughput goes into stats['stages']. Returns the number of files indexed.
+        """
+        self.sharepoint._ensure_site_drive()
+        parse_queue: "queue.Queue" = queue.Queue(maxsize=max(1, SYNC_QUEUE_FILES))
+        embed_queue: "queue.Queue" = queue.Queue(maxsize=max(1, SYNC_QUEUE_FILES))
+        stop = threading.Event()
+        stages = {"download": _StageStats(), "parse": _StageStats(), "embed": _StageStats()}
+
+        threads = [threading.Thread(target=self._download_stage, name="sync-download", daemon=True,
+                                    args=(files, parse_queue, stop, stages["download"], tag, stats))]
+        threads += [threading.Thread(target=self._parse_stage, name=f"sync-parse-{n}", daemon=True,
+                                     args=(parse_queue, embed_queue, stop, stages["parse"], tag, stats, on_insufficient_text))
+                    for n in range(SYNC_PARSE_WORKERS)]
+        for thread in threads:
+            thread.start()
+
+        indexed = 0
+        ended = 0
+        try:
+            while ended < SYNC_PARSE_WORKERS:
+                item = embed_queue.get()
+                if item is _END_OF_FILES:
+                    ended += 1
+                    continue
+                file_info, chunks = item
+                start = time.perf_counter()
+                try:
+                    # Embed and upload only chunks not already in the index (deterministic ids),
+                    # batch by batch while the file is still being parsed
+                    result = self._index_chunks(file_info, chunks, tag, writer, stats)
+                except Exception as e:
+                    self.logger.exception("[%s] Error processing %s: %s", tag, file_info.get('name', 'unknown'), e)
+                    self._bump(stats, 'errors')
+                    continue
+                finally:
+                    chunks.close()
+                stages["embed"].record(time.perf_counter() - start, chunks=result['chunks_embedded'])
+                self.logger.info("[%s] Generated %d chunks for %s", tag, result['chunks'], file_info.get('name'))
+                with self._stats_lock:
+                    stats['chunks_created'] += result['chunks']
+                    stats['chunks_skipped'] += result['chunks_skipped']
+                    stats['files_processed'] += 1
+                indexed += 1
+        finally:
+            if ended < SYNC_PARSE_WORKERS:
+                # Abandoned mid-run: stop the stages and drain until every parser has finished
+                stop.set()
+                while ended < SYNC_PARSE_WORKERS:
+                    item = embed_queue.get()
+                    if item is _END_OF_FILES:
+                        ended += 1
+                    else:
+                        item[1].close()
+            for thread in threads:
+                thread.join()
+            stats['stages'] = {name: stage.snapshot() for name, stage in stages.items()}
+            for name, snapshot in stats['stages'].items():
+                self.logger.info("[%s] Stage %s: files=%d %.1f MB chunks=%d in %.1fs (%.2f files/s, %.2f MB/s, %.1f chunks/s)",
+                                 tag, name, snapshot['files'], snapshot['mb'], snapshot['chunks'], snapshot['seconds'],
+                                 snapshot['files_per_sec'], snapshot['mb_per_sec'], snapshot['chunks_per_sec'])
+        return indexed
+    
+    def _record_throttling(self, stats: Dict[str, Any], rate_start: Dict[str, Any], tag: str) -> None:
+        """Graph requests, throttled responses and retries of this run (shared rate controller counters)"""
+        stats['throttling'] = get_rate_controller().run_stats(rate_start)
+        self.logger.info("[%s] Graph requests=%d throttled=%d retries=%d failed=%d retry_after=%.1fs concurrency_limit=%d", tag,
+                         stats['throttling']['requests'], stats['throttling']['throttled'], stats['throttling']['retries'],
+                         stats['throttling']['failed'], stats['throttling']['retry_after_seconds'], stats['throttling']['limit'])
+
     def initial_sync(self) -> Dict[str, Any]:
         """
         Perform initial full sync of SharePoint folder to Pinecone
@@ -82,79 +485,32 @@ class SharePointIngestionPipeline:
         """
         self.logger.info("Starting initial SharePoint sync")
         stats = {
+            'files_discovered': 0,
             'files_processed': 0,
             'chunks_created': 0,
+            'chunks_skipped': 0,
             'vectors_uploaded': 0,
+            'vectors_deleted': 0,
             'errors': 0,
             'start_time': datetime.utcnow().isoformat()
         }
         
+        rate_start = get_rate_controller().counters()
+        # Vectors from all files share one batched, concurrent writer
+        writer = UpsertWriter(self.index, namespace=AIONOS_NAMESPACE)
         try:
-            # List all files in SharePoint folder
-            self.logger.info("[initial] Listing files from SharePoint (recursive)")
-            files = self.sharepoint.list_files_in_folder(recursive=True)
-            self.logger.info("[initial] Discovered %d files for ingestion", len(files))
+            # Walk the SharePoint folder tree; files stream into the download stage as they are found
+            self.sharepoint._ensure_site_drive()
+            root = self.sharepoint.listing_endpoint()
+            self.logger.info("[initial] Listing files from SharePoint (recursive): %s", root)
             
-            # Process each file
-            for file_info in files:
-                try:
-                    self.logger.info("[initial] Processing file: name=%s id=%s size=%s url=%s", file_info.get('name'), file_info.get('id'), file_info.get('size'), file_info.get('webUrl'))
-                    self.logger.debug("[initial] Download start: id=%s", file_info['id'])
-                    # Download file
-                    file_content = self.sharepoint.download_file_content(file_info['id'])
-                    if not file_content:
-                        stats['errors'] += 1
-                        self.logger.warning("[initial] Skipping file due to download failure: %s", file_info.get('name'))
-                        continue
-                    self.logger.debug("[initial] Downloaded bytes=%d for %s", len(file_content or b""), file_info.get('name'))
-                    
-                    # Extract text
-                    self.logger.debug("[initial] Extract text start: %s", file_info.get('name'))
-                    text = extract_text_from_bytes(file_content, file_info['name'])
-                    if not text or len(text.strip()) < 50:
-                        self.logger.warning("[initial] Skipping %s: insufficient text extracted (chars=%d)", file_info.get('name'), len(text or ""))
-                        continue
-                    self.logger.debug("[initial] Extracted text chars=%d for %s", len(text), file_info.get('name'))
-                    
-                    # Chunk text
-                    self.logger.debug("[initial] Chunking start: %s", file_info.get('name'))
-                    chunks = self.text_splitter.split_text(text)
-                    self.logger.info("[initial] Generated %d chunks for %s", len(chunks), file_info.get('name'))
-                    
-                    # Generate embeddings and upload
-                    self.logger.debug("[initial] Embedding+Upsert start: %s", file_info.get('name'))
-                    vectors = []
-                    for chunk in chunks:
-                        doc_id = str(uuid.uuid4())
-                        embedding = self.embedding_model.embed_documents([chunk])[0]
-                        
-                        metadata = {
-                            "source": "sharepoint",
-                            "knowledge_base": "AIonOS",
-                            "sharepoint_file_id": file_info['id'],
-                            "filename": file_info['name'],
-                            "web_url": file_info.get('webUrl', ''),
-                            "last_modified": file_info.get('lastModifiedDateTime', ''),
-                            "file_type": file_info.get('mimeType', ''),
-                            "text": chunk
-                        }
-                        
-                        vectors.append((doc_id, embedding, metadata))
-                    
-                    # Upload to Pinecone (batch upload)
-                    if vectors:
-                        self.logger.info("[initial] Upserting %d vectors for %s", len(vectors), file_info.get('name'))
-                        self.index.upsert(vectors=vectors)
-                        stats['chunks_created'] += len(chunks)
-                        stats['vectors_uploaded'] += len(vectors)
-                        self.logger.debug("[initial] Uploaded vectors for %s", file_info.get('name'))
-                    
-                    stats['files_processed'] += 1
-                
-                except Exception as e:
-                    self.logger.exception("[initial] Error processing %s: %s", file_info.get('name', 'unknown'), e)
-                    stats['errors'] += 1
-                    continue
+            # Download, parse, embed and upsert concurrently
+            self._run_pipeline(lambda graph: graph.iter_files(root, recursive=True), "initial", writer, stats)
+            self.logger.info("[initial] Discovered %d files for ingestion (folders listed=%d, listing errors=%d)",
+                             stats['files_discovered'], stats.get('graph', {}).get('folders_listed', 0),
+                             stats.get('graph', {}).get('folder_errors', 0))
+            
+            self._finish_upserts(writer, stats)
             
             # Get initial delta link for future incremental syncs
             try:
@@ -166,13 +522,16 @@ class SharePointIngestionPipeline:
             except Exception as e:
                 self.logger.warning("Could not get delta link: %s", e)
             
+            self._record_throttling(stats, rate_start, "initial")
             stats['end_time'] = datetime.utcnow().isoformat()
-            self.logger.info("[initial] Completed: files=%d chunks=%d vectors=%d errors=%d", stats['files_processed'], stats['chunks_created'], stats['vectors_uploaded'], stats['errors'])
+            self.logger.info("[initial] Completed: files=%d chunks=%d skipped=%d vectors=%d errors=%d", stats['files_processed'], stats['chunks_created'], stats['chunks_skipped'], stats['vectors_uploaded'], stats['errors'])
             
             return stats
         
         except Exception as e:
             self.logger.exception("[initial] Error in initial sync: %s", e)
+            writer.close()
+            self._record_throttling(stats, rate_start, "initial")
             stats['errors'] += 1
             stats['end_time'] = datetime.utcnow().isoformat()
             return stats
@@ -186,106 +545,82 @@ class SharePointIngestionPipeline:
         """
         self.logger.info("Starting incremental SharePoint sync")
         stats = {
+            'files_discovered': 0,
             'files_processed': 0,
             'files_updated': 0,
             'files_deleted': 0,
             'chunks_created': 0,
+            'chunks_skipped': 0,
             'vectors_uploaded': 0,
+            'vectors_deleted': 0,
             'errors': 0,
             'start_time': datetime.utcnow().isoformat()
         }
         
+        rate_start = get_rate_controller().counters()
+        writer = UpsertWriter(self.index, namespace=AIONOS_NAMESPACE)
         try:
             # Get changes since last delta query
             changed_items, next_delta_link = self.sharepoint.get_delta_changes(self.delta_link)
             self.logger.info("[incremental] Delta query returned %d changes", len(changed_items))
             
-            # Process each change
-            for item in changed_items:
+            # Delete the vectors of removed files using the file -> vector manifest
+            for item in (item for item in changed_items if item.get('deleted')):
                 try:
-                    if item.get('deleted'):
-                        # Handle deleted files (optional: delete vectors from Pinecone)
-                        # Note: Pinecone doesn't have an easy way to delete by metadata filter
-                        # You might want to maintain a mapping of file_id to vector_ids
-                        stats['files_deleted'] += 1
-                        self.logger.info("[incremental] Detected deletion: %s", item.get('name'))
-                        continue
-                    
-                    self.logger.info("[incremental] Processing change: name=%s id=%s url=%s", item.get('name'), item.get('id'), item.get('webUrl'))
-                    self.logger.debug("[incremental] Download start: id=%s", item.get('id'))
-                    # Download and process updated/new file
-                    file_content = self.sharepoint.download_file_content(item['id'])
-                    if not file_content:
-                        stats['errors'] += 1
-                        self.logger.warning("[incremental] Skipping due to download failure: %s", item.get('name'))
-                        continue
-                    self.logger.debug("[incremental] Downloaded bytes=%d for %s", len(file_content or b""), item.get('name'))
-                    
-                    # Extract text
-                    self.logger.debug("[incremental] Extract text start: %s", item.get('name'))
-                    text = extract_text_from_bytes(file_content, item['name'])
-                    if not text or len(text.strip()) < 50:
-                        self.logger.warning("[incremental] Skipping %s: insufficient text (chars=%d)", item.get('name'), len(text or ""))
-                        stats['files_processed'] += 1
-                        continue
-                    
-                    # Chunk text
-                    self.logger.debug("[incremental] Chunking start: %s", item.get('name'))
-                    chunks = self.text_splitter.split_text(text)
-                    
-                    # Generate embeddings and upload
-                    self.logger.debug("[incremental] Embedding+Upsert start: %s (chunks=%d)", item.get('name'), len(chunks))
-                    vectors = []
-                    for chunk in chunks:
-                        doc_id = str(uuid.uuid4())
-                        embedding = self.embedding_model.embed_documents([chunk])[0]
-                        
-                        metadata = {
-                            "source": "sharepoint",
-                            "knowledge_base": "AIonOS",
-                            "sharepoint_file_id": item['id'],
-                            "filename": item['name'],
-                            "web_url": item.get('webUrl', ''),
-                            "last_modified": item.get('lastModifiedDateTime', ''),
-                            "file_type": item.get('mimeType', ''),
-                            "text": chunk
-                        }
-                        
-                        vectors.append((doc_id, embedding, metadata))
-                    
-                    # Upload to Pinecone
-                    if vectors:
-                        self.logger.info("[incremental] Upserting %d vectors for %s", len(vectors), item.get('name'))
-                        self.index.upsert(vectors=vectors)
-                        stats['chunks_created'] += len(chunks)
-                        stats['vectors_uploaded'] += len(vectors)
-                        self.logger.debug("[incremental] Uploaded vectors for %s", item.get('name'))
-                    
-                    stats['files_processed'] += 1
-                    stats['files_updated'] += 1
-                
+                    deleted = purge_file_vectors(self.index, "sharepoint", item['id'], self.lexical_index)
+                    self._bump(stats, 'vectors_deleted', deleted)
+                    stats['files_deleted'] += 1
+                    self.logger.info("[incremental] Purged deleted file: %s", item.get('name') or item.get('id'))
                 except Exception as e:
-                    self.logger.exception("[incremental] Error processing change for %s: %s", item.get('name', 'unknown'), e)
-                    stats['errors'] += 1
-                    continue
+                    self.logger.exception("[incremental] Error purging %s: %s", item.get('name', 'unknown'), e)
+                    self._bump(stats, 'errors')
+
+            def _insufficient_text(item: Dict[str, Any]) -> None:
+                # Drop vectors of the previous version; the file no longer has usable text
+                deleted = purge_file_vectors(self.index, "sharepoint", item['id'], self.lexical_index)
+                self._bump(stats, 'vectors_deleted', deleted)
+                self._bump(stats, 'files_processed')
+
+            # Download, parse, embed and upsert new and updated files concurrently
+            changed_files = [item for item in changed_items if not item.get('deleted')]
+            stats['files_updated'] += self._run_pipeline(changed_files, "incremental", writer, stats,
+                                                         on_insufficient_text=_insufficient_text)
+            
+            self._finish_upserts(writer, stats)
             
-            # Save new delta link
-            if next_delta_link:
+            # Save new delta link (kept back when upserts failed so the changes are replayed next run)
+            if next_delta_link and not stats['upsert']['failed_batches']:
                 self.delta_link = next_delta_link
                 self._save_delta_link()
                 self.logger.info("Saved updated delta link")
             
+            self._record_throttling(stats, rate_start, "incremental")
             stats['end_time'] = datetime.utcnow().isoformat()
-            self.logger.info("[incremental] Completed: processed=%d updated=%d deleted=%d chunks=%d vectors=%d errors=%d", stats['files_processed'], stats['files_updated'], stats['files_deleted'], stats['chunks_created'], stats['vectors_uploaded'], stats['errors'])
+            self.logger.info("[incremental] Completed: processed=%d updated=%d deleted=%d chunks=%d vectors=%d vectors_deleted=%d errors=%d", stats['files_processed'], stats['files_updated'], stats['files_deleted'], stats['chunks_created'], stats['vectors_uploaded'], stats['vectors_deleted'], stats['errors'])
             
             return stats
         
         except Exception as e:
             self.logger.exception("Error in incremental sync: %s", e)
+            writer.close()
+            self._record_throttling(stats, rate_start, "incremental")
             stats['errors'] += 1
             stats['end_time'] = datetime.utcnow().isoformat()
             return stats
 
+    def reconcile(self, purge_legacy: bool = False) -> Dict[str, Any]:
+        """
+        Reconcile the vector index with the file -> vector manifest (orphan cleanup)
+        
+        Returns:
+            Dictionary with reconciliation statistics
+        """
+        self.logger.info("Starting vector reconciliation (purge_legacy=%s)", purge_legacy)
+        stats = {'start_time': datetime.utcnow().isoformat()}
+        stats.update(reconcile_vectors(self.index, self.lexical_index, purge_legacy=purge_legacy))
+        stats['end_time'] = datetime.utcnow().isoformat()
+        return stats
+
 
 def run_initial_sync():
     """Run initial SharePoint sync (one-time setup)"""
@@ -299,6 +634,12 @@ def run_incremental_sync():
     return pipeline.incremental_sync()
 
 
+def run_reconcile(purge_legacy: bool = False):
+    """Run vector/manifest reconciliation (scheduled job)"""
+    pipeline = SharePointIngestionPipeline()
+    return pipeline.reconcile(purge_legacy=purge_legacy)
+
+
 if __name__ == "__main__":
     # For testing
     import sys
@@ -306,6 +647,9 @@ if __name__ == "__main__":
     if len(sys.argv) > 1 and sys.argv[1] == "incremental":
         print("Running incremental sync...")
         result = run_incremental_sync()
+    elif len(sys.argv) > 1 and sys.argv[1] == "reconcile":
+        print("Running vector reconciliation...")
+        result = run_reconcile(purge_legacy="--purge-legacy" in sys.argv)
     else:
         print("Running initial sync...")
         result = run_initial_sync()
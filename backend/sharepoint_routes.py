@@ -8,7 +8,7 @@ from typing import Dict, Any
 from pydantic import BaseModel
 from datetime import datetime
 
-from sharepoint_pipeline import run_initial_sync, run_incremental_sync, SharePointIngestionPipeline
+from sharepoint_pipeline import run_initial_sync, run_incremental_sync, run_reconcile, SharePointIngestionPipeline
 from sharepoint_client import get_sharepoint_client
 
 router = APIRouter()
@@ -63,6 +63,26 @@ async def start_incremental_sync(background_tasks: BackgroundTasks):
         raise HTTPException(status_code=500, detail=f"Failed to start incremental sync: {str(e)}")
 
 
+@router.post("/api/sharepoint/reconcile", response_model=SyncResponse)
+async def start_reconcile(background_tasks: BackgroundTasks, purge_legacy: bool = False):
+    """
+    Reconcile the vector index with the file -> vector manifest
+    Deletes orphaned vectors; legacy (pre-manifest) vectors only when purge_legacy is set
+    """
+    try:
+        logger.info("API call: start vector reconciliation (background, purge_legacy=%s)", purge_legacy)
+        background_tasks.add_task(run_reconcile, purge_legacy)
+        
+        return SyncResponse(
+            status="started",
+            message="Vector reconciliation started in background.",
+            timestamp=datetime.utcnow().isoformat()
+        )
+    except Exception as e:
+        logger.exception("Failed to start reconciliation: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to start reconciliation: {str(e)}")
+
+
 @router.get("/api/sharepoint/test-connection")
 async def test_sharepoint_connection():
     """
@@ -164,6 +184,7 @@ async def get_sharepoint_status():
             "has_initial_sync": has_delta_link,
             "delta_link_configured": has_delta_link,
             "index_name": pipeline.pinecone_index_name,
+            "vector_store": pipeline.index.backend,
             "timestamp": datetime.utcnow().isoformat()
         }
     except Exception as e:
@@ -0,0 +1,166 @@
+"""
+Test Graph $batch download URL resolution, /content downloads and throttling retries against a local Graph stand-in
+No SharePoint tenant or running server needed: requests go to an httpx.MockTransport
+"""
+
+import sys
+import os
+import json
+import time
+import asyncio
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Short backoff so throttling retries finish quickly
+os.environ.setdefault("GRAPH_BACKOFF_BASE", "0.05")
+
+import httpx
+from graph_client import AsyncGraphClient, GRAPH_BATCH_SIZE
+
+GRAPH = "https://graph.microsoft.com/v1.0"
+DOWNLOAD_HOST = "files.sharepoint.test"
+TOKEN = "stand-in-token"
+MISSING_ID = "item-7"
+
+
+class StandInSharePoint:
+    """The SharePointClient attributes AsyncGraphClient uses, with a token that never expires"""
+    graph_endpoint = GRAPH
+    site_id = "site"
+    drive_id = "drive"
+    access_token = TOKEN
+
+    def token_is_fresh(self) -> bool:
+        return True
+
+    def get_access_token(self) -> str:
+        return TOKEN
+
+    def invalidate_token(self, token: str) -> None:
+        pass
+
+
+class StandInGraph:
+    """Answers $batch item lookups, /content redirects and pre-authenticated downloads; records every request"""
+
+    def __init__(self):
+        self.requests = []
+        # Next N requests answer 429, and next N $batch sub-requests answer 429
+        self.throttle_requests = 0
+        self.throttle_lookups = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        url = request.url
+        if self.throttle_requests:
+            self.throttle_requests -= 1
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        if url.host == DOWNLOAD_HOST:
+            return httpx.Response(200, content=f"bytes of {url.path.strip('/')}".encode())
+        if url.path == "/v1.0/$batch":
+            responses = []
+            for sub in json.loads(request.content)["requests"]:
+                item_id = sub["url"].split("/items/")[1].split("?")[0]
+                if item_id == MISSING_ID:
+                    responses.append({"id": sub["id"], "status": 404, "body": {"error": {"code": "itemNotFound"}}})
+                    continue
+                if self.throttle_lookups:
+                    self.throttle_lookups -= 1
+                    responses.append({"id": sub["id"], "status": 429, "headers": {"Retry-After": "0"}, "body": {}})
+                    continue
+                responses.append({"id": sub["id"], "status": 200, "body": {
+                    "id": item_id, "name": f"{item_id}.pdf", "size": 10,
+                    "@microsoft.graph.downloadUrl": f"https://{DOWNLOAD_HOST}/{item_id}",
+                }})
+            return httpx.Response(200, json={"responses": responses})
+        if url.path.endswith("/content"):
+            item_id = url.path.split("/items/")[1].split("/")[0]
+            return httpx.Response(302, headers={"Location": f"https://{DOWNLOAD_HOST}/{item_id}"})
+        return httpx.Response(404)
+
+
+async def run_tests() -> int:
+    failures = 0
+
+    def check(name: str, ok: bool, detail: str = "") -> None:
+        nonlocal failures
+        print(f"   [{'PASS' if ok else 'FAIL'}] {name}{(': ' + detail) if detail else ''}")
+        failures += 0 if ok else 1
+
+    stand_in = StandInGraph()
+    file_ids = [f"item-{n}" for n in range(45)]
+    async with AsyncGraphClient(StandInSharePoint(), transport=httpx.MockTransport(stand_in)) as graph:
+        print("\n[TEST 1] Resolve download URLs for 45 items via $batch...")
+        start = time.perf_counter()
+        resolved = await graph.resolve_items(file_ids)
+        batch_calls = [r for r in stand_in.requests if r.url.path == "/v1.0/$batch"]
+        expected_calls = -(-len(file_ids) // GRAPH_BATCH_SIZE)
+        check("one $batch call per 20 items", len(batch_calls) == expected_calls, f"{len(batch_calls)} calls")
+        check("failed sub-request left out", MISSING_ID not in resolved and len(resolved) == len(file_ids) - 1)
+        check("download URL resolved", resolved["item-3"].get("@microsoft.graph.downloadUrl") == f"https://{DOWNLOAD_HOST}/item-3")
+        print(f"   Resolved {len(resolved)} items in {time.perf_counter() - start:.3f}s")
+
+        print("\n[TEST 2] Download with a resolved URL...")
+        stand_in.requests.clear()
+        content = await graph.download_file_content("item-3", resolved["item-3"]["@microsoft.graph.downloadUrl"])
+        check("content", content == b"bytes of item-3")
+        check("single request", len(stand_in.requests) == 1, f"{len(stand_in.requests)} requests")
+        check("no bearer token sent to the download host", "authorization" not in stand_in.requests[0].headers)
+
+        print("\n[TEST 3] Download via /items/{id}/content redirect (unresolved item)...")
+        stand_in.requests.clear()
+        content = await graph.download_file_content(MISSING_ID)
+        check("content", content == f"bytes of {MISSING_ID}".encode())
+        check("no metadata lookup", not any("$select" in str(r.url) for r in stand_in.requests))
+        graph_call, download_call = stand_in.requests
+        check("token sent to Graph", graph_call.headers.get("authorization") == f"Bearer {TOKEN}")
+        check("token dropped on redirect", "authorization" not in download_call.headers)
+
+        print("\n[TEST 4] Streamed download...")
+        chunks = [chunk async for chunk in graph.download_file_stream("item-9", resolved["item-9"]["@microsoft.graph.downloadUrl"])]
+        check("content", b"".join(chunks) == b"bytes of item-9")
+
+        print("\n[TEST 5] Throttled requests are retried and counted...")
+        limit_before = graph.rate.counters()["limit"]
+        stand_in.throttle_requests = 2
+        content = await graph.download_file_content("item-11")
+        check("content after two 429s", content == b"bytes of item-11")
+        check("throttles counted", graph.stats["throttled"] == 2 and graph.stats["retries"] == 2, str(graph.stats))
+        check("concurrency limit reduced", graph.rate.counters()["limit"] < limit_before,
+              f"{limit_before} -> {graph.rate.counters()['limit']}")
+
+        print("\n[TEST 6] Throttled $batch sub-requests are retried...")
+        stand_in.throttle_lookups = 5
+        resolved = await graph.resolve_items([f"item-{n}" for n in range(20, 40)])
+        check("all items resolved", len(resolved) == 20, f"{len(resolved)} resolved")
+        check("sub-request throttles counted", graph.stats["throttled"] == 2 + 5, str(graph.stats))
+
+    print("\n[TEST 7] Cancelled requests give their slot back...")
+
+    async def never_answers(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(60)
+        return httpx.Response(200)
+
+    async with AsyncGraphClient(StandInSharePoint(), transport=httpx.MockTransport(never_answers)) as graph:
+        in_flight = graph.rate.counters()["in_flight"]
+        tasks = [asyncio.create_task(graph.download_file_content(f"item-{n}")) for n in range(4)]
+        await asyncio.sleep(0.1)
+        check("requests hold slots", graph.rate.counters()["in_flight"] > in_flight)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        check("slots released", graph.rate.counters()["in_flight"] == in_flight, str(graph.rate.counters()))
+    return failures
+
+
+def test_graph_batch():
+    assert asyncio.run(run_tests()) == 0
+
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("Graph $batch / download test (local stand-in)")
+    print("=" * 80)
+    failed = asyncio.run(run_tests())
+    print("\n" + ("[SUCCESS] All checks passed" if not failed else f"[ERROR] {failed} check(s) failed"))
+    sys.exit(1 if failed else 0)
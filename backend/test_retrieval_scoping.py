@@ -0,0 +1,104 @@
+"""
+Test that retrieval never returns another user's uploaded solutions
+Runs the Retriever over a local vector index and BM25 index in a temp directory; no Pinecone or running server needed
+"""
+
+import sys
+import os
+import asyncio
+import hashlib
+import tempfile
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from vector_store import LocalVectorIndex, AIONOS_NAMESPACE, DEFAULT_NAMESPACE, upload_namespace
+from lexical_index import LexicalIndex
+from retrieval import Retriever
+
+DIM = 64
+USER_A = "user-a@example.com"
+USER_B = "user-b@example.com"
+SECRET = "quantum ledger migration roadmap for the harbour authority"
+
+
+class HashingEmbeddings:
+    """Bag-of-words hashing embedder: texts sharing words get similar vectors"""
+
+    def embed_query(self, text: str) -> list:
+        vec = np.zeros(DIM, dtype=np.float32)
+        for word in text.lower().split():
+            vec[int(hashlib.md5(word.encode()).hexdigest(), 16) % DIM] += 1.0
+        norm = float(np.linalg.norm(vec))
+        return (vec / norm if norm else vec).tolist()
+
+    def embed_documents(self, texts: list) -> list:
+        return [self.embed_query(t) for t in texts]
+
+
+def _index(index: LocalVectorIndex, lexical: LexicalIndex, embeddings: HashingEmbeddings,
+           namespace: str, entries: list) -> None:
+    index.upsert([(doc_id, embeddings.embed_query(text), {**metadata, "text": text}) for doc_id, text, metadata in entries],
+                 namespace=namespace)
+    lexical.add(((doc_id, text, metadata) for doc_id, text, metadata in entries), namespace=namespace)
+
+
+async def run_tests() -> int:
+    failures = 0
+
+    def check(name: str, ok: bool, detail: str = "") -> None:
+        nonlocal failures
+        print(f"   [{'PASS' if ok else 'FAIL'}] {name}{(': ' + detail) if detail else ''}")
+        failures += 0 if ok else 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        embeddings = HashingEmbeddings()
+        index = LocalVectorIndex(os.path.join(tmp, "vectors"))
+        lexical = LexicalIndex(os.path.join(tmp, "lexical.db"))
+        _index(index, lexical, embeddings, upload_namespace(USER_A), [
+            ("upload-a-0", SECRET, {"filename": "proposal.pdf", "user_id": USER_A, "chunk_index": 0}),
+        ])
+        _index(index, lexical, embeddings, upload_namespace(USER_B), [
+            ("upload-b-0", "cloud contact centre rollout for retail banking", {"filename": "proposal.pdf", "user_id": USER_B, "chunk_index": 0}),
+        ])
+        _index(index, lexical, embeddings, AIONOS_NAMESPACE, [
+            ("kb-0", "harbour authority digital twin reference architecture", {"knowledge_base": "AIonOS", "chunk_index": 0}),
+        ])
+        # Pre-namespace vectors: one legacy upload per user, untagged by knowledge base
+        _index(index, lexical, embeddings, DEFAULT_NAMESPACE, [
+            ("legacy-a-0", SECRET + " legacy copy", {"filename": "old.pdf", "user_id": USER_A}),
+            ("legacy-b-0", "legacy retail banking notes", {"filename": "old.pdf", "user_id": USER_B}),
+        ])
+        retriever = Retriever(embeddings, index, lexical)
+
+        print("\n[TEST 1] User B queries user A's upload text...")
+        docs, stats = await retriever.retrieve(SECRET, top_k=5, user_id=USER_B)
+        owners = [d.metadata.get("user_id") for d in docs]
+        check("no chunk from user A", USER_A not in owners, f"owners={owners}")
+        check("user B's own uploads still visible", USER_B in owners)
+        check("knowledge base content still visible", any(d.metadata.get("knowledge_base") == "AIonOS" for d in docs))
+        print(f"   Namespaces searched: {stats['namespaces']}")
+
+        print("\n[TEST 2] User A queries the same text...")
+        docs, _ = await retriever.retrieve(SECRET, top_k=5, user_id=USER_A)
+        check("user A's upload returned", any(d.page_content.startswith(SECRET) for d in docs))
+        check("no chunk from user B", all(d.metadata.get("user_id") != USER_B for d in docs))
+
+        print("\n[TEST 3] AIonOS knowledge base only...")
+        docs, _ = await retriever.retrieve(SECRET, top_k=5, knowledge_base="AIonOS", user_id=USER_A)
+        check("only AIonOS chunks", bool(docs) and all(d.metadata.get("knowledge_base") == "AIonOS" for d in docs))
+    return failures
+
+
+def test_retrieval_scoping():
+    assert asyncio.run(run_tests()) == 0
+
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("Retrieval user scoping test (local index)")
+    print("=" * 80)
+    failed = asyncio.run(run_tests())
+    print("\n" + ("[SUCCESS] All checks passed" if not failed else f"[ERROR] {failed} check(s) failed"))
+    sys.exit(1 if failed else 0)
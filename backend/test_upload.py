@@ -5,3 +5,13 @@ with open(fpath,'rb') as f:
     r=requests.post(url, files={'file':('test-upload.txt',f,'text/plain')}, headers={'X-User-Id':'demo-user'})
 print(r.status_code)
 print(r.text)
+
+# Ingestion runs in the background; poll its progress
+import time
+solution_id=r.json().get('id')
+for _ in range(30):
+    s=requests.get(f'http://127.0.0.1:8000/api/uploaded-solutions/{solution_id}/status', headers={'X-User-Id':'demo-user'})
+    print(s.status_code, s.text)
+    if s.json().get('status') in ('completed','failed'):
+        break
+    time.sleep(1)
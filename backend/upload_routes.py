@@ -4,16 +4,21 @@ from sqlalchemy.orm import Session
 import os, tempfile, shutil
 from datetime import datetime
 from typing import List, Optional
-import io,docx, uuid
+import io,docx
+import logging, threading
+from concurrent.futures import ThreadPoolExecutor
+import aiofiles
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 #from langchain_community.embeddings.sentence_transformer import SentenceTransformerEmbeddings
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.document_loaders import PyPDFLoader, TextLoader
 import docx 
-from pinecone import Pinecone, ServerlessSpec
 
-from database import get_db, UploadedSolution as DBSolution
+from database import get_db, SessionLocal, UploadedSolution as DBSolution, IngestionJob
+from vector_store import get_vector_index, upload_namespace
+from lexical_index import get_lexical_index
+from file_parsers import FileParser
+from chunking import iter_chunks
+from embeddings import get_embedding_model
+from ingestion import purge_file_vectors, UpsertWriter, iter_prefetched, index_chunk_stream
 from dotenv import load_dotenv
 
 router = APIRouter()
@@ -22,43 +27,127 @@ UPLOADS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads'
 if not os.path.exists(UPLOADS_DIR):
 	os.makedirs(UPLOADS_DIR)
 
-# --- NEW PINECONE INITIALIZATION ---
+# --- VECTOR STORE INITIALIZATION ---
 load_dotenv()
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_ENVIRONMENT = os.getenv("PINECONE_ENVIRONMENT")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
-# Lazy initialization to avoid import-time model loading
-EMBEDDING_MODEL = None
-
-def get_embedding_model():
-    global EMBEDDING_MODEL
-    if EMBEDDING_MODEL is None:
-        EMBEDDING_MODEL = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    return EMBEDDING_MODEL
-
-pc = Pinecone(api_key=PINECONE_API_KEY)
-
-# Check if index exists, if not, create it
-if PINECONE_INDEX_NAME not in [index.name for index in pc.list_indexes()]:
-    pc.create_index(
-        name=PINECONE_INDEX_NAME,
-        dimension=384,
-        metric="cosine",
-		spec=ServerlessSpec(
-            cloud='aws',
-            region='us-east-1' # or your desired cloud and region
-        )
-    )
-
-INDEX = pc.Index(PINECONE_INDEX_NAME)
-
-# Text splitter for chunking documents
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-# --- END NEW PINECONE INITIALIZATION ---
+# The embedding model (embeddings.get_embedding_model) and the vector index (get_vector_index:
+# Pinecone, created if missing, or the local engine) are built on first use, not at import
+# --- END VECTOR STORE INITIALIZATION ---
+
+# Uploads are ingested off the event loop; a small pool bounds CPU spent on embedding
+UPLOAD_INGEST_WORKERS = int(os.getenv("UPLOAD_INGEST_WORKERS", "2"))
+# Chunks embedded per model call (progress is reported after each batch)
+UPLOAD_EMBED_BATCH_SIZE = int(os.getenv("UPLOAD_EMBED_BATCH_SIZE", "64"))
+_ingest_executor = ThreadPoolExecutor(max_workers=UPLOAD_INGEST_WORKERS, thread_name_prefix="upload-ingest")
+logger = logging.getLogger("upload.ingestion")
+
+
+def _update_job(job_id: int, **fields) -> None:
+	db = SessionLocal()
+	try:
+		db.query(IngestionJob).filter(IngestionJob.id == job_id).update(fields, synchronize_session=False)
+		db.commit()
+	finally:
+		db.close()
+
+
+def _iter_upload_chunks(dest_path: str, filename: str):
+	"""Stream an uploaded file's structural blocks (parsed ahead on a background thread) into token-sized chunks"""
+	with open(dest_path, 'rb') as f:
+		file_content = f.read()
+
+	# Unknown extensions are read as plain text, as before; parse errors (DocumentParseError) fail the job
+	return iter_chunks(iter_prefetched(FileParser.iter_blocks(file_content, filename, fallback_to_text=True)))
+
+
+def _ingest_upload(job_id: int, solution_id: int, dest_path: str, filename: str, user_id: str) -> None:
+	"""Worker: parse -> chunk -> embed -> upsert one uploaded file as a stream, recording progress on its job"""
+	_update_job(job_id, status="running", started_at=datetime.utcnow())
+	try:
+		chunks = _iter_upload_chunks(dest_path, filename)
+		namespace = upload_namespace(user_id)
+
+		def _progress(counts):
+			_update_job(job_id, chunks_total=counts["chunks"], chunks_skipped=counts["chunks_skipped"], chunks_embedded=counts["chunks_embedded"])
+
+		written = [0]
+		written_lock = threading.Lock()
+
+		def _batch_written(count):
+			with written_lock:
+				written[0] += count
+				_update_job(job_id, vectors_written=written[0])
+
+		# Deterministic ids: re-uploading the same file only embeds chunks that changed
+		with UpsertWriter(get_vector_index(), namespace=namespace) as writer:
+			result = index_chunk_stream(
+				chunks, writer, get_embedding_model(), source="upload", file_id=solution_id, id_key=f"{user_id}/{filename}",
+				base_metadata={"filename": filename, "user_id": user_id, "solution_id": solution_id}, lexical_index=get_lexical_index(),
+				batch_size=UPLOAD_EMBED_BATCH_SIZE, on_progress=_progress, on_batch_written=_batch_written
+			)
+		if not result["chunks"]:
+			raise ValueError("No content was extracted or chunks were created.")
+		upsert_stats = writer.stats()
+		if upsert_stats["failed_batches"]:
+			raise RuntimeError(f"{upsert_stats['vectors_failed']} vectors could not be written to the index")
+
+		_update_job(job_id, status="completed", finished_at=datetime.utcnow())
+		logger.info("Ingested upload %s (%s): chunks=%d embedded=%d vectors=%d (%.1f vectors/s)", solution_id, filename, result["chunks"], result["chunks_embedded"], upsert_stats["vectors_written"], upsert_stats["vectors_per_sec"])
+	except Exception as e:
+		logger.exception("Ingestion failed for upload %s (%s): %s", solution_id, filename, e)
+		try:
+			purge_file_vectors(get_vector_index(), "upload", solution_id, get_lexical_index())
+		finally:
+			_update_job(job_id, status="failed", error=str(e), finished_at=datetime.utcnow())
+
+
+def _job_status(job: IngestionJob) -> dict:
+	return {
+		"job_id": job.id,
+		"status": job.status,
+		"chunks_total": job.chunks_total,
+		"chunks_skipped": job.chunks_skipped,
+		"chunks_embedded": job.chunks_embedded,
+		"vectors_written": job.vectors_written,
+		"error": job.error,
+		"created_at": job.created_at.isoformat() if job.created_at else None,
+		"started_at": job.started_at.isoformat() if job.started_at else None,
+		"finished_at": job.finished_at.isoformat() if job.finished_at else None,
+	}
+
+
+@router.on_event("startup")
+def _fail_interrupted_jobs():
+	"""
+	Jobs still queued/running at startup were lost with the previous process: drop whatever they
+	had indexed (vectors, BM25 rows, chunk text, manifest rows) and mark them failed
+	"""
+	db = SessionLocal()
+	try:
+		jobs = db.query(IngestionJob).filter(IngestionJob.status.in_(["queued", "running"])).all()
+		for job in jobs:
+			try:
+				purge_file_vectors(get_vector_index(), "upload", job.solution_id, get_lexical_index())
+			except Exception as e:
+				logger.exception("Could not purge partial vectors of interrupted upload %s: %s", job.solution_id, e)
+			job.status = "failed"
+			job.error = "Interrupted by server restart; please re-upload"
+			job.finished_at = datetime.utcnow()
+		db.commit()
+		if jobs:
+			logger.info("Failed %d ingestion job(s) interrupted by a restart", len(jobs))
+	finally:
+		db.close()
+
 
 @router.post("/api/upload-solution")
 async def upload_solution(file: UploadFile = File(...), x_user_id: Optional[str] = Header(None), db: Session = Depends(get_db)):
-	"""Upload a solution file and save metadata associated with the user (X-User-Id header)."""
+	"""
+	Upload a solution file and save metadata associated with the user (X-User-Id header).
+	The file is persisted and indexed in the background; poll /api/uploaded-solutions/{id}/status for progress.
+	"""
 	user_id = x_user_id or "anonymous"
 
 	filename = file.filename
@@ -66,56 +155,15 @@ async def upload_solution(file: UploadFile = File(...), x_user_id: Optional[str]
 	dest_path = os.path.join(UPLOADS_DIR, safe_name)
 
 	try:
-		with open(dest_path, 'wb') as buffer:
+		async with aiofiles.open(dest_path, 'wb') as buffer:
 			while True:
 				chunk = await file.read(1024 * 1024)
 				if not chunk:
 					break
-				buffer.write(chunk)
+				await buffer.write(chunk)
 		await file.close()
 
-		# New RAG Processing
-		file_content = ""
-		file_extension = os.path.splitext(filename)[1].lower()
-
-		if file_extension == ".docx":
-			doc = docx.Document(dest_path)
-			for paragraph in doc.paragraphs:
-				file_content += paragraph.text + "\n"
-		elif file_extension == ".pdf":
-			loader = PyPDFLoader(dest_path)
-			docs = loader.load_and_split(text_splitter)
-			if not docs:
-				raise ValueError("Could not extract content from PDF.")
-		else:
-			with open(dest_path, 'r', encoding='utf-8', errors='ignore') as f:
-				file_content = f.read()
-
-		if file_content:
-			docs = text_splitter.create_documents([file_content])
-
-		if not docs:
-			raise ValueError("No content was extracted or chunks were created.")
-
-        # Create unique IDs and prepare for upsert
-		vectors = []
-		for doc in docs:
-			doc_id = str(uuid.uuid4())
-			embedding = get_embedding_model().embed_documents([doc.page_content])[0]
-			metadata = {"filename": filename, "user_id": user_id, "text": doc.page_content}
-			vectors.append((doc_id, embedding, metadata))
-
-		# if not vectors:
-		# 	print("No vectors to upsert.")
-		# for i,doc in vectors:
-		# 	print(f"Chunk {i+1}:")
-		# 	print(doc)
-
-        #Upsert chunks to Pinecone
-		if vectors:
-			INDEX.upsert(vectors)
-        # --- END NEW RAG PROCESSING ---
-
+		# The record id keys the file -> vector manifest, so it is created before indexing
 		record = DBSolution(
 			filename=filename,
 			upload_date=datetime.utcnow(),
@@ -126,13 +174,25 @@ async def upload_solution(file: UploadFile = File(...), x_user_id: Optional[str]
 		db.commit()
 		db.refresh(record)
 
-		return {"id": record.id, "filename": record.filename, "upload_date": record.upload_date.isoformat()}
-
+		job = IngestionJob(solution_id=record.id, user_id=user_id, status="queued")
+		db.add(job)
+		db.commit()
+		db.refresh(job)
 	except Exception as e:
 		if os.path.exists(dest_path):
 			os.remove(dest_path)
 		raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
+	_ingest_executor.submit(_ingest_upload, job.id, record.id, dest_path, filename, user_id)
+
+	return {
+		"id": record.id,
+		"filename": record.filename,
+		"upload_date": record.upload_date.isoformat(),
+		"job_id": job.id,
+		"status": job.status,
+	}
+
 @router.get("/api/uploaded-solutions")
 def list_uploaded_solutions(x_user_id: Optional[str] = Header(None), db: Session = Depends(get_db)) -> List[dict]:
 	"""List uploaded solutions for the requesting user. If none, returns empty list."""
@@ -144,6 +204,21 @@ def list_uploaded_solutions(x_user_id: Optional[str] = Header(None), db: Session
 	]
 
 
+@router.get("/api/uploaded-solutions/{solution_id}/status")
+def get_uploaded_solution_status(solution_id: int, x_user_id: Optional[str] = Header(None), db: Session = Depends(get_db)):
+	"""Ingestion progress (chunks embedded, vectors written) for an uploaded solution of the requesting user."""
+	user_id = x_user_id or "anonymous"
+	record = db.query(DBSolution).filter(DBSolution.id == solution_id, DBSolution.user_id == user_id).first()
+	if not record:
+		raise HTTPException(status_code=404, detail="Uploaded solution not found")
+	job = db.query(IngestionJob).filter(IngestionJob.solution_id == solution_id).order_by(IngestionJob.id.desc()).first()
+	if not job:
+		# Uploaded before background ingestion existed: indexed inline at upload time
+		return {"id": solution_id, "filename": record.filename, "status": "completed"}
+
+	return {"id": solution_id, "filename": record.filename, **_job_status(job)}
+
+
 @router.get("/api/uploaded-solutions/{solution_id}/download")
 def download_uploaded_solution(solution_id: int, x_user_id: Optional[str] = Header(None), db: Session = Depends(get_db)):
 	"""Download a previously uploaded solution if it belongs to the requesting user."""
@@ -155,3 +230,21 @@ def download_uploaded_solution(solution_id: int, x_user_id: Optional[str] = Head
 		raise HTTPException(status_code=404, detail="File not found on server")
 
 	return FileResponse(record.file_path, filename=record.filename, media_type='application/octet-stream')
+
+
+@router.delete("/api/uploaded-solutions/{solution_id}")
+def delete_uploaded_solution(solution_id: int, x_user_id: Optional[str] = Header(None), db: Session = Depends(get_db)):
+	"""Delete an uploaded solution and its vectors if it belongs to the requesting user."""
+	user_id = x_user_id or "anonymous"
+	record = db.query(DBSolution).filter(DBSolution.id == solution_id, DBSolution.user_id == user_id).first()
+	if not record:
+		raise HTTPException(status_code=404, detail="Uploaded solution not found")
+
+	# Vectors shared with another upload of identical content are kept (see replace_file_vectors)
+	vectors_deleted = purge_file_vectors(get_vector_index(), "upload", record.id, get_lexical_index())
+	if record.file_path and os.path.exists(record.file_path):
+		os.remove(record.file_path)
+	db.delete(record)
+	db.commit()
+
+	return {"id": solution_id, "deleted": True, "vectors_deleted": vectors_deleted}
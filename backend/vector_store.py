@@ -0,0 +1,606 @@
+"""
+Pluggable vector store engines
+Provides a Pinecone-shaped index interface with a Pinecone implementation and a
+local memory-mapped implementation (IVF + metadata inverted index) for offline use
+"""
+
+import os
+import re
+import json
+import math
+import sqlite3
+import logging
+import threading
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Set, Tuple
+from dotenv import load_dotenv
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+load_dotenv()
+
+# "pinecone" (default) or "local"
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "pinecone").lower()
+LOCAL_VECTOR_STORE_DIR = os.getenv(
+    "LOCAL_VECTOR_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "vector_store")
+)
+# float32 keeps exact scores; int8 quarters the file size at ~1% score error
+LOCAL_VECTOR_DTYPE = os.getenv("LOCAL_VECTOR_DTYPE", "float32").lower()
+# IVF is only worth training once brute force stops being trivially fast
+LOCAL_IVF_MIN_VECTORS = int(os.getenv("LOCAL_IVF_MIN_VECTORS", "20000"))
+LOCAL_IVF_NPROBE = int(os.getenv("LOCAL_IVF_NPROBE", "8"))
+
+# Metadata fields kept in the inverted index for fast filtering
+INDEXED_METADATA_FIELDS = ("knowledge_base", "user_id", "filename", "source", "sharepoint_file_id")
+
+# Namespaces: one per knowledge base, optionally one per user for uploads.
+# "" is the default namespace, where everything indexed before namespaces existed lives.
+DEFAULT_NAMESPACE = ""
+AIONOS_NAMESPACE = os.getenv("AIONOS_NAMESPACE", "aionos")
+UPLOADS_NAMESPACE = os.getenv("UPLOADS_NAMESPACE", "uploads")
+PER_USER_NAMESPACES = (os.getenv("PER_USER_NAMESPACES", "false").lower() in ("1", "true", "yes"))
+# Also search the default namespace (metadata-filtered) until legacy vectors are re-ingested
+LEGACY_NAMESPACE_FALLBACK = (os.getenv("LEGACY_NAMESPACE_FALLBACK", "true").lower() in ("1", "true", "yes"))
+
+
+def upload_namespace(user_id: Optional[str]) -> str:
+    """Namespace for a user's uploaded solutions (shared unless PER_USER_NAMESPACES)"""
+    if not PER_USER_NAMESPACES:
+        return UPLOADS_NAMESPACE
+    return f"{UPLOADS_NAMESPACE}-{re.sub(r'[^A-Za-z0-9_.@-]', '_', user_id or 'anonymous')}"
+
+
+def _normalize_vectors(vectors: Iterable[Any]) -> List[Tuple[str, List[float], Dict[str, Any]]]:
+    """Accept (id, values, metadata) tuples or Pinecone-style dicts"""
+    normalized = []
+    for vec in vectors:
+        if isinstance(vec, dict):
+            normalized.append((vec["id"], vec["values"], vec.get("metadata") or {}))
+        else:
+            vec_id, values = vec[0], vec[1]
+            metadata = vec[2] if len(vec) > 2 else {}
+            normalized.append((vec_id, values, metadata or {}))
+    return normalized
+
+
+def _field(obj: Any, name: str, default: Any = None) -> Any:
+    """Read a field from a Pinecone response object or a plain dict"""
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    try:
+        return obj[name]
+    except Exception:
+        return getattr(obj, name, default)
+
+
+class VectorIndex:
+    """Interface shared by all vector store engines (Pinecone-shaped)"""
+
+    backend = "base"
+
+    def upsert(self, vectors: Iterable[Any], namespace: str = DEFAULT_NAMESPACE) -> int:
+        """Insert or replace vectors given as (id, values, metadata); returns count"""
+        raise NotImplementedError
+
+    def query(self, vector: List[float], top_k: int = 5, filter: Optional[Dict[str, Any]] = None,
+              include_metadata: bool = True, include_values: bool = False,
+              namespace: str = DEFAULT_NAMESPACE) -> Dict[str, Any]:
+        """
+        Nearest-neighbour search within one namespace
+
+        Returns:
+            {"matches": [{"id", "score", "metadata", "values"?}, ...]} sorted by score desc
+        """
+        raise NotImplementedError
+
+    def fetch(self, ids: List[str], namespace: str = DEFAULT_NAMESPACE) -> Dict[str, Dict[str, Any]]:
+        """Return {id: {"id", "values", "metadata"}} for the ids that exist"""
+        raise NotImplementedError
+
+    def delete(self, ids: List[str], namespace: str = DEFAULT_NAMESPACE) -> None:
+        """Delete vectors by id (missing ids are ignored)"""
+        raise NotImplementedError
+
+    def count(self, namespace: Optional[str] = None) -> int:
+        """Number of vectors in a namespace (all namespaces when None)"""
+        raise NotImplementedError
+
+    def list_ids(self, prefix: Optional[str] = None, namespace: str = DEFAULT_NAMESPACE) -> Iterator[str]:
+        """Iterate over the vector ids of a namespace (optionally only those starting with prefix)"""
+        raise NotImplementedError
+
+    def list_namespaces(self) -> List[str]:
+        """Namespaces that currently hold vectors"""
+        raise NotImplementedError
+
+
+class PineconeVectorIndex(VectorIndex):
+    """Pinecone serverless index"""
+
+    backend = "pinecone"
+
+    def __init__(self, index_name: Optional[str] = None, create_if_missing: bool = False, dimension: int = 384):
+        from pinecone import Pinecone, ServerlessSpec
+
+        self.logger = logging.getLogger("vectorstore.pinecone")
+        self.api_key = os.getenv("PINECONE_API_KEY")
+        self.index_name = index_name or os.getenv("PINECONE_INDEX_NAME")
+        if not self.api_key or not self.index_name:
+            raise ValueError("PINECONE_API_KEY and PINECONE_INDEX_NAME must be set")
+
+        self.pc = Pinecone(api_key=self.api_key)
+        if create_if_missing and self.index_name not in [index.name for index in self.pc.list_indexes()]:
+            self.logger.info("Creating Pinecone index: %s", self.index_name)
+            self.pc.create_index(
+                name=self.index_name,
+                dimension=dimension,
+                metric="cosine",
+                spec=ServerlessSpec(cloud='aws', region='us-east-1')
+            )
+        self.index = self.pc.Index(self.index_name)
+
+    def upsert(self, vectors: Iterable[Any], namespace: str = DEFAULT_NAMESPACE) -> int:
+        vectors = _normalize_vectors(vectors)
+        if vectors:
+            self.index.upsert(vectors=vectors, namespace=namespace)
+        return len(vectors)
+
+    def query(self, vector: List[float], top_k: int = 5, filter: Optional[Dict[str, Any]] = None,
+              include_metadata: bool = True, include_values: bool = False,
+              namespace: str = DEFAULT_NAMESPACE) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {
+            "vector": list(vector),
+            "top_k": top_k,
+            "include_metadata": include_metadata,
+            "include_values": include_values,
+            "namespace": namespace,
+        }
+        if filter:
+            kwargs["filter"] = filter
+        results = self.index.query(**kwargs)
+        matches = []
+        for match in _field(results, "matches", []) or []:
+            item = {
+                "id": _field(match, "id"),
+                "score": float(_field(match, "score", 0.0) or 0.0),
+                "metadata": dict(_field(match, "metadata", {}) or {}),
+            }
+            if include_values:
+                item["values"] = list(_field(match, "values", []) or [])
+            matches.append(item)
+        return {"matches": matches}
+
+    def fetch(self, ids: List[str], namespace: str = DEFAULT_NAMESPACE) -> Dict[str, Dict[str, Any]]:
+        if not ids:
+            return {}
+        results = self.index.fetch(ids=list(ids), namespace=namespace)
+        found = {}
+        for vec_id, vec in (_field(results, "vectors", {}) or {}).items():
+            found[vec_id] = {
+                "id": vec_id,
+                "values": list(_field(vec, "values", []) or []),
+                "metadata": dict(_field(vec, "metadata", {}) or {}),
+            }
+        return found
+
+    def delete(self, ids: List[str], namespace: str = DEFAULT_NAMESPACE) -> None:
+        if ids:
+            self.index.delete(ids=list(ids), namespace=namespace)
+
+    def count(self, namespace: Optional[str] = None) -> int:
+        stats = self.index.describe_index_stats()
+        if namespace is None:
+            return int(_field(stats, "total_vector_count", 0) or 0)
+        summary = (_field(stats, "namespaces", {}) or {}).get(namespace)
+        return int(_field(summary, "vector_count", 0) or 0) if summary is not None else 0
+
+    def list_ids(self, prefix: Optional[str] = None, namespace: str = DEFAULT_NAMESPACE) -> Iterator[str]:
+        kwargs = {"prefix": prefix} if prefix else {}
+        for page in self.index.list(namespace=namespace, **kwargs):
+            yield from page
+
+    def list_namespaces(self) -> List[str]:
+        stats = self.index.describe_index_stats()
+        # Pinecone reports the default namespace as "" (older SDKs) or "__default__"
+        return ["" if name == "__default__" else name for name in (_field(stats, "namespaces", {}) or {})]
+
+
+class LocalVectorIndex(VectorIndex):
+    """
+    Local vector engine persisted under LOCAL_VECTOR_STORE_DIR
+
+    - vectors.bin: memory-mapped (capacity x dim) float32/int8 matrix of unit vectors
+    - meta.db: SQLite slot -> namespace/id/metadata table (source of truth across restarts)
+    - ivf.npy: IVF centroids, trained once the index passes LOCAL_IVF_MIN_VECTORS
+    Metadata filters on INDEXED_METADATA_FIELDS resolve through an in-memory inverted index.
+    """
+
+    backend = "local"
+
+    def __init__(self, directory: Optional[str] = None, dtype: Optional[str] = None):
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("numpy is required for the local vector store")
+        self.logger = logging.getLogger("vectorstore.local")
+        self.directory = directory or LOCAL_VECTOR_STORE_DIR
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.RLock()
+
+        self._db = sqlite3.connect(os.path.join(self.directory, "meta.db"), check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS vectors (slot INTEGER PRIMARY KEY, namespace TEXT NOT NULL DEFAULT '', "
+            "id TEXT NOT NULL, metadata TEXT NOT NULL, UNIQUE (namespace, id))"
+        )
+        self._migrate_namespaces()
+        self._db.commit()
+
+        settings = dict(self._db.execute("SELECT key, value FROM settings").fetchall())
+        self.dim: Optional[int] = int(settings["dim"]) if "dim" in settings else None
+        self.dtype = settings.get("dtype") or (dtype or LOCAL_VECTOR_DTYPE)
+        if self.dtype not in ("float32", "int8"):
+            raise ValueError(f"Unsupported LOCAL_VECTOR_DTYPE: {self.dtype}")
+
+        self._matrix_path = os.path.join(self.directory, "vectors.bin")
+        self._ivf_path = os.path.join(self.directory, "ivf.npy")
+        self._matrix = None
+        self._capacity = 0
+        self._ids: List[Optional[str]] = []
+        self._metadata: List[Optional[Dict[str, Any]]] = []
+        self._slot_of: Dict[Tuple[str, str], int] = {}
+        self._namespace_of: List[Optional[str]] = []
+        self._namespace_slots: Dict[str, Set[int]] = {}
+        self._free: List[int] = []
+        self._high = 0
+        self._postings: Dict[str, Dict[Any, Set[int]]] = {f: {} for f in INDEXED_METADATA_FIELDS}
+        self._active = np.zeros(0, dtype=bool)
+        self._centroids = None
+        self._list_of = np.zeros(0, dtype=np.int32)
+        self._ivf_trained_at = 0
+        self._load()
+
+    # --- storage ---
+
+    def _migrate_namespaces(self) -> None:
+        """Stores created before namespaces had a globally unique id column; move rows to the default namespace"""
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info('vectors')").fetchall()]
+        if "namespace" in columns:
+            return
+        self.logger.info("Migrating local vector store to namespaces")
+        self._db.execute("ALTER TABLE vectors RENAME TO vectors_pre_namespace")
+        self._db.execute(
+            "CREATE TABLE vectors (slot INTEGER PRIMARY KEY, namespace TEXT NOT NULL DEFAULT '', "
+            "id TEXT NOT NULL, metadata TEXT NOT NULL, UNIQUE (namespace, id))"
+        )
+        self._db.execute("INSERT INTO vectors (slot, namespace, id, metadata) SELECT slot, '', id, metadata FROM vectors_pre_namespace")
+        self._db.execute("DROP TABLE vectors_pre_namespace")
+
+    def _row_bytes(self) -> int:
+        return self.dim * (4 if self.dtype == "float32" else 1)
+
+    def _open_matrix(self, capacity: int) -> None:
+        np_dtype = np.float32 if self.dtype == "float32" else np.int8
+        size = capacity * self._row_bytes()
+        with open(self._matrix_path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        self._matrix = np.memmap(self._matrix_path, dtype=np_dtype, mode="r+", shape=(capacity, self.dim))
+        self._capacity = capacity
+        if len(self._active) < capacity:
+            self._active = np.concatenate([self._active, np.zeros(capacity - len(self._active), dtype=bool)])
+            self._list_of = np.concatenate([self._list_of, np.full(capacity - len(self._list_of), -1, dtype=np.int32)])
+            self._ids.extend([None] * (capacity - len(self._ids)))
+            self._namespace_of.extend([None] * (capacity - len(self._namespace_of)))
+            self._metadata.extend([None] * (capacity - len(self._metadata)))
+
+    def _ensure_capacity(self, needed: int) -> None:
+        if needed <= self._capacity:
+            return
+        new_capacity = max(1024, self._capacity)
+        while new_capacity < needed:
+            new_capacity *= 2
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._matrix = None
+        self._open_matrix(new_capacity)
+
+    def _load(self) -> None:
+        rows = self._db.execute("SELECT slot, namespace, id, metadata FROM vectors").fetchall()
+        if self.dim is None:
+            return
+        high = max((row[0] for row in rows), default=-1) + 1
+        existing = os.path.getsize(self._matrix_path) // self._row_bytes() if os.path.exists(self._matrix_path) else 0
+        self._open_matrix(max(1024, high, existing))
+        for slot, namespace, vec_id, metadata in rows:
+            self._register(slot, namespace, vec_id, json.loads(metadata))
+        self._high = high
+        self._free = [slot for slot in range(high) if not self._active[slot]]
+        if os.path.exists(self._ivf_path):
+            self._centroids = np.load(self._ivf_path)
+            self._ivf_trained_at = len(self._slot_of)
+            self._assign_lists(np.flatnonzero(self._active))
+        self.logger.info("Loaded local vector store: vectors=%d dim=%s dtype=%s ivf=%s",
+                         len(self._slot_of), self.dim, self.dtype, self._centroids is not None)
+
+    def _register(self, slot: int, namespace: str, vec_id: str, metadata: Dict[str, Any]) -> None:
+        self._ids[slot] = vec_id
+        self._namespace_of[slot] = namespace
+        self._metadata[slot] = metadata
+        self._slot_of[(namespace, vec_id)] = slot
+        self._namespace_slots.setdefault(namespace, set()).add(slot)
+        self._active[slot] = True
+        for field in INDEXED_METADATA_FIELDS:
+            if field in metadata:
+                self._postings[field].setdefault(metadata[field], set()).add(slot)
+
+    def _unregister(self, slot: int) -> None:
+        metadata = self._metadata[slot] or {}
+        for field in INDEXED_METADATA_FIELDS:
+            if field in metadata:
+                bucket = self._postings[field].get(metadata[field])
+                if bucket is not None:
+                    bucket.discard(slot)
+                    if not bucket:
+                        del self._postings[field][metadata[field]]
+        namespace = self._namespace_of[slot]
+        self._slot_of.pop((namespace, self._ids[slot]), None)
+        bucket = self._namespace_slots.get(namespace)
+        if bucket is not None:
+            bucket.discard(slot)
+            if not bucket:
+                del self._namespace_slots[namespace]
+        self._ids[slot] = None
+        self._namespace_of[slot] = None
+        self._metadata[slot] = None
+        self._active[slot] = False
+        self._list_of[slot] = -1
+
+    def _encode(self, values: Any) -> "np.ndarray":
+        vec = np.asarray(values, dtype=np.float32)
+        norm = float(np.linalg.norm(vec))
+        if norm > 0:
+            vec = vec / norm
+        if self.dtype == "int8":
+            return np.clip(np.rint(vec * 127.0), -127, 127).astype(np.int8)
+        return vec
+
+    def _decode(self, rows: "np.ndarray") -> "np.ndarray":
+        if self.dtype == "int8":
+            return rows.astype(np.float32) / 127.0
+        return np.asarray(rows, dtype=np.float32)
+
+    # --- IVF ---
+
+    def _assign_lists(self, slots: "np.ndarray") -> None:
+        if self._centroids is None or len(slots) == 0:
+            return
+        for start in range(0, len(slots), 8192):
+            batch = slots[start:start + 8192]
+            scores = self._decode(self._matrix[batch]) @ self._centroids.T
+            self._list_of[batch] = np.argmax(scores, axis=1).astype(np.int32)
+
+    def _maybe_train_ivf(self) -> None:
+        total = len(self._slot_of)
+        if total < LOCAL_IVF_MIN_VECTORS:
+            return
+        if self._centroids is not None and total < 2 * self._ivf_trained_at:
+            return
+        slots = np.flatnonzero(self._active)
+        rng = np.random.default_rng(0)
+        sample = slots if len(slots) <= 50000 else rng.choice(slots, 50000, replace=False)
+        data = self._decode(self._matrix[np.sort(sample)])
+        nlist = max(8, int(math.sqrt(total)))
+        centroids = data[rng.choice(len(data), nlist, replace=False)].copy()
+        for _ in range(10):
+            assign = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, data)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            nonempty = norms[:, 0] > 0
+            centroids[nonempty] = sums[nonempty] / norms[nonempty]
+        self._centroids = centroids.astype(np.float32)
+        np.save(self._ivf_path, self._centroids)
+        self._ivf_trained_at = total
+        self._assign_lists(slots)
+        self.logger.info("Trained IVF index: vectors=%d lists=%d", total, nlist)
+
+    # --- filtering ---
+
+    @staticmethod
+    def _matches_condition(value: Any, condition: Any) -> bool:
+        if isinstance(condition, dict):
+            for op, expected in condition.items():
+                if op == "$eq" and value != expected:
+                    return False
+                if op == "$ne" and value == expected:
+                    return False
+                if op == "$in" and value not in expected:
+                    return False
+                if op == "$nin" and value in expected:
+                    return False
+            return True
+        return value == condition
+
+    def _filter_mask(self, filter: Optional[Dict[str, Any]], namespace: str) -> "np.ndarray":
+        mask = np.zeros_like(self._active)
+        slots = self._namespace_slots.get(namespace)
+        if slots:
+            mask[list(slots)] = True
+        if not filter:
+            return mask
+        python_conditions = {}
+        for field, condition in filter.items():
+            wanted = None
+            if field in self._postings:
+                if not isinstance(condition, dict):
+                    wanted = [condition]
+                elif set(condition) == {"$eq"}:
+                    wanted = [condition["$eq"]]
+                elif set(condition) == {"$in"}:
+                    wanted = list(condition["$in"])
+            if wanted is None:
+                python_conditions[field] = condition
+                continue
+            field_mask = np.zeros_like(mask)
+            for value in wanted:
+                slots = self._postings[field].get(value)
+                if slots:
+                    field_mask[list(slots)] = True
+            mask &= field_mask
+        if python_conditions:
+            for slot in np.flatnonzero(mask):
+                metadata = self._metadata[slot] or {}
+                if not all(self._matches_condition(metadata.get(f), c) for f, c in python_conditions.items()):
+                    mask[slot] = False
+        return mask
+
+    # --- public API ---
+
+    def upsert(self, vectors: Iterable[Any], namespace: str = DEFAULT_NAMESPACE) -> int:
+        vectors = _normalize_vectors(vectors)
+        if not vectors:
+            return 0
+        with self._lock:
+            if self.dim is None:
+                self.dim = len(vectors[0][1])
+                self._db.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('dim', ?)", (str(self.dim),))
+                self._db.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('dtype', ?)", (self.dtype,))
+                self._open_matrix(1024)
+            rows = []
+            new_slots = []
+            for vec_id, values, metadata in vectors:
+                if len(values) != self.dim:
+                    raise ValueError(f"Vector {vec_id} has dimension {len(values)}, expected {self.dim}")
+                slot = self._slot_of.get((namespace, vec_id))
+                if slot is not None:
+                    self._unregister(slot)
+                elif self._free:
+                    slot = self._free.pop()
+                else:
+                    slot = self._high
+                    self._high += 1
+                    self._ensure_capacity(self._high)
+                self._matrix[slot] = self._encode(values)
+                self._register(slot, namespace, vec_id, dict(metadata))
+                new_slots.append(slot)
+                rows.append((slot, namespace, vec_id, json.dumps(metadata)))
+            self._matrix.flush()
+            self._db.executemany("INSERT OR REPLACE INTO vectors (slot, namespace, id, metadata) VALUES (?, ?, ?, ?)", rows)
+            self._db.commit()
+            self._assign_lists(np.asarray(new_slots))
+            self._maybe_train_ivf()
+            return len(rows)
+
+    def query(self, vector: List[float], top_k: int = 5, filter: Optional[Dict[str, Any]] = None,
+              include_metadata: bool = True, include_values: bool = False,
+              namespace: str = DEFAULT_NAMESPACE) -> Dict[str, Any]:
+        with self._lock:
+            if self.dim is None or not self._namespace_slots.get(namespace):
+                return {"matches": []}
+            query_vec = self._encode(vector).astype(np.float32)
+            if self.dtype == "int8":
+                query_vec = query_vec / 127.0
+            mask = self._filter_mask(filter, namespace)
+            if self._centroids is not None and int(mask.sum()) > LOCAL_IVF_MIN_VECTORS // 4:
+                probe = np.argsort(-(self._centroids @ query_vec))[:LOCAL_IVF_NPROBE]
+                mask &= np.isin(self._list_of, probe)
+            slots = np.flatnonzero(mask)
+            if len(slots) == 0:
+                return {"matches": []}
+            scores = self._decode(self._matrix[slots]) @ query_vec
+            k = min(top_k, len(slots))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            matches = []
+            for i in top:
+                slot = int(slots[i])
+                item = {"id": self._ids[slot], "score": float(scores[i])}
+                item["metadata"] = dict(self._metadata[slot] or {}) if include_metadata else {}
+                if include_values:
+                    item["values"] = self._decode(self._matrix[slot]).tolist()
+                matches.append(item)
+            return {"matches": matches}
+
+    def fetch(self, ids: List[str], namespace: str = DEFAULT_NAMESPACE) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            found = {}
+            for vec_id in ids:
+                slot = self._slot_of.get((namespace, vec_id))
+                if slot is None:
+                    continue
+                found[vec_id] = {
+                    "id": vec_id,
+                    "values": self._decode(self._matrix[slot]).tolist(),
+                    "metadata": dict(self._metadata[slot] or {}),
+                }
+            return found
+
+    def delete(self, ids: List[str], namespace: str = DEFAULT_NAMESPACE) -> None:
+        with self._lock:
+            slots = [self._slot_of[(namespace, i)] for i in ids if (namespace, i) in self._slot_of]
+            if not slots:
+                return
+            for slot in slots:
+                self._unregister(slot)
+                self._free.append(slot)
+            self._db.executemany("DELETE FROM vectors WHERE slot = ?", [(s,) for s in slots])
+            self._db.commit()
+
+    def count(self, namespace: Optional[str] = None) -> int:
+        with self._lock:
+            if namespace is None:
+                return len(self._slot_of)
+            return len(self._namespace_slots.get(namespace, ()))
+
+    def list_ids(self, prefix: Optional[str] = None, namespace: str = DEFAULT_NAMESPACE) -> Iterator[str]:
+        with self._lock:
+            ids = [i for ns, i in self._slot_of if ns == namespace and (not prefix or i.startswith(prefix))]
+        return iter(ids)
+
+    def list_namespaces(self) -> List[str]:
+        with self._lock:
+            return list(self._namespace_slots)
+
+
+class IndexVectorStore:
+    """Minimal LangChain-style facade (similarity_search) over a VectorIndex"""
+
+    def __init__(self, index: VectorIndex, embedding: Any, chunk_store: Any = None):
+        self.index = index
+        self.embedding = embedding
+        self.chunk_store = chunk_store
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None,
+                          namespace: str = DEFAULT_NAMESPACE) -> List[Any]:
+        from langchain.schema import Document
+
+        query_vector = self.embedding.embed_query(query)
+        matches = self.index.query(vector=query_vector, top_k=k, filter=filter, include_metadata=True,
+                                   namespace=namespace)["matches"]
+        # Text comes from the local chunk store, falling back to metadata for vectors indexed before it
+        stored = self.chunk_store.get_many([m["id"] for m in matches]) if self.chunk_store is not None else {}
+        return [
+            Document(page_content=stored.get(match["id"]) or match["metadata"].get("text", ""), metadata=match["metadata"])
+            for match in matches
+        ]
+
+
+# Singleton instance
+_vector_index: Optional[VectorIndex] = None
+_vector_index_lock = threading.Lock()
+
+def get_vector_index() -> VectorIndex:
+    """Get or create the configured vector index singleton (VECTOR_STORE_BACKEND)"""
+    global _vector_index
+    with _vector_index_lock:
+        if _vector_index is None:
+            if VECTOR_STORE_BACKEND == "local":
+                _vector_index = LocalVectorIndex()
+            elif VECTOR_STORE_BACKEND == "pinecone":
+                _vector_index = PineconeVectorIndex(create_if_missing=True)
+            else:
+                raise ValueError(f"Unknown VECTOR_STORE_BACKEND: {VECTOR_STORE_BACKEND}")
+        return _vector_index
@@ -0,0 +1,100 @@
+"""
+Background warm-up and readiness reporting
+Heavy components (embedding model, vector index connection, BM25 and chunk stores, reranker) are
+built lazily by their singleton getters. At startup, warm-up calls those getters on a background
+thread, so the app serves cheap endpoints at once and the first RAG request does not pay the load.
+Required components that fail (e.g. Pinecone unreachable at boot) are retried until they come up.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+WARMUP_ENABLED = (os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes"))
+# Delay before failed components are retried
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "30"))
+
+
+class _Component:
+    def __init__(self, name: str, loader: Callable[[], Any], required: bool):
+        self.name = name
+        self.loader = loader
+        self.required = required
+        self.status = "pending"  # 'pending' | 'loading' | 'ready' | 'failed'
+        self.error: Optional[str] = None
+        self.attempts = 0
+        self.seconds: Optional[float] = None
+
+
+class Warmup:
+    """Loads registered components in order on a daemon thread and reports their readiness"""
+
+    def __init__(self):
+        self.logger = logging.getLogger("app.warmup")
+        self._components: Dict[str, _Component] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._started_at: Optional[float] = None
+
+    def register(self, name: str, loader: Callable[[], Any], required: bool = True) -> None:
+        """Register a component; required components gate /api/ready"""
+        with self._lock:
+            self._components[name] = _Component(name, loader, required)
+
+    def start(self) -> None:
+        """Start warming up in the background (no-op if already started or WARMUP_ENABLED is off)"""
+        with self._lock:
+            if self._thread is not None or not WARMUP_ENABLED:
+                return
+            self._started_at = time.monotonic()
+            self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+            self._thread.start()
+
+    def _load(self, component: _Component) -> bool:
+        component.status = "loading"
+        component.attempts += 1
+        start = time.perf_counter()
+        try:
+            component.loader()
+        except Exception as e:
+            component.status = "failed"
+            component.error = str(e)
+            self.logger.warning("Warm-up of %s failed (attempt %d): %s", component.name, component.attempts, e)
+            return False
+        component.seconds = round(time.perf_counter() - start, 3)
+        component.status = "ready"
+        component.error = None
+        self.logger.info("Warm-up: %s ready in %.2fs", component.name, component.seconds)
+        return True
+
+    def _run(self) -> None:
+        pending: List[_Component] = list(self._components.values())
+        while pending:
+            # Optional components are not retried; they still load lazily on first use
+            pending = [component for component in pending if not self._load(component) and component.required]
+            if pending:
+                time.sleep(WARMUP_RETRY_SECONDS)
+        self.logger.info("Warm-up complete in %.2fs", time.monotonic() - self._started_at)
+
+    def status(self) -> Dict[str, Any]:
+        """{"ready", "started", "components": {name: {status, required, error, attempts, seconds}}}"""
+        components = {
+            c.name: {"status": c.status, "required": c.required, "error": c.error, "attempts": c.attempts, "seconds": c.seconds}
+            for c in list(self._components.values())
+        }
+        # With warm-up disabled, components load on first use and readiness is not gated
+        ready = not WARMUP_ENABLED or all(c["status"] == "ready" for c in components.values() if c["required"])
+        return {"ready": ready, "started": self._thread is not None, "components": components}
+
+
+# Singleton instance
+_warmup = Warmup()
+
+def get_warmup() -> Warmup:
+    """Get the application warm-up singleton"""
+    return _warmup
@@ -63,6 +63,8 @@ const RFPSolutionGenerator = () => {
     setDownloaded(false);
     try {
       let data;
+      // Scopes retrieval to this user's uploaded solutions
+      const userId = (() => { try { return sessionStorage.getItem('aionos_user_email') || 'anonymous'; } catch (e) { return 'anonymous'; } })();
       if (file) {
         const formData = new FormData();
         formData.append('file', file);
@@ -70,7 +72,7 @@ const RFPSolutionGenerator = () => {
         if (knowledgeBase) {
           formData.append('knowledge_base', knowledgeBase);
         }
-        const response = await fetch('/api/generate-solution', { method: 'POST', body: formData });
+        const response = await fetch('/api/generate-solution', { method: 'POST', body: formData, headers: { 'X-User-Id': userId } });
         if (!response.ok) {
           let msg = 'Failed to generate solution';
           try { const j = await response.json(); if (j?.detail) msg = j.detail; } catch {}
@@ -80,7 +82,7 @@ const RFPSolutionGenerator = () => {
       } else {
         const response = await fetch('/api/generate-solution-text', {
           method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
+          headers: { 'Content-Type': 'application/json', 'X-User-Id': userId },
           body: JSON.stringify({ text: inputText.trim(), method: generationMethod, knowledge_base: knowledgeBase })
         });
         if (!response.ok) {